@@ -0,0 +1,73 @@
+"""
+Benchmark of the layered compositing (compositor.Compositor): time per mouse move while dragging a detection over a
+frame with many detections, compared with copying the annotated frame, drawing the detection and blending the whole
+frame (previous ImageWidget.draw_current_detection). The viewport render following each move is not included.
+
+    python benchmarks/bench_compositor.py [nb_detections] [height] [width]
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import cv2
+import numpy as np
+from ultimatelabeling.models.compositor import Compositor, get_extent
+from ultimatelabeling.models.polygon import Bbox
+from ultimatelabeling.models.track_info import Detection
+from ultimatelabeling.utils import draw_detection, scale_detection
+
+NB_MOVES = 100
+TRANSPARENCY = 0.8
+
+
+def main():
+    nb_detections = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    h = int(sys.argv[2]) if len(sys.argv) > 2 else 2160
+    w = int(sys.argv[3]) if len(sys.argv) > 3 else 3840
+
+    rng = np.random.RandomState(0)
+    base = cv2.resize(rng.randint(0, 255, (h // 16, w // 16, 3)).astype(np.uint8), (w, h))
+    base.flags.writeable = False
+    detections = [Detection(track_id=i, bbox=Bbox(rng.uniform(0, w - 200), rng.uniform(0, h - 200), 150, 100))
+                  for i in range(nb_detections)]
+
+    def draw_static(img):
+        for detection in detections:
+            draw_detection(img, detection)
+
+    start = time.perf_counter()
+    img_temp = base.copy()
+    draw_static(img_temp)
+    static = time.perf_counter() - start
+
+    dragged = Detection(track_id=nb_detections, bbox=Bbox(w / 2, h / 2, 150, 100))
+    moves = [scale_detection(dragged, 1, (-3 * i, -2 * i)) for i in range(NB_MOVES)]
+
+    start = time.perf_counter()
+    for moved in moves:
+        img = img_temp.copy()
+        draw_detection(img, moved, draw_anchors=False)
+        img = cv2.addWeighted(base, TRANSPARENCY, img, 1 - TRANSPARENCY, 0)
+    old = (time.perf_counter() - start) / NB_MOVES
+
+    compositor = Compositor(TRANSPARENCY)
+    compositor.set_frame(base, draw_static)
+    start = time.perf_counter()
+    compositor.draw_dynamic(lambda img, offset: None, None)  # start of the drag: the overlay is faded once
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for moved in moves:
+        compositor.draw_dynamic(
+            lambda img, offset: draw_detection(img, scale_detection(moved, 1, offset), draw_anchors=False),
+            get_extent(moved))
+    new = (time.perf_counter() - start) / NB_MOVES
+
+    print("{}x{} frame, {} detections, overlay drawn in {:.1f} ms".format(w, h, nb_detections, 1000 * static))
+    print("{:>26} {:>10.2f} ms".format("full copy and blend", 1000 * old))
+    print("{:>26} {:>10.2f} ms (start of the drag {:.1f} ms)".format("dirty rectangle", 1000 * new, 1000 * first))
+
+
+if __name__ == "__main__":
+    main()
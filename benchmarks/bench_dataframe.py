@@ -0,0 +1,107 @@
+"""
+Benchmark of the whole-video DataFrame export/import (TrackInfo.to_df / TrackInfo.from_df_all, used by the
+Hungarian tracker) against the frame by frame implementation.
+
+    python benchmarks/bench_dataframe.py [nb_frames ...]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+from ultimatelabeling.models import track_info as track_info_module
+from ultimatelabeling.models.track_info import Detection, TrackInfo
+from ultimatelabeling.models.polygon import Bbox, Polygon, Keypoints
+
+DETECTIONS_PER_FRAME = 5
+LEGACY_MAX_FRAMES = 2000  # the frame by frame implementation is quadratic
+
+
+def make_detections(rng, n):
+    return [Detection(int(rng.randint(0, 10)), i, Polygon(rng.uniform(0, 1000, 8) if i % 4 == 0 else []),
+                      Bbox(*rng.uniform(0, 2000, 4)), Keypoints()) for i in range(n)]
+
+
+def legacy_to_df(track_info, file_names):
+    track_info.cache.flush()
+    df = pd.DataFrame(columns=["frame", "class_id", "track_id", "xc", "yc", "w", "h", "infer", "polygon", "kp"])
+
+    for i, file_name in enumerate(file_names):
+        if not track_info.store.has_frame(file_name):
+            continue
+
+        df_frame = track_info.detections_to_df(track_info.store.get_frame(file_name))
+        df_frame["frame"] = i
+        df_frame["xc"] = df_frame["x"] + df_frame["w"] / 2
+        df_frame["yc"] = df_frame["y"] + df_frame["h"] / 2
+        df_frame["infer"] = 0
+
+        df_frame = df_frame[["frame", "class_id", "track_id", "xc", "yc", "w", "h", "infer", "polygon", "kp"]]
+        df = df.append(df_frame, ignore_index=True)
+    return df
+
+
+def legacy_from_df_all(track_info, df, file_names):
+    df["x"] = df.xc - df.w / 2
+    df["y"] = df.yc - df.h / 2
+
+    df[["class_id", "track_id"]] = df[["class_id", "track_id"]].astype(int)
+    df[["x", "y", "w", "h"]] = df[["x", "y", "w", "h"]].astype(float)
+
+    for i, file_name in enumerate(file_names):
+        df_frame = df[df.frame == i]
+        track_info.set_frame(file_name, track_info.detections_from_df(df_frame))
+
+    track_info.flush()
+
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return time.perf_counter() - start, result
+
+
+def bench(nb_frames):
+    rng = np.random.RandomState(0)
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        track_info_module.OUTPUT_DIR = dir_name
+        track_info = TrackInfo("video")
+        file_names = ["{:06d}".format(i) for i in range(nb_frames)]
+        for file_name in file_names:
+            track_info.store.set_frame(file_name, make_detections(rng, DETECTIONS_PER_FRAME))
+        track_info.store.commit()
+
+        t_to_df, df = timed(lambda: track_info.to_df(file_names))
+        t_from_df, _ = timed(lambda: track_info.from_df_all(df.copy(), file_names))
+        t_from_df_pool, _ = timed(lambda: track_info.from_df_all(df.copy(), file_names, workers=4))
+
+        if nb_frames <= LEGACY_MAX_FRAMES:
+            t_legacy_to_df, legacy_df = timed(lambda: legacy_to_df(track_info, file_names))
+            t_legacy_from_df, _ = timed(lambda: legacy_from_df_all(track_info, legacy_df, file_names))
+            legacy = "{:10.2f} s {:10.2f} s".format(t_legacy_to_df, t_legacy_from_df)
+        else:
+            legacy = "{:>12} {:>12}".format("-", "-")
+
+        track_info.save_to_disk()
+        track_info.close()
+        track_info.persistence.join()
+
+    print("{:>8} {:10.2f} s {:10.2f} s {:10.2f} s {}".format(nb_frames, t_to_df, t_from_df, t_from_df_pool, legacy))
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 100000]
+
+    print("{} detections per frame".format(DETECTIONS_PER_FRAME))
+    print("{:>8} {:>12} {:>12} {:>12} {:>12} {:>12}".format("frames", "to_df", "from_df_all", "(4 threads)",
+                                                           "legacy to_df", "legacy from"))
+    for nb_frames in sizes:
+        bench(nb_frames)
+
+
+if __name__ == "__main__":
+    main()
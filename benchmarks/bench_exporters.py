@@ -0,0 +1,77 @@
+"""
+Benchmark of the streaming exporters: time and peak Python memory (tracemalloc) of each format, against the
+DataFrame CSV export (TrackInfo.to_df + to_csv).
+
+    python benchmarks/bench_exporters.py [nb_frames ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+from ultimatelabeling.models import exporters
+from ultimatelabeling.models import track_info as track_info_module
+from ultimatelabeling.models.track_info import Detection, TrackInfo
+from ultimatelabeling.models.polygon import Bbox, Polygon, Keypoints
+
+DETECTIONS_PER_FRAME = 5
+
+
+def make_detections(rng, n):
+    return [Detection(int(rng.randint(0, 10)), i, Polygon(rng.uniform(0, 1000, 8) if i % 4 == 0 else []),
+                      Bbox(*rng.uniform(0, 2000, 4)), Keypoints()) for i in range(n)]
+
+
+def measured(f):
+    tracemalloc.start()
+    start = time.perf_counter()
+    f()
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return "{:8.2f} s {:7.1f} MB".format(duration, peak / 1e6)
+
+
+def dataframe_csv(track_info, file_names, path):
+    df = track_info.to_df(file_names)
+    df[["xc", "yc", "w", "h"]] = df[["xc", "yc", "w", "h"]].astype(int)
+    df.to_csv(path, sep=" ", header=False, index=False)
+
+
+def bench(nb_frames):
+    rng = np.random.RandomState(0)
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        track_info_module.OUTPUT_DIR = dir_name
+        track_info = TrackInfo("video")
+        file_names = ["{:06d}".format(i) for i in range(nb_frames)]
+        for file_name in file_names:
+            track_info.store.set_frame(file_name, make_detections(rng, DETECTIONS_PER_FRAME))
+        track_info.store.commit()
+
+        results = [measured(lambda: dataframe_csv(track_info, file_names, os.path.join(dir_name, "df.csv")))]
+        for fmt in exporters.EXPORTERS:
+            path = os.path.join(dir_name, "labels" + exporters.EXPORTERS[fmt].EXTENSION)
+            results.append(measured(lambda: exporters.export(track_info.store, file_names, path, fmt)))
+
+        track_info.close()
+        track_info.persistence.join()
+
+    print("{:>8} {}".format(nb_frames, " ".join(results)))
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 100000]
+
+    print("{} detections per frame".format(DETECTIONS_PER_FRAME))
+    print("{:>8} {}".format("frames", " ".join("{:>20}".format(name) for name in ["DataFrame csv"] + list(
+        exporters.EXPORTERS))))
+    for nb_frames in sizes:
+        bench(nb_frames)
+
+
+if __name__ == "__main__":
+    main()
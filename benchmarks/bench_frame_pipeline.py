@@ -0,0 +1,101 @@
+"""
+Benchmark of the frame pipeline of the viewer (decode, annotated layer, canvas): time, image buffers allocated and
+bytes copied per displayed frame, measured by buffer_stats, compared with the previous pipeline (conversion to RGB
+after the decode, copy of the frame before drawing, warp into a new 1500x1200 canvas).
+
+    python benchmarks/bench_frame_pipeline.py [nb_frames] [height] [width]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import cv2
+import numpy as np
+from ultimatelabeling.models.buffer_stats import BufferStats, buffer_stats
+from ultimatelabeling.models.compositor import Compositor
+from ultimatelabeling.models.frame_provider import read_image
+from ultimatelabeling.models.polygon import Bbox
+from ultimatelabeling.models.track_info import Detection
+from ultimatelabeling.models.viewport import Viewport
+from ultimatelabeling.utils import draw_detection
+
+CANVAS_SIZE = (1500, 1200)
+BACKGROUND = (38, 38, 38)
+
+
+def previous_pipeline(paths, draw, stats):
+    for path in paths:
+        img = cv2.imread(path)
+        stats.allocation(img.nbytes)
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        stats.allocation(img.nbytes)
+        stats.copy(img.nbytes)
+
+        annotated = img.copy()
+        stats.allocation(img.nbytes)
+        stats.copy(img.nbytes)
+        if draw is not None:
+            draw(annotated)
+
+        scale = CANVAS_SIZE[0] / img.shape[1]
+        canvas = cv2.warpAffine(annotated, np.float32([[scale, 0, 0], [0, scale, 0]]), CANVAS_SIZE,
+                                borderValue=BACKGROUND, flags=cv2.INTER_NEAREST)
+        stats.allocation(canvas.nbytes)
+        stats.copy(canvas.nbytes)
+        stats.frame()
+
+
+def pipeline(paths, draw, compositor, viewport):
+    for path in paths:
+        compositor.set_frame(read_image(path), draw)
+        viewport.render(compositor.get_image(), CANVAS_SIZE[0] / compositor.base.shape[1], (0, 0), CANVAS_SIZE,
+                        BACKGROUND)
+        buffer_stats.frame()
+
+
+def main():
+    nb_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    h = int(sys.argv[2]) if len(sys.argv) > 2 else 2160
+    w = int(sys.argv[3]) if len(sys.argv) > 3 else 3840
+
+    rng = np.random.RandomState(0)
+    detections = [Detection(track_id=i, bbox=Bbox(rng.uniform(0, w - 200), rng.uniform(0, h - 200), 150, 100))
+                  for i in range(50)]
+
+    def draw(img):
+        for detection in detections:
+            draw_detection(img, detection)
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        base = cv2.resize(rng.randint(0, 255, (h // 16, w // 16, 3)).astype(np.uint8), (w, h))
+        paths = []
+        for i in range(nb_frames):
+            paths.append(os.path.join(dir_name, "{:05d}.jpg".format(i)))
+            cv2.imwrite(paths[-1], np.roll(base, i, axis=1))
+
+        print("{} frames {}x{}, {}x{} canvas".format(nb_frames, w, h, *CANVAS_SIZE))
+        print("{:>10} {:>12} {:>10} {:>14} {:>14} {:>12}".format(
+            "", "detections", "time", "allocations", "allocated", "copied"))
+        compositor, viewport = Compositor(), Viewport()
+        for name, run in [("previous", previous_pipeline),
+                          ("current", lambda paths, draw, stats: pipeline(paths, draw, compositor, viewport))]:
+            for draw_function in [None, draw]:
+                stats = BufferStats() if name == "previous" else buffer_stats
+                run(paths[:2], draw_function, stats)  # buffers allocated once
+                stats.reset()
+
+                start = time.perf_counter()
+                run(paths, draw_function, stats)
+                elapsed = (time.perf_counter() - start) / nb_frames
+
+                result = stats.get_statistics()
+                print("{:>10} {:>12} {:>7.1f} ms {:>14.1f} {:>11.1f} MB {:>9.1f} MB".format(
+                    name, 0 if draw_function is None else len(detections), 1000 * elapsed,
+                    result["allocations_per_frame"], result["allocated_per_frame"] / 1e6,
+                    result["copied_per_frame"] / 1e6))
+
+
+if __name__ == "__main__":
+    main()
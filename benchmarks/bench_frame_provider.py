@@ -0,0 +1,71 @@
+"""
+Benchmark of the frame provider (frame_provider.FrameProvider): time spent waiting for the decoded frame during a
+playback, compared with decoding each frame on display (previous ImageWidget behavior), and decode time of the
+reduced resolutions.
+
+    python benchmarks/bench_frame_provider.py [nb_frames] [height] [width]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import cv2
+import numpy as np
+from ultimatelabeling.models.frame_provider import FrameProvider, read_image
+
+# Time between two frames of the player (PlayerThread.FRAME_RATE), during which the provider decodes the next ones
+DISPLAY_TIME = 0.05
+
+
+def play(get_image, prefetch, nb_frames, speed):
+    frames = range(nb_frames) if speed > 0 else range(nb_frames - 1, -1, -1)
+    start = time.perf_counter()
+    waiting = 0.
+    for frame in list(frames)[::abs(speed)]:
+        t = time.perf_counter()
+        get_image(frame)
+        waiting += time.perf_counter() - t
+        prefetch(frame, speed)
+        time.sleep(DISPLAY_TIME)
+    return waiting / len(list(frames)[::abs(speed)]), time.perf_counter() - start
+
+
+def main():
+    nb_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    h = int(sys.argv[2]) if len(sys.argv) > 2 else 2160
+    w = int(sys.argv[3]) if len(sys.argv) > 3 else 3840
+
+    rng = np.random.RandomState(0)
+    with tempfile.TemporaryDirectory() as dir_name:
+        base = cv2.resize(rng.randint(0, 255, (h // 16, w // 16, 3)).astype(np.uint8), (w, h))
+        paths = []
+        for i in range(nb_frames):
+            paths.append(os.path.join(dir_name, "{:05d}.jpg".format(i)))
+            cv2.imwrite(paths[-1], np.roll(base, i, axis=1))
+
+        print("{:>10} {:>12}".format("reduction", "decode"))
+        for reduction in [1, 2, 4, 8]:
+            start = time.perf_counter()
+            for path in paths[:10]:
+                read_image(path, reduction)
+            print("{:>10} {:>9.1f} ms".format(reduction, 1000 * (time.perf_counter() - start) / len(paths[:10])))
+
+        print("{} frames {}x{}, {:.0f} ms display time".format(nb_frames, w, h, 1000 * DISPLAY_TIME))
+        print("{:>20} {:>8} {:>16} {:>10}".format("", "speed", "wait per frame", "hit rate"))
+
+        for speed in [1, -1, 5]:
+            waiting, _ = play(lambda frame: read_image(paths[frame]), lambda frame, speed: None, nb_frames, speed)
+            print("{:>20} {:>8} {:>13.1f} ms {:>10}".format("decode on display", speed, 1000 * waiting, "-"))
+
+            provider = FrameProvider()
+            provider.set_file_names(paths)
+            waiting, _ = play(provider.get, provider.prefetch, nb_frames, speed)
+            print("{:>20} {:>8} {:>13.1f} ms {:>9.0%}".format("frame provider", speed, 1000 * waiting,
+                                                             provider.get_statistics()["hit_rate"]))
+            provider.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Micro-benchmark of the geometry types on the quadtree build and render paths.
+
+Reports the time per call, the peak memory allocated during a call and the number of memory blocks still
+allocated after it (tracemalloc).
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_geometry.py [nb_detections]
+"""
+import importlib.util
+import os
+import sys
+import timeit
+import tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+from ultimatelabeling.models.polygon import Bbox
+from ultimatelabeling.models.track_info import Detection
+from ultimatelabeling.models.detection_set import DetectionSet
+from ultimatelabeling.utils import draw_detection
+
+# Load image_viewer without the views package, which imports the trackers (torch)
+spec = importlib.util.spec_from_file_location(
+    "image_viewer", os.path.join(os.path.dirname(__file__), "..", "ultimatelabeling", "views", "image_viewer.py"))
+image_viewer = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(image_viewer)
+AnchorQuadTree, DetectionQuadTree = image_viewer.AnchorQuadTree, image_viewer.DetectionQuadTree
+
+W, H = 1920, 1080
+
+
+def make_detections(n):
+    rng = np.random.RandomState(0)
+    xy = rng.uniform(0, [W - 100, H - 100], (n, 2))
+    wh = rng.uniform(10, 100, (n, 2))
+    return DetectionSet([Detection(int(rng.randint(0, 10)), i, bbox=Bbox(*xy[i], *wh[i])) for i in range(n)])
+
+
+def measure_allocations(f):
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    result = f()
+    _, peak = tracemalloc.get_traced_memory()
+    stats = tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+    tracemalloc.stop()
+    del result
+    return peak, sum(max(s.count_diff, 0) for s in stats)
+
+
+def bench(name, f, number=10):
+    t = min(timeit.repeat(f, number=number, repeat=3)) / number
+    peak, blocks = measure_allocations(f)
+    print("{:<26} {:8.2f} ms {:10.1f} KB peak {:8d} blocks kept".format(name, 1000 * t, peak / 1024, blocks))
+
+
+def build_anchors(detections):
+    quadtree = AnchorQuadTree(Bbox(0, 0, W, H))
+    quadtree.build_quadtree(detections)
+    return quadtree
+
+
+def build_detections(detections):
+    quadtree = DetectionQuadTree(Bbox(0, 0, W, H))
+    quadtree.build_quadtree(detections)
+    return quadtree
+
+
+def render(detections, img):
+    for detection in detections:
+        draw_detection(img, detection, label="car, {}".format(detection.track_id))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    detections = make_detections(n)
+    img = np.zeros((H, W, 3), dtype=np.uint8)
+
+    print("{} detections".format(n))
+    bench("anchor quadtree build", lambda: build_anchors(detections))
+    bench("detection quadtree build", lambda: build_detections(detections))
+    bench("render", lambda: render(detections, img))
+    bench("get_anchors", lambda: [d.bbox.get_anchors() for d in detections])
+    bench("bbox list (one by one)", lambda: [Bbox(*xywh) for xywh in detections.boxes])
+    bench("bbox list (batch)", lambda: Bbox.from_xywh(detections.boxes))
+
+
+if __name__ == "__main__":
+    main()
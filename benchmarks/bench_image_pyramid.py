@@ -0,0 +1,81 @@
+"""
+Benchmark of the tiled pyramid cache (image_pyramid.PyramidCache): time to render a 1500x1200 view of a large frame
+at several zooms, from the decoded full frame (previous ImageWidget behavior) and from the tiles of its pyramid.
+
+    python benchmarks/bench_image_pyramid.py [height] [width]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import cv2
+import numpy as np
+from ultimatelabeling.models.frame_provider import read_image
+from ultimatelabeling.models.image_pyramid import PyramidCache
+
+CANVAS_SIZE = (1500, 1200)
+
+
+def render_full(image_path, scale, x, y):
+    img = read_image(image_path)
+    M = np.float32([[scale, 0, -x * scale], [0, scale, -y * scale]])
+    return cv2.warpAffine(img, M, CANVAS_SIZE, flags=cv2.INTER_NEAREST)
+
+
+def render_tiles(cache, image_path, scale, x, y):
+    pyramid = cache.open(image_path)
+    level = pyramid.get_level(scale)
+    level_scale = pyramid.get_level_scale(level)
+    w, h = CANVAS_SIZE[0] / scale, CANVAS_SIZE[1] / scale
+    region, (rx, ry) = cache.get_region(pyramid, level, x * level_scale, y * level_scale, w * level_scale,
+                                        h * level_scale)
+    s = scale / level_scale
+    M = np.float32([[s, 0, (rx - x * level_scale) * s], [0, s, (ry - y * level_scale) * s]])
+    return cv2.warpAffine(region, M, CANVAS_SIZE, flags=cv2.INTER_NEAREST)
+
+
+def main():
+    h = int(sys.argv[1]) if len(sys.argv) > 1 else 4320
+    w = int(sys.argv[2]) if len(sys.argv) > 2 else 7680
+
+    rng = np.random.RandomState(0)
+    with tempfile.TemporaryDirectory() as dir_name:
+        image_path = os.path.join(dir_name, "00000.jpg")
+        cv2.imwrite(image_path, cv2.resize(rng.randint(0, 255, (h // 16, w // 16, 3)).astype(np.uint8), (w, h)))
+
+        cache = PyramidCache(os.path.join(dir_name, "pyramids"))
+        start = time.perf_counter()
+        cache.request([image_path])
+        cache.wait()
+        print("{}x{} frame, pyramid built in {:.2f} s, {:.1f} MB".format(
+            w, h, time.perf_counter() - start, os.path.getsize(cache.get_path(image_path)) / 1e6))
+
+        print("{:>8} {:>14} {:>14} {:>14}".format("zoom", "full frame", "tiles (cold)", "tiles (warm)"))
+        for scale in [1500 / w, 0.5, 1, 4]:
+            x, y = w / 3, h / 3
+            if scale == 1500 / w:
+                x, y = 0, 0
+
+            start = time.perf_counter()
+            render_full(image_path, scale, x, y)
+            full = time.perf_counter() - start
+
+            cache.tiles.clear()
+            cache.memory_size = 0
+            start = time.perf_counter()
+            render_tiles(cache, image_path, scale, x, y)
+            cold = time.perf_counter() - start
+
+            start = time.perf_counter()
+            render_tiles(cache, image_path, scale, x + 10 / scale, y)  # pan
+            warm = time.perf_counter() - start
+
+            print("{:>8.3f} {:>11.1f} ms {:>11.1f} ms {:>11.1f} ms".format(scale, 1000 * full, 1000 * cold,
+                                                                         1000 * warm))
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark of the txt annotation reader/writer against the pandas path.
+
+    python benchmarks/bench_txt_format.py [nb_detections]
+"""
+import os
+import sys
+import tempfile
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+from ultimatelabeling.models.track_info import Detection, TrackInfo
+from ultimatelabeling.models.polygon import Bbox, Polygon, Keypoints
+from ultimatelabeling.models.txt_format import COLUMNS, read_txt, format_txt
+
+
+def make_detections(n):
+    rng = np.random.RandomState(0)
+    return [Detection(int(rng.randint(0, 10)), i, Polygon(rng.uniform(0, 1000, 8) if i % 4 == 0 else []),
+                      Bbox(*rng.uniform(0, 2000, 4)), Keypoints()) for i in range(n)]
+
+
+def pandas_write(detections, path):
+    return TrackInfo.detections_to_df(detections).to_csv(path, index=None, header=False, sep=" ")
+
+
+def pandas_read(path):
+    return [Detection.from_df(row) for _, row in
+            pd.read_csv(path, header=None, names=COLUMNS, na_filter=False, sep=" ").iterrows()]
+
+
+def bench(name, f, number=20):
+    t = min(timeit.repeat(f, number=number, repeat=3)) / number
+    print("{:<20} {:8.2f} ms".format(name, 1000 * t))
+    return t
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    detections = make_detections(n)
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        path = os.path.join(dir_name, "00000.txt")
+        pandas_write(detections, path)
+
+        print("{} detections per frame".format(n))
+        t_pandas = bench("read (pandas)", lambda: pandas_read(path))
+        t_fast = bench("read (txt_format)", lambda: read_txt(path).to_detections())
+        print("speedup: {:.1f}x".format(t_pandas / t_fast))
+
+        t_pandas = bench("write (pandas)", lambda: pandas_write(detections, None))
+        t_fast = bench("write (txt_format)", lambda: format_txt(detections))
+        print("speedup: {:.1f}x".format(t_pandas / t_fast))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark of the listing of the frames of a video: glob and natural sort (previous State.update_file_names) versus
+the video manifest (video_manifest.VideoManifest).
+
+    python benchmarks/bench_video_manifest.py [nb_frames ...]
+"""
+import glob
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import cv2
+import numpy as np
+from ultimatelabeling import utils
+from ultimatelabeling.models.video_manifest import VideoManifest
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def glob_sort(dir_name):
+    image_paths = glob.glob(os.path.join(dir_name, "*.jpg"))
+    image_paths.extend(glob.glob(os.path.join(dir_name, "*.png")))
+    image_paths = sorted(image_paths, key=utils.natural_sort_key)
+    return [os.path.splitext(os.path.basename(path))[0] for path in image_paths]
+
+
+def bench(nb_frames):
+    data = cv2.imencode(".jpg", np.zeros((1080, 1920, 3), dtype=np.uint8))[1].tobytes()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dir_name = os.path.join(tmp_dir, "video")
+        os.makedirs(dir_name)
+        for i in range(nb_frames):
+            with open(os.path.join(dir_name, "{:06d}.jpg".format(i)), "wb") as f:
+                f.write(data)
+        mtime = time.time() - 60
+        os.utime(dir_name, (mtime, mtime))
+
+        t_glob = timed(lambda: glob_sort(dir_name))
+        t_scan = timed(lambda: VideoManifest(dir_name).scan())
+
+        manifest = VideoManifest(dir_name)
+        t_build = timed(lambda: manifest.build() and manifest.save())
+        t_load = timed(lambda: VideoManifest(dir_name).load())
+
+    print("{:>8} {:10.3f} s {:10.3f} s {:10.3f} s {:10.3f} s".format(nb_frames, t_glob, t_scan, t_build, t_load))
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 100000]
+
+    print("{:>8} {:>12} {:>12} {:>12} {:>12}".format("frames", "glob+sort", "scan", "build", "load"))
+    for nb_frames in sizes:
+        bench(nb_frames)
+
+
+if __name__ == "__main__":
+    main()
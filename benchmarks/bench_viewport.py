@@ -0,0 +1,55 @@
+"""
+Benchmark of the viewport rendering (viewport.Viewport): time of a render (pan or drag) for several image and widget
+sizes, compared with the warp of the whole image into a new 1500x1200 canvas (previous
+ImageWidget.update_zoom_offset). Runs without a display.
+
+    python benchmarks/bench_viewport.py [nb_renders]
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import cv2
+import numpy as np
+from ultimatelabeling.models.viewport import Viewport
+
+IMAGE_SIZES = [(1080, 1920), (2160, 3840), (4320, 7680)]
+WIDGET_SIZES = [(800, 600), (1500, 1200), (2560, 1440)]
+ZOOMS = [1, 4]
+BACKGROUND = (38, 38, 38)
+
+
+def warp(img, scale, offset, canvas_size):
+    M = np.float32([[scale, 0, offset[0]], [0, scale, offset[1]]])
+    return cv2.warpAffine(img, M, (1500, 1200), borderValue=BACKGROUND, flags=cv2.INTER_NEAREST)
+
+
+def time_renders(render, img, scale, canvas_size, nb_renders):
+    start = time.perf_counter()
+    for i in range(nb_renders):
+        render(img, scale, (-img.shape[1] / 4 - i, -img.shape[0] / 4), canvas_size)  # pan by one pixel
+    return (time.perf_counter() - start) / nb_renders
+
+
+def main():
+    nb_renders = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    print("{:>12} {:>12} {:>6} {:>14} {:>14}".format("image", "widget", "zoom", "whole image", "viewport"))
+    for h, w in IMAGE_SIZES:
+        img = cv2.resize(np.random.RandomState(0).randint(0, 255, (h // 16, w // 16, 3)).astype(np.uint8), (w, h))
+        for canvas_size in WIDGET_SIZES:
+            viewport = Viewport()
+            for zoom in ZOOMS:
+                # Zoom 1 shows the whole image in the widget width (ImageWidget.img_scale)
+                scale = zoom * canvas_size[0] / w
+                old = time_renders(warp, img, scale, canvas_size, nb_renders)
+                new = time_renders(lambda img, scale, offset, size: viewport.render(img, scale, offset, size,
+                                                                                    BACKGROUND),
+                                   img, scale, canvas_size, nb_renders)
+                print("{:>12} {:>12} {:>6} {:>11.2f} ms {:>11.2f} ms".format(
+                    "{}x{}".format(w, h), "{}x{}".format(*canvas_size), zoom, 1000 * old, 1000 * new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark of the bulk YOLO label import (yolo_import.import_yolo_labels) on folders of label files.
+
+    python benchmarks/bench_yolo_import.py [nb_files ...]
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+from ultimatelabeling.models import track_info as track_info_module
+from ultimatelabeling.models.track_info import TrackInfo
+from ultimatelabeling.models.yolo_import import import_yolo_labels
+
+DETECTIONS_PER_FRAME = 5
+
+
+def bench(nb_files):
+    rng = np.random.RandomState(0)
+
+    with tempfile.TemporaryDirectory() as dir_name:
+        labels_dir = os.path.join(dir_name, "labels")
+        os.makedirs(labels_dir)
+        file_names = ["{:06d}".format(i) for i in range(nb_files)]
+        for file_name in file_names:
+            with open(os.path.join(labels_dir, file_name + ".txt"), "w") as f:
+                for class_id, box in zip(rng.randint(0, 10, DETECTIONS_PER_FRAME),
+                                         rng.uniform(0, 1, (DETECTIONS_PER_FRAME, 4))):
+                    f.write("{} {} {} {} {}\n".format(class_id, *box))
+
+        track_info_module.OUTPUT_DIR = os.path.join(dir_name, "output")
+        track_info = TrackInfo("video")
+
+        start = time.perf_counter()
+        import_yolo_labels(track_info, labels_dir, file_names, (1080, 1920))
+        t_import = time.perf_counter() - start
+
+        start = time.perf_counter()
+        track_info.save_to_disk()
+        t_save = time.perf_counter() - start
+
+        track_info.close()
+        track_info.persistence.join()
+
+    print("{:>8} {:10.2f} s {:10.2f} s".format(nb_files, t_import, t_save))
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 100000]
+
+    print("{} detections per frame".format(DETECTIONS_PER_FRAME))
+    print("{:>8} {:>12} {:>12}".format("files", "import", "save"))
+    for nb_files in sizes:
+        bench(nb_files)
+
+
+if __name__ == "__main__":
+    main()
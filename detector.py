@@ -19,9 +19,11 @@ from detection.yolov3.image import letterbox_image
 import numpy as np
 import openpifpaf.network
 import openpifpaf
-import glob
 from config import OUTPUT_DIR
 from class_names import DEFAULT_CLASS_NAMES
+from ultimatelabeling.models.video_manifest import load_manifest
+from ultimatelabeling.models.track_info import TrackInfo
+from ultimatelabeling.models.commit_queue import CommitQueue
 import math
 import pandas as pd
 
@@ -254,23 +256,27 @@ class DetectionHandler():
             write_running_info(error="No such file or directory: {}".format(sequence))
             return
 
-        file_names = sorted(glob.glob('{}/*.jpg'.format(sequence)), key=utils.natural_sort_key)
+        # Same frames as in the GUI: the jpg and png images of the sequence, in natural order
+        manifest = load_manifest(sequence)
+        file_names = manifest.get_paths()
         video_name = os.path.basename(sequence)
         nb_frames = len(file_names)
 
+        # Single writer: the detections are written by a commit queue (under the lock of track_info) while the next
+        # frames are detected, the store commits are locked against the GUI process opening the same video
         track_info = TrackInfo(video_name)
+        commit_queue = CommitQueue()
         start_time = datetime.datetime.now()
 
         for frame, detections in enumerate(detector.detect_batch(file_names, crop_area)):
-            file_path = file_names[frame]
-            base = os.path.basename(file_path)
-            file_name = os.path.splitext(base)[0]
+            file_name = manifest.stems[frame]
 
-            track_info.write_detections(file_name, detections)
+            commit_queue.submit(track_info.write_detections, file_name, detections)
             write_running_info(video_name, start_time, frame, nb_frames)
 
         torch.cuda.empty_cache()
-        track_info.save_to_disk()
+        commit_queue.barrier()
+        track_info.close()
 
     def write_running_info(video_name="", start_time="", frame=0, nb_frames=0, error=None):
         data = {
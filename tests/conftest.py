@@ -0,0 +1,42 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from ultimatelabeling.models.columnar_store import ColumnarStore
+from ultimatelabeling.models.track_info import Detection
+from ultimatelabeling.models.polygon import Bbox, Polygon, Keypoints
+
+
+@pytest.fixture
+def make_detections():
+    def make(n, offset=0):
+        return [Detection(class_id=i % 3, track_id=offset + i, bbox=Bbox(i, 2 * i, 10 + i, 20 + i),
+                          polygon=Polygon([i, i, i + 1, i + 1] if i % 2 else []),
+                          keypoints=Keypoints([i, i, 1.] if i % 3 == 0 else [])) for i in range(n)]
+    return make
+
+
+@pytest.fixture
+def assert_same_detections():
+    def check(a, b):
+        assert len(a) == len(b)
+        for d1, d2 in zip(a, b):
+            assert (d1.track_id, d1.class_id) == (d2.track_id, d2.class_id)
+            assert d1.bbox.xywh.tolist() == d2.bbox.xywh.tolist()
+            assert d1.polygon.coords.tolist() == d2.polygon.coords.tolist()
+            assert d1.keypoints.coords.tolist() == d2.keypoints.coords.tolist()
+    return check
+
+
+@pytest.fixture
+def make_video(make_detections):
+    def make(output_dir, data_dir, video_name, nb_frames):
+        store = ColumnarStore(str(output_dir / video_name))
+        os.makedirs(str(data_dir / video_name))
+        for i in range(nb_frames):
+            file_name = "{:05d}".format(i)
+            store.set_frame(file_name, make_detections(i + 1, offset=10 * i))
+            cv2.imwrite(str(data_dir / video_name / (file_name + ".jpg")), np.zeros((40, 80, 3), dtype=np.uint8))
+        store.commit()
+        return store
+    return make
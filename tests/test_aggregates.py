@@ -0,0 +1,89 @@
+from collections import Counter
+import numpy as np
+import pytest
+from ultimatelabeling.models import track_info as track_info_module
+from ultimatelabeling.models.detection_set import Detection
+from ultimatelabeling.models.polygon import Bbox
+from ultimatelabeling.models.track_info import TrackInfo
+
+
+def expected_summary(track_info, file_names):
+    """
+    Statistics recomputed from scratch, used as reference
+    """
+    frames = [track_info.get_detections(file_name) for file_name in file_names]
+    class_counts = Counter(class_id for detections in frames for class_id in detections.class_ids.tolist())
+    track_lengths = Counter(track_id for detections in frames for track_id in set(detections.track_ids.tolist()))
+    density = [len(detections) for detections in frames]
+    return {
+        "nb_frames": len(file_names),
+        "nb_detections": sum(density),
+        "nb_tracks": len(track_lengths),
+        "nb_empty_frames": density.count(0),
+        "mean_density": sum(density) / len(file_names),
+        "max_density": max(density),
+        "class_counts": dict(class_counts)
+    }, dict(track_lengths)
+
+
+class TestAggregates:
+
+    @pytest.fixture
+    def track_info(self, tmp_path, monkeypatch, make_detections):
+        monkeypatch.setattr(track_info_module, "OUTPUT_DIR", str(tmp_path))
+        track_info = TrackInfo("video")
+        file_names = ["{:05d}".format(i) for i in range(8)]
+        for i, file_name in enumerate(file_names[:6]):
+            track_info.set_frame(file_name, make_detections(i, offset=i % 2))
+        track_info.store.commit()
+
+        track_info.aggregates.set_file_paths(["data/video/{}.jpg".format(file_name) for file_name in file_names])
+        yield track_info, file_names
+        track_info.close()
+
+    def check(self, track_info, file_names):
+        summary, track_lengths = expected_summary(track_info, file_names)
+        aggregates = track_info.aggregates
+        assert aggregates.get_summary() == summary
+        assert aggregates.get_track_lengths() == track_lengths
+        assert aggregates.get_density().tolist() == [len(track_info.get_detections(f)) for f in file_names]
+        assert aggregates.get_empty_frames().tolist() == [i for i, f in enumerate(file_names)
+                                                          if len(track_info.get_detections(f)) == 0]
+
+    def test_build(self, track_info):
+        track_info, file_names = track_info
+        self.check(track_info, file_names)
+        assert track_info.aggregates.get_track_length(1) == 5
+        assert track_info.aggregates.get_nb_empty_frames() == 3
+
+    def test_incremental_updates(self, track_info, make_detections):
+        track_info, file_names = track_info
+        aggregates = track_info.aggregates
+        aggregates.update()
+
+        track_info.load_detections(file_names[6])
+        track_info.add_detection(Detection(class_id=7, track_id=100, bbox=Bbox(0, 0, 5, 5)))
+        track_info.add_detection(Detection(class_id=7, track_id=100, bbox=Bbox(1, 1, 5, 5)), file_names[1])
+        track_info.remove_detection(1, file_names[3])
+        track_info.write_detections(file_names[5], [])
+        track_info.set_frames({file_names[7]: make_detections(2, offset=100)})
+        track_info.remove_track(2, file_names[2:])
+        track_info.modify_track_class_id(3, 9, file_names[2:])
+        track_info.modify_track_id(100, 101, file_names[6])
+
+        # Only the edited frames are recounted
+        assert aggregates.stale == {1, 2, 3, 4, 5, 6, 7}
+        aggregates.get_columns = None
+        self.check(track_info, file_names)
+        assert aggregates.get_class_counts()[9] == 2
+        assert 2 not in aggregates.get_track_lengths()
+
+    def test_rebuild_on_new_frames(self, track_info):
+        track_info, file_names = track_info
+        aggregates = track_info.aggregates
+        aggregates.update()
+
+        aggregates.set_file_paths(["data/video/{}.jpg".format(file_name) for file_name in file_names[2:]])
+        assert not aggregates.built
+        assert aggregates.get_nb_detections() == sum(range(2, 6))
+        assert np.array_equal(aggregates.get_density(), [2, 3, 4, 5, 0, 0])
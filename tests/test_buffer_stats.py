@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+from ultimatelabeling.models.buffer_stats import buffer_stats
+from ultimatelabeling.models.compositor import Compositor
+from ultimatelabeling.models.frame_provider import read_image
+from ultimatelabeling.models.polygon import Bbox
+from ultimatelabeling.models.track_info import Detection
+from ultimatelabeling.models.viewport import Viewport
+from ultimatelabeling.utils import draw_detection
+
+
+class TestBufferStats:
+
+    def display(self, paths, draw):
+        """
+        Frame pipeline of ImageWidget: decode, compositing, viewport
+        """
+        compositor, viewport = Compositor(), Viewport()
+        for i, path in enumerate(paths):
+            compositor.set_frame(read_image(path), draw)
+            viewport.render(compositor.get_image(), 0.5, (0, 0), (80, 60), (38, 38, 38))
+            buffer_stats.frame()
+            if i == 1:
+                buffer_stats.reset()  # buffers allocated by the first frames (the canvases are used in turn)
+
+    def test_frame_pipeline(self, tmp_path):
+        paths = []
+        for i in range(5):
+            paths.append(str(tmp_path / "{}.png".format(i)))
+            cv2.imwrite(paths[-1], np.full((120, 160, 3), i, dtype=np.uint8))
+        frame_size = 120 * 160 * 3
+
+        # Without annotations, the decoded frame is scaled directly into the canvas
+        self.display(paths, None)
+        stats = buffer_stats.get_statistics()
+        assert stats["nb_frames"] == 3
+        assert stats["allocations_per_frame"] == 1 and stats["allocated_per_frame"] == frame_size  # decode
+        assert stats["copied_per_frame"] == 60 * 80 * 3
+
+        # The annotated layer is a copy of the frame, into the same buffer
+        self.display(paths, lambda img: draw_detection(img, Detection(bbox=Bbox(10, 10, 50, 50))))
+        stats = buffer_stats.get_statistics()
+        assert stats["allocations_per_frame"] == 1
+        assert stats["copied_per_frame"] == frame_size + 60 * 80 * 3
+
+        buffer_stats.reset()
+        assert buffer_stats.get_statistics()["copies_per_frame"] == 0
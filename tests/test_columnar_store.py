@@ -0,0 +1,97 @@
+import os
+from ultimatelabeling.models.columnar_store import ColumnarStore
+
+
+class TestColumnarStore:
+
+    def test_commit_and_reload(self, tmp_path, make_detections, assert_same_detections):
+        store = ColumnarStore(str(tmp_path))
+        frames = {"{:05d}".format(i): make_detections(i, offset=10 * i) for i in range(5)}
+        for file_name, detections in frames.items():
+            store.set_frame(file_name, detections)
+        store.commit()
+
+        store = ColumnarStore(str(tmp_path))
+        for file_name, detections in frames.items():
+            assert_same_detections(store.get_frame(file_name), detections)
+            assert store.get_track_ids(file_name).tolist() == sorted(d.track_id for d in detections)
+
+        assert len(store.get_frame("missing")) == 0
+
+    def test_remove_frame(self, tmp_path, make_detections, assert_same_detections):
+        store = ColumnarStore(str(tmp_path))
+        for i in range(3):
+            store.set_frame("{:05d}".format(i), make_detections(2, offset=10 * i))
+        store.commit()
+
+        store.remove_frame("00001")
+        assert not store.has_frame("00001") and store.get_file_names() == ["00000", "00002"]
+        assert store.get_track_frames(10) == set()
+        store.commit()
+
+        store = ColumnarStore(str(tmp_path))
+        assert store.get_file_names() == ["00000", "00002"]
+        assert len(store.columns["frame"]) == 4
+        assert_same_detections(store.get_frame("00002"), make_detections(2, offset=20))
+
+        # A frame added back is kept
+        store.remove_frame("00002")
+        store.set_frame("00002", make_detections(1))
+        store.commit()
+        assert ColumnarStore(str(tmp_path)).get_file_names() == ["00000", "00002"]
+
+    def test_overwrite_frame(self, tmp_path, make_detections, assert_same_detections):
+        store = ColumnarStore(str(tmp_path))
+        store.set_frame("00000", make_detections(3))
+        store.set_frame("00001", make_detections(4))
+        store.commit()
+
+        store.set_frame("00000", make_detections(1, offset=7))
+        store.commit()
+
+        store = ColumnarStore(str(tmp_path))
+        assert_same_detections(store.get_frame("00000"), make_detections(1, offset=7))
+        assert_same_detections(store.get_frame("00001"), make_detections(4))
+
+    def test_unchanged_frame_is_not_dirty(self, tmp_path, make_detections):
+        store = ColumnarStore(str(tmp_path))
+        store.set_frame("00000", make_detections(3))
+        store.commit()
+
+        store.set_frame("00000", make_detections(3))
+        assert not store.dirty
+
+    def test_legacy_txt_roundtrip(self, tmp_path, make_detections, assert_same_detections):
+        store = ColumnarStore(str(tmp_path / "a"))
+        store.set_frame("00000", make_detections(4))
+        store.set_frame("00001", [])
+        store.export_txt(str(tmp_path / "txt"))
+
+        assert os.path.exists(str(tmp_path / "txt" / "00000.txt"))
+
+        imported = ColumnarStore(str(tmp_path / "b"))
+        assert imported.import_txt(str(tmp_path / "txt")) == 2
+        imported.commit()
+        assert_same_detections(imported.get_frame("00000"), make_detections(4))
+        assert len(imported.get_frame("00001")) == 0
+
+    def test_track_index(self, tmp_path, make_detections):
+        store = ColumnarStore(str(tmp_path))
+        for i in range(6):
+            store.set_frame("{:05d}".format(i), make_detections(3))
+        store.commit()
+
+        assert store.get_track_frames(1) == {"{:05d}".format(i) for i in range(6)}
+
+        store.set_frame("00002", make_detections(1))
+        assert "00002" not in store.get_track_frames(1)
+
+        store.remove_track(1, ["00004", "00005"])
+        store.modify_track_class_id(2, 7, ["00000", "00001"])
+        store.commit()
+
+        store = ColumnarStore(str(tmp_path))
+        assert store.get_track_frames(1) == {"00000", "00001", "00003"}
+        assert [d.track_id for d in store.get_frame("00005")] == [0, 2]
+        assert [d.class_id for d in store.get_frame("00000")] == [0, 1, 7]
+        assert [d.class_id for d in store.get_frame("00003")] == [0, 1, 2]
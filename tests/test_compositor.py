@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+import pytest
+from ultimatelabeling.models.compositor import Compositor, get_extent
+from ultimatelabeling.models.track_info import Detection
+from ultimatelabeling.models.polygon import Bbox, Keypoints
+from ultimatelabeling.utils import draw_detection, scale_detection
+
+
+def draw_boxes(img):
+    for i in range(20):
+        draw_detection(img, Detection(track_id=i, bbox=Bbox(10 + 15 * i, 20 + 7 * i, 40, 30)))
+
+
+class TestCompositor:
+
+    @pytest.fixture
+    def base(self):
+        base = np.random.RandomState(0).randint(0, 255, (240, 320, 3)).astype(np.uint8)
+        base.flags.writeable = False
+        return base
+
+    def test_get_extent(self):
+        assert get_extent(Detection(bbox=Bbox(10, 20, 30, 40))) == (10, 20, 40, 60)
+        assert get_extent(Detection(bbox=Bbox(10, 20, 30, 40), keypoints=Keypoints([5, 80, 1]))) == (5, 20, 40, 80)
+        assert get_extent(Detection()) is None
+
+    def test_overlay(self, base):
+        compositor = Compositor()
+        compositor.set_frame(base, draw_boxes)
+
+        expected = base.copy()
+        draw_boxes(expected)
+        assert np.array_equal(compositor.get_image(), expected)
+        assert not compositor.editing
+
+        # The overlay buffer is reused by the next frame
+        overlay = compositor.overlay
+        compositor.set_frame(base, lambda img: None)
+        assert compositor.overlay is overlay and np.array_equal(overlay, base)
+
+        # Nothing to draw: the overlay is the frame, not a copy
+        compositor.set_frame(base)
+        assert compositor.get_image() is base
+
+    def test_dynamic(self, base):
+        compositor = Compositor(transparency=0.8)
+        compositor.set_frame(base, draw_boxes)
+
+        detection = Detection(track_id=50, bbox=Bbox(100, 100, 50, 40))
+        dirty = []
+        for dx in [0, 5, 12, 40, -60]:
+            moved = scale_detection(detection, 1, (-dx, -dx // 2))
+            dirty.append(compositor.draw_dynamic(
+                lambda img, offset: draw_detection(img, scale_detection(moved, 1, offset), draw_anchors=False),
+                get_extent(moved)))
+
+            # Same image as drawing on a copy of the overlay and blending the whole frame
+            expected = compositor.overlay.copy()
+            draw_detection(expected, moved, draw_anchors=False)
+            expected = cv2.addWeighted(base, 0.8, expected, 0.2, 0)
+            assert np.array_equal(compositor.get_image(), expected)
+
+        # Only the previous and new positions (with the margin of the drawing) are recomposited
+        assert dirty[2] == (105 - 8, 103 - 8, 162 + 9, 146 + 9)
+
+        compositor.set_frame(base, draw_boxes)
+        assert not compositor.editing and compositor.get_image() is compositor.overlay
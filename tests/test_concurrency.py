@@ -0,0 +1,110 @@
+import multiprocessing
+import threading
+import time
+from ultimatelabeling.models.columnar_store import ColumnarStore
+from ultimatelabeling.models.commit_queue import CommitQueue
+from ultimatelabeling.models.locking import VideoLock
+
+
+def commit_frame(dir_name, file_name, detections):
+    # Runs in another process
+    store = ColumnarStore(dir_name)
+    store.set_frame(file_name, detections)
+    store.commit()
+
+
+def hold_write_lock(dir_name, locked, release):
+    lock = VideoLock(dir_name)
+    with lock.write():
+        locked.set()
+        release.wait(10)
+
+
+class TestVideoLock:
+
+    def test_readers_and_writer(self, tmp_path):
+        lock = VideoLock(str(tmp_path))
+        events = []
+
+        def writer():
+            with lock.write():
+                events.append("write")
+
+        with lock.read():
+            with lock.read():
+                thread = threading.Thread(target=writer)
+                thread.start()
+                time.sleep(0.05)
+                assert events == []  # the writer waits for the readers
+        thread.join(1)
+        assert events == ["write"]
+
+        with lock.write():
+            with lock.read():  # reentrant for the writer
+                pass
+
+    def test_lock_is_shared_between_processes(self, tmp_path):
+        ctx = multiprocessing.get_context("spawn")
+        locked, release = ctx.Event(), ctx.Event()
+        process = ctx.Process(target=hold_write_lock, args=(str(tmp_path), locked, release))
+        process.start()
+        assert locked.wait(10)
+
+        lock = VideoLock(str(tmp_path))
+        acquired = []
+        thread = threading.Thread(target=lambda: (lock.acquire_read(), acquired.append(True), lock.release_read()))
+        thread.start()
+        time.sleep(0.1)
+        assert acquired == []
+
+        release.set()
+        thread.join(10)
+        process.join(10)
+        assert acquired == [True]
+
+
+class TestConcurrentCommits:
+
+    def test_commit_keeps_frames_of_other_processes(self, tmp_path, make_detections, assert_same_detections):
+        store = ColumnarStore(str(tmp_path))
+        store.set_frame("00000", make_detections(3))
+        store.set_frame("00001", make_detections(2))
+        store.commit()
+
+        store.set_frame("00001", make_detections(4))
+        store.remove_track(0, ["00000"])
+
+        process = multiprocessing.get_context("spawn").Process(
+            target=commit_frame, args=(str(tmp_path), "00002", make_detections(2, offset=100)))
+        process.start()
+        process.join(30)
+        assert process.exitcode == 0
+
+        store.commit()
+
+        store = ColumnarStore(str(tmp_path))
+        assert store.get_file_names() == ["00000", "00001", "00002"]
+        assert [d.track_id for d in store.get_frame("00000")] == [1, 2]
+        assert_same_detections(store.get_frame("00001"), make_detections(4))
+        assert_same_detections(store.get_frame("00002"), make_detections(2, offset=100))
+
+
+class TestCommitQueue:
+
+    def test_edits_are_applied_in_order(self):
+        queue = CommitQueue()
+        applied = []
+        assert queue.barrier(timeout=1)
+
+        for i in range(100):
+            queue.submit(applied.append, i)
+        assert queue.barrier(timeout=5)
+        assert applied == list(range(100))
+
+    def test_errors_dont_stop_the_queue(self):
+        queue = CommitQueue()
+        applied = []
+        queue.submit(lambda: 1 / 0)
+        queue.submit(applied.append, 1)
+        assert queue.barrier(timeout=5)
+        assert applied == [1]
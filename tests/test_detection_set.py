@@ -0,0 +1,65 @@
+import numpy as np
+from ultimatelabeling.models.detection_set import Detection, DetectionSet
+from ultimatelabeling.models.polygon import Bbox, Polygon, Keypoints
+
+
+class TestDetectionSet:
+
+    def test_copy_of_detections(self, make_detections, assert_same_detections):
+        detections = make_detections(5)
+        detection_set = DetectionSet(detections)
+
+        assert_same_detections(list(detection_set), detections)
+        assert detection_set.track_ids.tolist() == [0, 1, 2, 3, 4]
+        assert detection_set.boxes.shape == (5, 4)
+
+    def test_views_write_to_arrays(self, make_detections):
+        detection_set = DetectionSet(make_detections(3))
+        detection = detection_set[1]
+
+        assert detection_set[1] is detection
+        detection.class_id = 7
+        detection.bbox.pos = [5, 6]
+        detection.polygon = Polygon([1, 2, 3, 4, 5, 6])
+
+        assert detection_set.class_ids[1] == 7
+        assert detection_set.boxes[1].tolist() == [5, 6, 11, 21]
+        assert detection_set.get_polygon(1).tolist() == [1, 2, 3, 4, 5, 6]
+        assert detection_set.get_polygon(2).tolist() == []
+
+    def test_list_operations(self, make_detections):
+        detection_set = DetectionSet(make_detections(4))
+        first, last = detection_set[0], detection_set[3]
+
+        removed = detection_set.pop(1)
+        assert removed not in detection_set and removed.track_id == 1
+        assert detection_set.index(last) == 2
+
+        detection = Detection(1, 9, bbox=Bbox(1, 1, 2, 2), keypoints=Keypoints([1, 1, 2]))
+        detection_set.append(detection)
+        assert detection in detection_set and detection_set.index(detection) == 3
+        assert detection_set.get_keypoints(3).tolist() == [1, 1, 2]
+
+        detection_set.remove(first)
+        assert first.track_id == 0 and first not in detection_set
+        assert [d.track_id for d in detection_set] == [2, 3, 9]
+
+        detection_set[:] = [d for d in detection_set if d.track_id != 3]
+        assert [d.track_id for d in detection_set] == [2, 9]
+        assert detection_set[1] is detection
+
+    def test_vectorized_operations(self, make_detections):
+        detection_set = DetectionSet(make_detections(4))
+
+        assert detection_set.lookup(2) == 2 and detection_set.lookup(10) == -1
+        assert detection_set.filter(detection_set.class_ids == 0).track_ids.tolist() == [0, 3]
+        assert detection_set.contains_point([2.5, 4.5]).tolist() == [True, True, True, False]
+
+        iou = detection_set.iou(np.array([[0, 0, 10, 20], [100, 100, 1, 1]]))
+        assert iou.shape == (4, 2)
+        assert iou[0, 0] == 1 and iou[0, 1] == 0
+
+        detection_set.remove_track(1)
+        detection_set.set_class(2, 5)
+        assert detection_set.track_ids.tolist() == [0, 2, 3]
+        assert detection_set.class_ids.tolist() == [0, 5, 0]
@@ -0,0 +1,110 @@
+import json
+import xml.etree.ElementTree as ET
+import pandas as pd
+import pytest
+from ultimatelabeling.models import exporters
+from ultimatelabeling.models.columnar_store import ColumnarStore
+from ultimatelabeling.models.track_info import TrackInfo
+
+
+def legacy_csv(store, file_names, path):
+    """
+    DataFrame implementation of the CSV export, used as reference
+    """
+    dfs = []
+    for i, file_name in enumerate(file_names):
+        df = TrackInfo.detections_to_df(store.get_frame(file_name))
+        df["frame"], df["infer"] = i, 0
+        df["xc"], df["yc"] = df["x"] + df["w"] / 2, df["y"] + df["h"] / 2
+        dfs.append(df[["frame", "class_id", "track_id", "xc", "yc", "w", "h", "infer", "polygon", "kp"]])
+    df = pd.concat(dfs, ignore_index=True)
+    df[["xc", "yc", "w", "h"]] = df[["xc", "yc", "w", "h"]].astype(int)
+    df.to_csv(path, sep=" ", header=False, index=False)
+
+
+class TestExporters:
+
+    @pytest.fixture
+    def store(self, tmp_path, make_detections):
+        store = ColumnarStore(str(tmp_path / "video"))
+        for i in range(5):
+            store.set_frame("{:05d}".format(i), make_detections(i, offset=10 * i))
+        store.commit()
+        return store
+
+    def test_csv_matches_dataframe_export(self, tmp_path, store):
+        file_names = ["{:05d}".format(i) for i in range(6)]
+        exporters.export(store, file_names, str(tmp_path / "labels.csv"), "csv")
+        legacy_csv(store, file_names, str(tmp_path / "legacy.csv"))
+
+        assert (tmp_path / "labels.csv").read_text() == (tmp_path / "legacy.csv").read_text()
+
+    def test_mot(self, tmp_path, store):
+        file_names = store.get_file_names()
+        exporters.export(store, file_names, str(tmp_path / "gt.txt"), "mot")
+
+        lines = (tmp_path / "gt.txt").read_text().splitlines()
+        assert len(lines) == 10
+        assert lines[1] == "3,20,0.0,0.0,10.0,20.0,1,-1,-1,-1"
+        assert lines[-1] == "5,43,3.0,6.0,13.0,23.0,1,-1,-1,-1"
+
+    def test_coco_chunks(self, tmp_path, store, monkeypatch):
+        monkeypatch.setattr(exporters.CocoExporter, "CHUNK_SIZE", 3)
+        file_names = store.get_file_names()
+        exporters.export(store, file_names, str(tmp_path / "coco.json"), "coco", img_size=(40, 80),
+                         class_names={0: "a", 1: "b", 2: "c"})
+
+        with open(str(tmp_path / "coco.json")) as f:
+            data = json.load(f)
+
+        assert [image["file_name"] for image in data["images"]] == [name + ".jpg" for name in file_names]
+        assert data["images"][0]["width"] == 80 and data["images"][0]["height"] == 40
+        assert [a["id"] for a in data["annotations"]] == list(range(1, 11))
+        assert [c["name"] for c in data["categories"]] == ["a", "b", "c"]
+
+        annotation = data["annotations"][-1]
+        assert annotation["image_id"] == 5
+        assert annotation["attributes"]["track_id"] == 43
+        assert annotation["bbox"] == [3, 6, 13, 23]
+        assert annotation["segmentation"] == [[3, 3, 4, 4]]
+        assert annotation["keypoints"] == [3, 3, 1] and annotation["num_keypoints"] == 1
+
+    def test_cvat(self, tmp_path, store):
+        exporters.export(store, store.get_file_names(), str(tmp_path / "cvat.xml"), "cvat", class_names={1: "car"})
+
+        root = ET.parse(str(tmp_path / "cvat.xml")).getroot()
+        images = root.findall("image")
+        assert len(images) == 5 and images[2].get("name") == "00002.jpg"
+
+        boxes = images[2].findall("box")
+        assert [box.find("attribute").text for box in boxes] == ["20", "21"]
+        assert boxes[1].get("label") == "car"
+        assert (boxes[1].get("xbr"), boxes[1].get("ybr")) == ("12.0", "23.0")
+        assert images[2].find("polygon").get("points") == "1.0,1.0;2.0,2.0"
+
+    def test_failed_export_keeps_previous_file(self, tmp_path, store):
+        path = tmp_path / "labels.csv"
+        path.write_text("previous")
+
+        with pytest.raises(KeyError):
+            exporters.export(store, store.get_file_names(), str(path), "unknown")
+        assert path.read_text() == "previous"
+        assert [p.name for p in tmp_path.iterdir() if p.name.startswith("labels")] == ["labels.csv"]
+
+    def test_export_videos(self, tmp_path, make_video):
+        output_dir, data_dir = tmp_path / "output", tmp_path / "data"
+        make_video(output_dir, data_dir, "a", 2)
+        make_video(output_dir, data_dir, "b", 3)
+
+        progress = []
+        nb_frames = exporters.export_videos(["a", "b"], "coco", str(tmp_path / "export"), processes=2,
+                                            output_dir=str(output_dir), data_dir=str(data_dir),
+                                            on_progress=lambda *args: progress.append(args))
+
+        assert nb_frames == {"a": 2, "b": 3}
+        assert sorted(video for _, _, video in progress) == ["a", "b"]
+
+        with open(str(tmp_path / "export" / "b.json")) as f:
+            data = json.load(f)
+        assert data["images"][0]["width"] == 80 and data["images"][0]["height"] == 40
+        assert len(data["annotations"]) == 1 + 2 + 3
@@ -0,0 +1,110 @@
+import os
+import sys
+import textwrap
+import pytest
+from ultimatelabeling.models import extraction
+from ultimatelabeling.models.extraction import ExtractionJob, ExtractionManager, get_resume_frame
+
+# Stands for ffmpeg: the input "video" holds its number of extracted frames (and optionally a delay between frames)
+FAKE_FFMPEG = textwrap.dedent("""
+    import os, sys, time
+    args = sys.argv[1:]
+    words = open(args[args.index("-i") + 1]).read().split()
+    if words[0] == "fail":
+        print("Invalid data found when processing input")
+        sys.exit(1)
+    start = int(args[args.index("-start_number") + 1])
+    delay = float(words[1]) if len(words) > 1 else 0
+    with open(args[-1].replace("%05d.jpg", "starts.txt"), "a") as f:
+        f.write("{} {}\\n".format(start, args[args.index("-vf") + 1]))
+    for i in range(start, int(words[0])):
+        with open(args[-1] % i, "w") as f:
+            f.write("new")
+        print("frame={}".format(i - start + 1))
+        print("progress=continue", flush=True)
+        time.sleep(delay)
+""")
+
+
+def frame_names(dir_name):
+    return sorted(name for name in os.listdir(dir_name) if name.endswith(".jpg"))
+
+
+class TestExtraction:
+
+    @pytest.fixture
+    def data_dir(self, tmp_path, monkeypatch):
+        script = tmp_path / "ffmpeg.py"
+        script.write_text(FAKE_FFMPEG)
+        monkeypatch.setattr(extraction, "FFMPEG", [sys.executable, str(script)])
+        monkeypatch.setattr(extraction, "PROGRESS_INTERVAL", 0)
+
+        data_dir = tmp_path / "data"
+        data_dir.mkdir()
+        return data_dir
+
+    def test_extract(self, data_dir):
+        (data_dir / "a.mp4").write_text("4")
+        (data_dir / "b.MOV").write_text("2")
+        (data_dir / "c.mp4").write_text("3")
+        (data_dir / "c").mkdir()  # already extracted
+
+        progress = []
+        manager = ExtractionManager(str(data_dir), workers=2, on_progress=lambda *args: progress.append(args))
+        assert manager.start() == ["a", "b"]
+        assert os.path.isdir(str(data_dir / "a")) and os.path.isdir(str(data_dir / "b"))
+        manager.wait()
+
+        assert frame_names(str(data_dir / "a")) == ["{:05d}.jpg".format(i) for i in range(4)]
+        assert frame_names(str(data_dir / "b")) == ["00000.jpg", "00001.jpg"]
+        assert frame_names(str(data_dir / "c")) == []
+        assert not os.path.exists(str(data_dir / "a.extracting"))
+        assert manager.get_job("a").status == ExtractionJob.DONE
+        assert ("a", 4, 4) in progress and ("b", 2, 2) in progress
+        assert not manager.is_extracting("a")
+        assert manager.start() == []
+
+    def test_resume(self, data_dir):
+        (data_dir / "a.mp4").write_text("5")
+        (data_dir / "a.extracting").write_text("")
+        (data_dir / "a").mkdir()
+        for i in range(3):
+            (data_dir / "a" / "{:05d}.jpg".format(i)).write_text("old")
+
+        assert get_resume_frame(str(data_dir / "a")) == 2
+        (data_dir / "a" / "00002.jpg").write_text("partial")
+
+        manager = ExtractionManager(str(data_dir))
+        manager.start()
+        assert manager.get_job("a").nb_done == 2
+        manager.wait()
+
+        contents = [(data_dir / "a" / name).read_text() for name in frame_names(str(data_dir / "a"))]
+        assert contents == ["old", "old", "new", "new", "new"]
+        assert (data_dir / "a" / "starts.txt").read_text() == "2 select=not(mod(n\\,5))*gte(n\\,10)\n"
+
+    def test_failure(self, data_dir):
+        (data_dir / "a.mp4").write_text("fail")
+
+        manager = ExtractionManager(str(data_dir))
+        manager.start()
+        manager.wait_for_frames("a")
+        manager.wait()
+
+        job = manager.get_job("a")
+        assert job.status == ExtractionJob.FAILED
+        assert job.error == "Invalid data found when processing input"
+        assert os.path.exists(str(data_dir / "a.extracting"))
+
+    def test_stop(self, data_dir):
+        (data_dir / "a.mp4").write_text("1000 0.01")
+
+        manager = ExtractionManager(str(data_dir))
+        manager.start()
+        manager.wait_for_frames("a")
+        assert manager.is_extracting("a") and manager.get_job("a").nb_done > 0
+        manager.stop()
+
+        assert manager.get_job("a").status == ExtractionJob.STOPPED
+        assert os.path.exists(str(data_dir / "a.extracting"))
+        assert len(frame_names(str(data_dir / "a"))) < 1000
@@ -0,0 +1,49 @@
+from ultimatelabeling.models.frame_cache import FrameCache
+
+
+class TestFrameCache:
+
+    def make_cache(self, max_size=2):
+        written = {}
+        cache = FrameCache(lambda file_name: [file_name], lambda file_name, d: written.update({file_name: d}),
+                           max_size=max_size)
+        return cache, written
+
+    def test_hits_and_misses(self):
+        cache, _ = self.make_cache()
+        cache.get("a")
+        cache.get("a")
+        cache.get("b")
+
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"]) == (1, 2)
+
+    def test_write_back_on_eviction_only_when_dirty(self):
+        cache, written = self.make_cache()
+        cache.get("a").append("edit")
+        cache.mark_dirty("a")
+        cache.get("b")
+        cache.get("c")  # evicts "a"
+        cache.get("d")  # evicts "b", which is clean
+
+        assert written == {"a": ["a", "edit"]}
+        assert cache.get_stats()["evictions"] == 2
+
+    def test_pinned_entry_is_not_evicted(self):
+        cache, _ = self.make_cache()
+        cache.get("a")
+        cache.pinned = "a"
+        cache.get("b")
+        cache.get("c")
+
+        assert "a" in cache and "b" not in cache
+
+    def test_flush(self):
+        cache, written = self.make_cache()
+        cache.put("a", ["x"])
+        cache.flush()
+        cache.flush()
+
+        assert written == {"a": ["x"]}
+        assert cache.get_stats()["flushes"] == 1
+        assert not cache.is_dirty("a")
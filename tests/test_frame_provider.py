@@ -0,0 +1,160 @@
+import threading
+import cv2
+import numpy as np
+import pytest
+from ultimatelabeling.models.frame_provider import FrameProvider, get_reduction, read_image
+
+
+class FakeDecoder:
+    """
+    Decodes "frame<i>" to a 10x10 image filled with i, optionally blocked until released
+    """
+
+    def __init__(self):
+        self.decoded = []
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.released.set()
+
+    def __call__(self, path, reduction=1):
+        self.started.set()
+        self.released.wait()
+        self.decoded.append(path if reduction == 1 else (path, reduction))
+        img = np.full((10 // reduction, 10 // reduction, 3), int(path[5:]), dtype=np.uint8)
+        img.flags.writeable = False
+        return img
+
+
+class TestFrameProvider:
+
+    @pytest.fixture
+    def provider(self):
+        decoder = FakeDecoder()
+        provider = FrameProvider(max_memory=10 * 300, workers=1, lookahead=3, decode=decoder)
+        provider.set_file_names(["frame{}".format(i) for i in range(20)])
+        yield provider, decoder
+        provider.close()
+
+    def wait_prefetch(self, provider):
+        for future in list(provider.pending.values()):
+            future.result()
+
+    def test_read_image(self, tmp_path):
+        path = str(tmp_path / "a.png")
+        cv2.imwrite(path, np.array([[[255, 0, 0]]], dtype=np.uint8))
+        img = read_image(path)
+        assert img.tolist() == [[[255, 0, 0]]]  # BGR, as decoded
+        assert not img.flags.writeable
+        assert read_image(str(tmp_path / "missing.png")) is None
+
+    def test_prefetch_forward_and_backward(self, provider):
+        provider, decoder = provider
+
+        assert provider.get(5)[0, 0, 0] == 5
+        provider.prefetch(5, speed=2)
+        self.wait_prefetch(provider)
+        assert decoder.decoded == ["frame5", "frame7", "frame9", "frame11"]
+
+        assert provider.get(7)[0, 0, 0] == 7
+        provider.prefetch(5, speed=-5)
+        self.wait_prefetch(provider)
+        assert decoder.decoded[4:] == ["frame0"]
+
+        stats = provider.get_statistics()
+        assert (stats["nb_hits"], stats["nb_misses"]) == (1, 1)
+        assert stats["hit_rate"] == 0.5
+
+    def test_memory_bound(self, provider):
+        provider, decoder = provider
+        for frame in range(12):
+            provider.get(frame)
+
+        assert provider.memory_size <= provider.max_memory
+        assert list(provider.cache) == [("frame{}".format(i), 1) for i in range(2, 12)]
+
+        # The frames ahead are kept over the older ones
+        provider.prefetch(2, speed=1)
+        assert list(provider.cache)[-3:] == [("frame5", 1), ("frame4", 1), ("frame3", 1)]
+
+    def test_cancel_on_jump(self, provider):
+        provider, decoder = provider
+        decoder.released.clear()
+
+        provider.prefetch(0, speed=1)
+        decoder.started.wait()
+        provider.prefetch(10, speed=1)
+        decoder.released.set()
+        self.wait_prefetch(provider)
+
+        # frame1 was already being decoded, the other requests ahead of frame 0 are cancelled
+        assert provider.nb_cancelled == 2
+        assert sorted(decoder.decoded) == ["frame1", "frame11", "frame12", "frame13"]
+
+    def test_wait_for_pending(self, provider):
+        provider, decoder = provider
+        decoder.released.clear()
+        provider.prefetch(0, speed=1)
+
+        threading.Timer(0.05, decoder.released.set).start()
+        assert provider.get(1)[0, 0, 0] == 1
+        assert provider.get_statistics()["nb_waits"] == 1
+        assert decoder.decoded.count("frame1") == 1
+
+    def test_video_change(self, provider):
+        provider, decoder = provider
+        provider.get(0)
+        provider.get(1)
+
+        provider.set_file_names(["frame1", "frame30"])
+        assert list(provider.cache) == [("frame1", 1)]
+        assert provider.get(1)[0, 0, 0] == 30
+
+    def test_frames_added_while_decoding(self, provider):
+        provider, decoder = provider
+        decoder.released.clear()
+        provider.prefetch(0, speed=1)
+        decoder.started.wait()
+
+        # New frames extracted: the decodes of the frames kept are cached, those of the removed frames are dropped
+        futures = list(provider.pending.values())
+        provider.set_file_names(["frame{}".format(i) for i in range(2, 25)])
+        decoder.released.set()
+        for future in futures:
+            if not future.cancelled():
+                future.result()
+
+        assert provider.pending == {}
+        assert sorted(provider.cache) == [("frame2", 1), ("frame3", 1)]
+        provider.get(0)
+        assert provider.get_statistics()["nb_hits"] == 1
+
+    def test_reduced_decode(self, tmp_path):
+        path = str(tmp_path / "a.jpg")
+        cv2.imwrite(path, np.zeros((60, 90, 3), dtype=np.uint8))
+        assert read_image(path, 4).shape == (15, 23, 3)
+
+        assert [get_reduction(scale) for scale in [2, 1, 0.6, 0.5, 0.3, 0.25, 0.1]] == [1, 1, 1, 2, 2, 4, 8]
+
+    def test_reduction(self, provider):
+        provider, decoder = provider
+        provider.set_reduction(4)
+        assert provider.get(0).shape == (2, 2, 3)
+
+        # Zooming in decodes the frame again, a frame of higher resolution serves lower ones
+        provider.set_reduction(2)
+        assert provider.get(0).shape == (5, 5, 3)
+        provider.get(1)
+        provider.set_reduction(4)
+        assert provider.get(0).shape == (2, 2, 3)
+        assert provider.get(1).shape == (5, 5, 3)
+        assert decoder.decoded == [("frame0", 4), ("frame0", 2), ("frame1", 2)]
+
+        # Prefetched frames at another resolution are cancelled
+        decoder.started.clear()
+        decoder.released.clear()
+        provider.prefetch(0, speed=1)  # frame1 is cached, frame2 is being decoded
+        decoder.started.wait()
+        provider.set_reduction(1)
+        assert provider.nb_cancelled == 1
+        assert list(provider.pending) == [("frame2", 4)]
+        decoder.released.set()
@@ -0,0 +1,56 @@
+import numpy as np
+from ultimatelabeling.models.frame_signatures import FrameSignatures
+
+
+def make_signatures(track_ids):
+    frames = {"{:05d}".format(i): np.array(t) for i, t in enumerate(track_ids)}
+    signatures = FrameSignatures(lambda file_name: frames[file_name])
+    signatures.set_file_paths(["data/video/{}.jpg".format(file_name) for file_name in frames])
+    return signatures, frames
+
+
+def jump_reference(track_ids, frame, step):
+    """
+    Frame by frame scan of the former jump implementation
+    """
+    while 0 <= frame + step < len(track_ids) and sorted(track_ids[frame + step]) == sorted(track_ids[frame]):
+        frame += step
+    return frame + step if 0 <= frame + step < len(track_ids) else None
+
+
+class TestFrameSignatures:
+
+    def test_segments(self):
+        signatures, _ = make_signatures([[1, 2], [2, 1], [2, 1], [], [], [3], [1, 2]])
+
+        assert signatures.starts.tolist() == [] and signatures.stale
+        assert signatures.get_segment(2) == (0, 2)
+        assert signatures.starts.tolist() == [0, 3, 5, 6]
+        assert signatures.frames_equal(0, 2) and signatures.frames_equal(0, 6)
+        assert not signatures.frames_equal(2, 3)
+
+    def test_jumps_match_scan(self):
+        rng = np.random.RandomState(0)
+        track_ids = [sorted(rng.choice(5, rng.randint(0, 3), replace=False).tolist()) for _ in range(50)]
+        track_ids = [t for t in track_ids for _ in range(rng.randint(1, 4))]
+        signatures, _ = make_signatures(track_ids)
+
+        for frame in range(len(track_ids)):
+            assert signatures.get_next_change(frame) == jump_reference(track_ids, frame, 1)
+            previous = signatures.get_previous_change(frame)
+            assert previous == jump_reference(track_ids, frame, -1)
+
+    def test_invalidate(self):
+        signatures, frames = make_signatures([[1], [1], [1], [1]])
+        assert signatures.get_next_change(0) is None
+
+        frames["00002"] = np.array([1, 2])
+        assert signatures.get_next_change(0) is None
+        signatures.invalidate("00002")
+        assert signatures.get_next_change(0) == 2
+        assert signatures.get_next_change(2) == 3
+        assert signatures.get_previous_change(3) == 2
+
+        # Changing the frames recomputes everything
+        signatures.set_file_paths(signatures.file_paths[:2])
+        assert signatures.get_next_change(0) is None
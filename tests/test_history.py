@@ -0,0 +1,139 @@
+import os
+import pytest
+from ultimatelabeling.models import track_info as track_info_module
+from ultimatelabeling.models.detection_set import Detection
+from ultimatelabeling.models.polygon import Bbox
+from ultimatelabeling.models.track_info import TrackInfo
+
+
+class TestHistory:
+
+    @pytest.fixture
+    def track_info(self, tmp_path, monkeypatch, make_detections):
+        monkeypatch.setattr(track_info_module, "OUTPUT_DIR", str(tmp_path))
+        track_info = TrackInfo("video")
+        file_names = ["{:05d}".format(i) for i in range(6)]
+        for file_name in file_names:
+            track_info.store.set_frame(file_name, make_detections(4))
+        track_info.store.commit()
+        track_info.load_detections(file_names[0])
+        yield track_info, file_names
+        track_info.close()
+
+    def get_frames(self, track_info, file_names):
+        return [track_info.get_detections(file_name).copy() for file_name in file_names]
+
+    @pytest.fixture
+    def check_frames(self, assert_same_detections):
+        def check(track_info, file_names, expected):
+            for file_name, detections in zip(file_names, expected):
+                assert_same_detections(track_info.get_detections(file_name), detections)
+        return check
+
+    def test_undo_redo_frame_edits(self, track_info, make_detections, assert_same_detections, check_frames):
+        track_info, file_names = track_info
+        states = [self.get_frames(track_info, file_names)]
+
+        track_info.add_detection(Detection(class_id=2, track_id=10, bbox=Bbox(1, 2, 3, 4)))
+        states.append(self.get_frames(track_info, file_names))
+        track_info.pop_detection(1)
+        states.append(self.get_frames(track_info, file_names))
+        track_info.modify_class_id(2, 5, file_names[3])
+        states.append(self.get_frames(track_info, file_names))
+        track_info.modify_track_id(3, 2, file_names[0])
+        states.append(self.get_frames(track_info, file_names))
+        track_info.write_detections(file_names[4], make_detections(1))
+        states.append(self.get_frames(track_info, file_names))
+
+        for expected in reversed(states[:-1]):
+            assert track_info.undo() is not None
+            check_frames(track_info, file_names, expected)
+        assert track_info.undo() is None
+
+        for expected in states[1:]:
+            assert track_info.redo() is not None
+            check_frames(track_info, file_names, expected)
+        assert track_info.redo() is None
+
+        # The displayed detections follow the undone edits
+        track_info.undo()
+        track_info.undo()
+        assert_same_detections(track_info.detections, states[-3][0])
+
+    def test_multi_frame_step(self, track_info, check_frames):
+        track_info, file_names = track_info
+        before = self.get_frames(track_info, file_names)
+
+        with track_info.step():
+            track_info.remove_track(1, file_names[1:])
+            track_info.modify_track_class_id(2, 7, file_names)
+        track_info.flush()
+
+        assert all(1 not in track_info.get_detections(f).track_ids for f in file_names[1:])
+        assert sorted(track_info.undo()) == file_names
+        check_frames(track_info, file_names, before)
+        assert not track_info.history.can_undo()
+
+        # A new edit drops the redo history
+        track_info.remove_detection(0, file_names[2])
+        assert not track_info.history.can_redo()
+
+    def test_gesture_step(self, track_info, check_frames):
+        track_info, file_names = track_info
+        before = self.get_frames(track_info, file_names)
+
+        # Dragging a detection: removed at the press, added back at the release
+        track_info.begin_step()
+        detection = track_info.detections[1].copy()
+        track_info.pop_detection(1)
+        detection.bbox = Bbox(5, 6, 7, 8)
+        track_info.add_detection(detection)
+        track_info.end_step()
+
+        assert len(track_info.history.undo_stack) == 1
+        track_info.undo()
+        check_frames(track_info, file_names, before)
+        assert not track_info.history.can_undo()
+
+        track_info.end_step()  # no step open
+        assert track_info.history.depth == 0
+
+    def test_undone_edits_are_saved(self, track_info):
+        track_info, file_names = track_info
+        track_info.remove_track(1, file_names)
+        track_info.save_to_disk()
+        track_info.undo()
+        track_info.save_to_disk()
+
+        store = type(track_info.store)(track_info.store.dir_name)
+        assert store.get_frame(file_names[3]).track_ids.tolist() == [0, 1, 2, 3]
+
+    def test_spill_to_disk(self, track_info, make_detections, check_frames):
+        track_info, file_names = track_info
+        history = track_info.history
+        history.max_memory = 3000
+
+        for i in range(6):
+            track_info.remove_track(i % 4, file_names)
+        assert history.get_nb_spilled() > 0
+        assert history.memory_size <= history.max_memory
+        dir_name = history.dir_name
+
+        while track_info.undo() is not None:
+            pass
+        check_frames(track_info, file_names, [make_detections(4)] * len(file_names))
+
+        history.close()
+        assert not os.path.exists(dir_name)
+
+    def test_max_steps(self, track_info):
+        track_info, file_names = track_info
+        track_info.history.max_steps = 2
+
+        for i in range(4):
+            track_info.remove_detection(i, file_names[1])
+
+        assert track_info.undo() is not None
+        assert track_info.undo() is not None
+        assert track_info.undo() is None
+        assert track_info.get_detections(file_names[1]).track_ids.tolist() == [2, 3]
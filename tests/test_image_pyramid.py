@@ -0,0 +1,96 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from ultimatelabeling.models.image_pyramid import Pyramid, PyramidCache, build_pyramid
+from ultimatelabeling.utils import scale_detection
+from ultimatelabeling.models.track_info import Detection
+from ultimatelabeling.models.polygon import Bbox
+
+
+def make_image(path, h, w):
+    x, y = np.meshgrid(np.arange(w), np.arange(h))
+    img = np.stack([x % 256, y % 256, (x + y) // 8 % 256], axis=2).astype(np.uint8)
+    cv2.imwrite(path, img)
+    return img
+
+
+class TestImagePyramid:
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = PyramidCache(str(tmp_path / "pyramids"), tile_size=64)
+        yield cache
+        cache.close()
+
+    def test_build(self, tmp_path):
+        image_path = str(tmp_path / "a.png")
+        img = make_image(image_path, 150, 300)
+        build_pyramid(image_path, str(tmp_path / "a.pyr"), tile_size=64)
+
+        pyramid = Pyramid(str(tmp_path / "a.pyr"))
+        assert pyramid.levels == [(150, 300), (75, 150), (38, 75), (19, 38)]
+        assert len(pyramid.tiles) == 3 * 5 + 2 * 3 + 2 + 1
+        assert pyramid.get_level_scale(1) == 0.5
+
+        assert [pyramid.get_level(scale) for scale in [4, 1, 0.6, 0.5, 0.2, 0.01]] == [0, 0, 0, 1, 2, 3]
+
+        with open(pyramid.path, "rb") as f:
+            tile = pyramid.read_tile(f, 0, 2, 4)
+        assert tile.shape == (150 - 128, 300 - 256, 3)
+        assert np.abs(tile.astype(int) - img[128:, 256:]).mean() < 3
+
+    def test_get_region(self, tmp_path, cache):
+        image_path = str(tmp_path / "a.png")
+        img = make_image(image_path, 150, 300)
+        assert cache.open(image_path) is None
+
+        cache.request([image_path])
+        cache.wait()
+        pyramid = cache.open(image_path)
+        assert os.path.exists(cache.get_path(image_path))
+
+        # Only the tiles intersecting the area are read, the region is aligned on the tiles
+        region, (x, y) = cache.get_region(pyramid, 0, 70, 10, 60, 20)
+        assert (x, y) == (64, 0)
+        assert region.shape == (64, 128, 3)
+        assert len(cache.tiles) == 2
+        assert np.abs(region.astype(int) - img[0:64, 64:192]).mean() < 3
+
+        region, (x, y) = cache.get_region(pyramid, 1, 0, 0, 1000, 1000)
+        assert region.shape == (75, 150, 3)
+        assert cache.get_region(pyramid, 0, 400, 0, 10, 10)[0] is None
+
+    def test_memory_bound(self, tmp_path, cache):
+        image_path = str(tmp_path / "a.png")
+        make_image(image_path, 150, 300)
+        cache.max_memory = 4 * 64 * 64 * 3
+        cache.request([image_path])
+        cache.wait()
+
+        cache.get_region(cache.open(image_path), 0, 0, 0, 300, 150)
+        assert len(cache.tiles) < 15 and cache.memory_size <= cache.max_memory
+
+    def test_outdated(self, tmp_path, cache):
+        image_path = str(tmp_path / "a.png")
+        make_image(image_path, 150, 300)
+        cache.request([image_path])
+        cache.wait()
+        assert cache.open(image_path) is not None
+
+        # The image changed: the pyramid is rebuilt
+        make_image(image_path, 100, 100)
+        os.utime(image_path, ns=(0, 0))
+        cache.set_dir_name(str(tmp_path / "other"))
+        cache.set_dir_name(str(tmp_path / "pyramids"))
+        assert cache.open(image_path) is None
+
+        cache.request([image_path])
+        cache.wait()
+        assert cache.open(image_path).levels[0] == (100, 100)
+
+    def test_scale_detection(self):
+        detection = Detection(bbox=Bbox(10, 20, 30, 40))
+        scaled = scale_detection(detection, 0.5, (2, 4))
+        assert scaled.bbox.xywh.tolist() == [3, 6, 15, 20]
+        assert detection.bbox.xywh.tolist() == [10, 20, 30, 40]
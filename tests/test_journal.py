@@ -0,0 +1,127 @@
+import os
+import pytest
+from ultimatelabeling.models import track_info as track_info_module
+from ultimatelabeling.models.detection_set import DetectionSet
+from ultimatelabeling.models.journal import Journal, JournalOp, apply_edit
+from ultimatelabeling.models.track_info import TrackInfo
+
+
+class TestJournal:
+
+    def test_encode_decode(self, tmp_path, make_detections, assert_same_detections):
+        journal = Journal(str(tmp_path))
+        detections = make_detections(4)
+        records = [(JournalOp.ADD, "00000", (detections[1],)),
+                   (JournalOp.DELETE_INDEX, "00000", (2,)),
+                   (JournalOp.SET_CLASS, "00001", (3, 5)),
+                   (JournalOp.SET_FRAME, "00002", (detections,))]
+
+        for op, file_name, args in records:
+            decoded = journal.decode(journal.encode(op, file_name, *args))
+            assert decoded[:2] == (op, file_name)
+
+        _, _, (decoded,) = journal.decode(journal.encode(JournalOp.SET_FRAME, "00002", detections))
+        assert_same_detections(decoded, detections)
+
+        # DetectionSets are encoded from their arrays, with the same bytes
+        assert journal.encode(JournalOp.SET_FRAME, "00002", DetectionSet(detections)) == \
+            journal.encode(JournalOp.SET_FRAME, "00002", detections)
+
+    def test_torn_record_is_ignored(self, tmp_path):
+        journal = Journal(str(tmp_path))
+        journal.append(JournalOp.DELETE, "00000", 1)
+        journal.append(JournalOp.DELETE, "00001", 2)
+        journal.close()
+
+        path = journal.get_segment_path(0)
+        size = os.path.getsize(path)
+        with open(path, "r+b") as f:
+            f.truncate(size - 2)
+
+        assert [(file_name, args) for _, file_name, args in Journal(str(tmp_path)).replay()] == [("00000", (1,))]
+
+    def test_single_owner(self, tmp_path):
+        journal = Journal(str(tmp_path))
+        other = Journal(str(tmp_path))
+        assert journal.owner and not other.owner
+
+        other.append(JournalOp.DELETE, "00000", 1)
+        journal.append(JournalOp.DELETE, "00001", 2)
+        journal.close()
+
+        assert [file_name for _, file_name, _ in Journal(str(tmp_path)).replay()] == ["00001"]
+
+    def test_apply_edit(self, make_detections):
+        detections = make_detections(3)
+        apply_edit(detections, JournalOp.SET_TRACK_ID, 1, 7)
+        apply_edit(detections, JournalOp.UPDATE, make_detections(1, offset=7)[0])
+        apply_edit(detections, JournalOp.DELETE, 0)
+
+        assert [d.track_id for d in detections] == [7, 2]
+        assert detections[0].bbox.xywh.tolist() == [0, 0, 10, 20]
+
+
+class TestCrashRecovery:
+
+    @pytest.fixture(autouse=True)
+    def output_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(track_info_module, "OUTPUT_DIR", str(tmp_path))
+
+    def test_replay_after_crash(self, make_detections):
+        track_info = TrackInfo("video")
+        track_info.write_detections("00000", make_detections(3))
+        track_info.save_to_disk()
+
+        track_info.load_detections("00000")
+        track_info.pop_detection(0)
+        track_info.modify_class_id(2, 9, "00000")
+        track_info.add_detection(make_detections(1, offset=5)[0], "00001")
+        # Crash: nothing is flushed to the store, the journal lock of the process is released
+        os.close(track_info.journal.lock_fd)
+
+        recovered = TrackInfo("video")
+        assert [(d.track_id, d.class_id) for d in recovered.get_detections("00000")] == [(1, 1), (2, 9)]
+        assert [d.track_id for d in recovered.get_detections("00001")] == [5]
+        assert recovered.nb_track_ids == 6
+
+    def test_replay_over_written_back_frames(self, make_detections):
+        track_info = TrackInfo("video")
+        track_info.write_detections("00000", make_detections(3))
+        track_info.save_to_disk()
+
+        track_info.load_detections("00000")
+        track_info.pop_detection(0)
+        track_info.add_detection(make_detections(1, offset=5)[0], "00001")
+        # Crash after a commit of the store including the written back frames, before the journal is compacted
+        track_info.mark_dirty()
+        track_info.cache.flush()
+        track_info.store.commit()
+        os.close(track_info.journal.lock_fd)
+
+        recovered = TrackInfo("video")
+        assert [d.track_id for d in recovered.get_detections("00000")] == [1, 2]
+        assert [d.track_id for d in recovered.get_detections("00001")] == [5]
+
+    def test_remove_frame(self, make_detections):
+        track_info = TrackInfo("video")
+        for file_name in ["00000", "00001"]:
+            track_info.write_detections(file_name, make_detections(2))
+        track_info.save_to_disk()
+
+        track_info.load_detections("00001")
+        track_info.remove_frame("00001")
+        assert track_info.file_name is None and len(track_info.detections) == 0
+        track_info.load_detections("00000")
+        assert track_info.store.get_file_names() == ["00000"]
+        # Crash: the removal is only in the journal
+        os.close(track_info.journal.lock_fd)
+
+        assert TrackInfo("video").store.get_file_names() == ["00000"]
+
+    def test_compaction(self, make_detections):
+        track_info = TrackInfo("video")
+        track_info.write_detections("00000", make_detections(3))
+        track_info.save_to_disk()
+
+        assert track_info.journal.get_segments() == []
+        assert [d.track_id for d in TrackInfo("video").get_detections("00000")] == [0, 1, 2]
@@ -0,0 +1,36 @@
+import os
+import threading
+from ultimatelabeling.models.columnar_store import ColumnarStore
+from ultimatelabeling.models.persistence import PersistenceThread
+
+
+class TestPersistenceThread:
+
+    def test_coalesced_writes(self, tmp_path):
+        store = ColumnarStore(str(tmp_path))
+        persistence = PersistenceThread(store)
+
+        # Block the writer until all submissions are queued
+        gate = threading.Event()
+        persistence.submit(str(tmp_path / "gate.txt"), lambda: gate.wait() and "")
+
+        path = str(tmp_path / "a.txt")
+        for i in range(10):
+            persistence.submit(path, lambda i=i: str(i))
+        gate.set()
+
+        assert persistence.barrier(timeout=5)
+        assert open(path).read() == "9"
+        assert persistence.get_stats()["coalesced"] == 9
+
+    def test_commit(self, tmp_path):
+        store = ColumnarStore(str(tmp_path))
+        persistence = PersistenceThread(store)
+
+        store.set_frame("00000", [])
+        persistence.request_commit()
+        persistence.close()
+        persistence.barrier(timeout=5)
+
+        assert os.path.exists(store.file_path)
+        assert not persistence.has_pending()
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from ultimatelabeling.models.polygon import Bbox, Polygon, Keypoints
 
@@ -24,9 +25,54 @@ class TestBbox:
         bbox = Bbox(*xywh)
         assert bbox.is_inside(xy)
 
+    def test_cache_invalidated_on_mutation(self):
+        bbox = Bbox(0., 0., 10., 10.)
+        assert bbox.center.tolist() == [5., 5.]
+        assert bbox.get_anchors()["RB"] == [9., 9., 11., 11.]
+
+        bbox.set_x2(20.)
+        assert bbox.center.tolist() == [10., 5.]
+        assert bbox.get_anchors()["RB"] == [19., 9., 21., 11.]
+
+        with pytest.raises(ValueError):
+            bbox.pos[0] = 1.
+
+    def test_from_array_writes_back(self):
+        boxes = np.zeros((2, 4))
+        bbox = Bbox.from_array(boxes[1])
+        bbox.pos = [1., 2.]
+        bbox.size = [-3., 4.]
+        bbox.correct_negative_size()
+
+        assert boxes[1].tolist() == [-2., 2., 3., 4.]
+        assert boxes[0].tolist() == [0., 0., 0., 0.]
+
+    @pytest.mark.parametrize(
+        'anchor, expected', (
+                ([10.5, 0., 12., 1.], True),
+                ([11.5, 0., 12., 1.], False),
+                ([-3., -3., -0.5, -0.5], True),
+                ([-3., -3., -1.5, -1.], False)
+        )
+    )
+    def test_intersects(self, anchor, expected):
+        assert Bbox(0., 0., 10., 10.).intersects(anchor) == expected
+
+    def test_batch_constructor(self):
+        bboxes = Bbox.from_xywh(np.array([[0., 1., 2., 3.], [4., 5., 6., 7.]]))
+        assert [b.to_json() for b in bboxes] == [[0., 1., 2., 3.], [4., 5., 6., 7.]]
+
 
 class TestKeypoints:
 
     def test_incorrect_keypoints(self):
         with pytest.raises(AssertionError):
             Keypoints([0., 0.])
+
+    def test_anchors_of_visible_keypoints(self):
+        keypoints = Keypoints([1., 1., 2., 5., 5., 0., 8., 8., 1.])
+        assert keypoints.get_anchors() == {0: [-1., -1., 3., 3.], 2: [6., 6., 10., 10.]}
+
+    def test_from_ragged(self):
+        polygons = Polygon.from_ragged(np.array([0, 2, 2, 6]), np.arange(6.))
+        assert [p.coords.tolist() for p in polygons] == [[0., 1.], [], [2., 3., 4., 5.]]
@@ -0,0 +1,138 @@
+import numpy as np
+from ultimatelabeling.models import stores as stores_module
+from ultimatelabeling.models import track_info as track_info_module
+from ultimatelabeling.models.columnar_store import ColumnarStore
+from ultimatelabeling.models.persistence import PersistenceThread
+from ultimatelabeling.models.sqlite_store import SqliteStore
+from ultimatelabeling.models.track_info import TrackInfo
+from ultimatelabeling.migrate import migrate_video
+
+
+class TestSqliteStore:
+
+    def test_commit_and_reload(self, tmp_path, make_detections, assert_same_detections):
+        store = SqliteStore(str(tmp_path))
+        frames = {"{:05d}".format(i): make_detections(i, offset=10 * i) for i in range(5)}
+        store.set_frames(frames)
+        store.commit()
+
+        store = SqliteStore(str(tmp_path))
+        assert store.get_file_names() == sorted(frames)
+        for file_name, detections in frames.items():
+            assert_same_detections(store.get_frame(file_name), detections)
+            assert store.get_track_ids(file_name).tolist() == sorted(d.track_id for d in detections)
+
+        store.set_frame("00002", make_detections(1, offset=7))
+        store.commit()
+        assert_same_detections(SqliteStore(str(tmp_path)).get_frame("00002"), make_detections(1, offset=7))
+        assert len(store.get_frame("missing")) == 0
+
+    def test_remove_frame(self, tmp_path, make_detections):
+        store = SqliteStore(str(tmp_path))
+        store.set_frames({"{:05d}".format(i): make_detections(2, offset=10 * i) for i in range(3)})
+        store.commit()
+
+        store.remove_frame("00001")
+        snapshot = store.merge()
+        assert not store.has_frame("00001") and store.get_file_names() == ["00000", "00002"]
+        assert store.get_track_frames(10) == set()
+        store.write(snapshot)
+
+        store = SqliteStore(str(tmp_path))
+        assert store.get_file_names() == ["00000", "00002"]
+        assert store.connect().execute("SELECT COUNT(*) FROM detections").fetchone() == (4,)
+
+    def test_merged_frames_are_served_until_written(self, tmp_path, make_detections, assert_same_detections):
+        store = SqliteStore(str(tmp_path))
+        store.set_frame("00000", make_detections(3))
+        snapshot = store.merge()
+
+        assert not store.dirty
+        assert_same_detections(store.get_frame("00000"), make_detections(3))
+
+        store.write(snapshot)
+        assert store.pending == {}
+        assert_same_detections(store.get_frame("00000"), make_detections(3))
+
+    def test_track_queries(self, tmp_path, make_detections):
+        store = SqliteStore(str(tmp_path))
+        for i in range(6):
+            store.set_frame("{:05d}".format(i), make_detections(3))
+        store.commit()
+
+        assert store.get_track_frames(1) == {"{:05d}".format(i) for i in range(6)}
+        assert store.count_class_per_frame(2) == {"{:05d}".format(i): 1 for i in range(6)}
+
+        store.set_frame("00002", make_detections(1))
+        assert "00002" not in store.get_track_frames(1)
+        assert "00002" not in store.count_class_per_frame(2)
+
+        store.remove_track(1, ["00002", "00004", "00005"])
+        store.modify_track_class_id(2, 7, ["00000", "00001"])
+        store.commit()
+
+        store = SqliteStore(str(tmp_path))
+        assert store.get_track_frames(1) == {"00000", "00001", "00003"}
+        assert [d.track_id for d in store.get_frame("00005")] == [0, 2]
+        assert [d.class_id for d in store.get_frame("00000")] == [0, 1, 7]
+        assert [d.class_id for d in store.get_frame("00003")] == [0, 1, 2]
+        assert store.count_class_per_frame(7) == {"00000": 1, "00001": 1}
+
+    def test_get_columns_matches_columnar_store(self, tmp_path, make_detections):
+        stores = [ColumnarStore(str(tmp_path / "columnar")), SqliteStore(str(tmp_path / "sqlite"))]
+        file_names = ["{:05d}".format(i) for i in range(6)]
+
+        for store in stores:
+            for i, file_name in enumerate(file_names[:4]):
+                store.set_frame(file_name, make_detections(i + 1, offset=10 * i))
+            store.commit()
+            store.set_frame(file_names[1], make_detections(5, offset=100))
+
+        expected, columns = [store.get_columns(file_names[::-1]) for store in stores]
+        for k in expected:
+            assert np.array_equal(expected[k], columns[k]), k
+
+    def test_background_writes(self, tmp_path, make_detections, assert_same_detections):
+        store = SqliteStore(str(tmp_path))
+        persistence = PersistenceThread(store)
+
+        for i in range(20):
+            store.set_frame("{:05d}".format(i % 5), make_detections(i % 4 + 1, offset=i))
+            persistence.request_commit()
+        assert persistence.barrier(timeout=10)
+        persistence.close()
+
+        store = SqliteStore(str(tmp_path))
+        for i in range(15, 20):
+            assert_same_detections(store.get_frame("{:05d}".format(i % 5)), make_detections(i % 4 + 1, offset=i))
+
+
+class TestMigration:
+
+    def test_migrate_columnar_to_sqlite(self, tmp_path, make_detections, assert_same_detections):
+        store = ColumnarStore(str(tmp_path))
+        store.set_frame("00000", make_detections(4))
+        store.set_frame("00001", [])
+        store.commit()
+
+        assert migrate_video(str(tmp_path), "sqlite") == 2
+        assert migrate_video(str(tmp_path), "sqlite") is None
+
+        migrated = SqliteStore(str(tmp_path))
+        assert migrated.get_file_names() == ["00000", "00001"]
+        assert_same_detections(migrated.get_frame("00000"), make_detections(4))
+
+    def test_track_info_on_sqlite(self, tmp_path, monkeypatch, make_detections):
+        monkeypatch.setattr(track_info_module, "OUTPUT_DIR", str(tmp_path))
+        monkeypatch.setattr(stores_module, "ANNOTATION_BACKEND", "sqlite")
+
+        track_info = TrackInfo("video")
+        assert isinstance(track_info.store, SqliteStore)
+        track_info.load_detections("00000")
+        track_info.write_detections("00000", make_detections(3))
+        track_info.remove_track(1, ["00000"])
+        track_info.save_to_disk()
+        track_info.close()
+
+        store = SqliteStore(str(tmp_path / "video"))
+        assert [d.track_id for d in store.get_frame("00000")] == [0, 2]
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ultimatelabeling.models import track_info as track_info_module
+from ultimatelabeling.models.detection_set import Detection
+from ultimatelabeling.models.polygon import Bbox
+from ultimatelabeling.models.state import State
+from ultimatelabeling.models.track_info import TrackInfo
+
+
+def legacy_to_df(track_info, file_names):
+    """
+    Frame by frame implementation of TrackInfo.to_df, used as reference
+    """
+    dfs = []
+    for i, file_name in enumerate(file_names):
+        df_frame = TrackInfo.detections_to_df(track_info.get_detections(file_name))
+        df_frame["frame"] = i
+        df_frame["xc"] = df_frame["x"] + df_frame["w"] / 2
+        df_frame["yc"] = df_frame["y"] + df_frame["h"] / 2
+        df_frame["infer"] = 0
+        dfs.append(df_frame[["frame", "class_id", "track_id", "xc", "yc", "w", "h", "infer", "polygon", "kp"]])
+    return pd.concat(dfs, ignore_index=True)
+
+
+class TestDataFrame:
+
+    @pytest.fixture(autouse=True)
+    def output_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(track_info_module, "OUTPUT_DIR", str(tmp_path))
+
+    @pytest.fixture
+    def track_info(self, make_detections):
+        track_info = TrackInfo("video")
+        file_names = ["{:05d}".format(i) for i in range(6)]
+        for i, file_name in enumerate(file_names[:5]):
+            track_info.set_frame(file_name, make_detections(i, offset=10 * i))
+        track_info.store.commit()
+
+        # Frames in the overlay and in the cache are exported too
+        track_info.set_frame(file_names[2], make_detections(4, offset=100))
+        track_info.load_detections(file_names[3])
+        track_info.detections[0].class_id = 2
+        track_info.mark_dirty()
+
+        yield track_info, file_names
+        track_info.close()
+
+    def test_to_df(self, track_info):
+        track_info, file_names = track_info
+        df = track_info.to_df(file_names)
+
+        expected = legacy_to_df(track_info, file_names)
+        assert df[["frame", "class_id", "track_id", "infer", "polygon", "kp"]].values.tolist() == \
+            expected[["frame", "class_id", "track_id", "infer", "polygon", "kp"]].values.tolist()
+        assert np.allclose(df[["xc", "yc", "w", "h"]].values.astype(float),
+                           expected[["xc", "yc", "w", "h"]].values.astype(float))
+
+    @pytest.mark.parametrize("workers", [None, 4])
+    def test_from_df_all(self, track_info, workers, assert_same_detections):
+        track_info, file_names = track_info
+        frames = {file_name: track_info.get_detections(file_name).copy() for file_name in file_names}
+
+        # Frames don't have to be sorted, only the order of the rows inside a frame matters
+        df = track_info.to_df(file_names)
+        df = df.iloc[np.argsort(-df.frame.values, kind="stable")]
+        df["track_id"] += 1000
+        track_info.from_df_all(df, file_names, workers=workers)
+
+        for file_name, detections in frames.items():
+            for d in detections:
+                d.track_id += 1000
+            assert_same_detections(track_info.get_detections(file_name), list(detections))
+
+        assert track_info.detections is track_info.get_detections(track_info.file_name)
+
+    def test_from_df_all_generator(self, track_info):
+        track_info, file_names = track_info
+        df = track_info.to_df(file_names)
+        df["class_id"] = 7
+
+        # As called by HungarianThread with State.get_file_names()
+        track_info.from_df_all(df, (file_name for file_name in file_names))
+        assert all(d.class_id == 7 for file_name in file_names for d in track_info.get_detections(file_name))
+
+    def test_set_current_frame(self, track_info, make_detections, assert_same_detections):
+        track_info, file_names = track_info
+        track_info.load_detections(file_names[1])
+
+        # Overwritten directly in the store (e.g. by the YOLO import): the current frame is reloaded and kept pinned
+        track_info.set_frame(file_names[1], make_detections(3, offset=50))
+        assert_same_detections(track_info.detections, make_detections(3, offset=50))
+        track_info.detections[0].class_id = 9
+        track_info.mark_dirty()
+        track_info.set_frames({file_names[0]: make_detections(2)}, journal=False)
+        track_info.flush()
+
+        assert track_info.detections is track_info.get_detections(file_names[1])
+        assert track_info.store.get_frame(file_names[1])[0].class_id == 9
+
+        track_info.set_frames({file_names[1]: make_detections(2)}, journal=False)
+        assert_same_detections(track_info.detections, make_detections(2))
+
+
+class TestFrameSignatures:
+
+    @pytest.fixture(autouse=True)
+    def output_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(track_info_module, "OUTPUT_DIR", str(tmp_path))
+
+    def test_signatures_follow_edits(self, make_detections):
+        track_info = TrackInfo("video")
+        file_names = ["{:05d}".format(i) for i in range(6)]
+        for file_name in file_names:
+            track_info.set_frame(file_name, make_detections(2))
+        signatures = track_info.signatures
+        signatures.set_file_paths(["{}.jpg".format(file_name) for file_name in file_names])
+        assert signatures.get_next_change(0) is None
+
+        track_info.load_detections(file_names[2])
+        track_info.add_detection(make_detections(3)[2])
+        assert signatures.get_next_change(0) == 2
+        assert signatures.get_next_change(2) == 3
+
+        track_info.remove_track(2, file_names[2:3])
+        assert signatures.get_next_change(0) is None
+
+        track_info.write_detections(file_names[4], make_detections(1))
+        assert signatures.get_segment(4) == (4, 4)
+
+        track_info.close()
+
+
+class TestCopyAnnotations:
+
+    @pytest.fixture(autouse=True)
+    def output_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(track_info_module, "OUTPUT_DIR", str(tmp_path))
+
+    def test_edit_copied_detection(self):
+        state = State()
+        state.track_info = TrackInfo("video")
+        state.track_info.write_detections("00000", [Detection(track_id=9, bbox=Bbox(1, 2, 3, 4))])
+        state.track_info.load_detections("00000")
+        previous = state.track_info.detections[0]
+
+        # Copied from frame 0 to frame 1, then its instance id is changed
+        state.track_info.load_detections("00001")
+        state.set_current_detection(previous)
+        state.modify_track_id(state.current_detection, 5)
+
+        assert state.track_info.get_detections("00000").track_ids.tolist() == [9]
+        assert state.track_info.get_detections("00001").track_ids.tolist() == [5]
+        assert previous.track_id == 9
+        state.track_info.undo()
+        assert state.track_info.get_detections("00001").track_ids.tolist() == [9]
+        state.track_info.close()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ultimatelabeling.models.track_info import Detection, TrackInfo
+from ultimatelabeling.models.polygon import Bbox, Polygon, Keypoints
+from ultimatelabeling.models.txt_format import COLUMNS, TxtFrame, format_txt, format_yolo, read_txt, write_txt
+
+
+def random_detections(n, seed=0):
+    rng = np.random.RandomState(seed)
+    detections = []
+    for i in range(n):
+        xywh = rng.uniform(-10, 2000, 4) if i % 2 else rng.randint(0, 2000, 4)
+        polygon = rng.uniform(0, 1000, 2 * rng.randint(0, 6)) if i % 3 else []
+        keypoints = rng.uniform(0, 1000, 3 * rng.randint(0, 4)) if i % 4 else []
+        detections.append(Detection(int(rng.randint(0, 10)), i, Polygon(polygon), Bbox(*xywh), Keypoints(keypoints)))
+    return detections
+
+
+def pandas_txt(detections):
+    """
+    Previous pandas writer of the txt files, used as reference
+    """
+    return TrackInfo.detections_to_df(detections).to_csv(None, index=None, header=False, sep=" ")
+
+
+def pandas_read(path):
+    return pd.read_csv(path, header=None, names=COLUMNS, na_filter=False, sep=" ")
+
+
+class TestTxtFormat:
+
+    @pytest.mark.parametrize("n", [0, 1, 7, 300])
+    def test_same_output_as_pandas(self, n):
+        detections = random_detections(n, seed=n)
+        assert format_txt(detections) == pandas_txt(detections)
+
+    @pytest.mark.parametrize("detections", [
+        [Detection(1, 2, Polygon([5.]), Bbox(0.1 + 0.2, 1e20, -3.5, 7), Keypoints([1e-7, 2, 0]))],
+        [Detection(0, 0, Polygon(), Bbox(), Keypoints())],
+    ])
+    def test_edge_values(self, detections):
+        assert format_txt(detections) == pandas_txt(detections)
+
+    def test_byte_for_byte_roundtrip(self, tmp_path):
+        path = str(tmp_path / "00000.txt")
+        with open(path, "w") as f:
+            f.write(pandas_txt(random_detections(50)))
+        data = open(path, "rb").read()
+
+        write_txt(path, read_txt(path).to_detections())
+        assert open(path, "rb").read() == data
+
+    def test_same_detections_as_pandas(self, tmp_path):
+        path = str(tmp_path / "00000.txt")
+        write_txt(path, random_detections(20))
+
+        # The default float parser of pandas is not exact (last digit), the txt reader is
+        expected = [Detection.from_df(row) for _, row in pandas_read(path).iterrows()]
+        for d1, d2 in zip(read_txt(path).to_detections(), expected):
+            assert (d1.track_id, d1.class_id) == (d2.track_id, d2.class_id)
+            assert np.allclose(d1.bbox.xywh, d2.bbox.xywh)
+            assert np.allclose(d1.polygon.coords, d2.polygon.coords)
+            assert np.allclose(d1.keypoints.coords, d2.keypoints.coords)
+
+    def test_lazy_polygons(self):
+        frame = TxtFrame.parse(format_txt(random_detections(5)))
+        assert frame._polygons is None
+        assert len(frame.polygons) == len(frame) == 5
+
+    def test_yolo_same_output_as_pandas(self):
+        detections = random_detections(10)
+        df = TrackInfo.detections_to_df(detections)[["class_id", "x", "y", "w", "h"]]
+        df[["x", "w"]] = df[["x", "w"]].div(640)
+        df[["y", "h"]] = df[["y", "h"]].div(480)
+        assert format_yolo(detections, (480, 640)) == df.to_csv(None, index=None, header=False, sep=" ")
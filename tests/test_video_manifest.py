@@ -0,0 +1,107 @@
+import os
+import subprocess
+import sys
+import time
+import cv2
+import numpy as np
+from ultimatelabeling import utils
+from ultimatelabeling.models import state as state_module
+from ultimatelabeling.models import track_info as track_info_module
+from ultimatelabeling.models.state import State
+from ultimatelabeling.models.video_manifest import VideoManifest, load_manifest, read_image_header, sort_image_names
+
+
+def make_frames(dir_name, names, size=(24, 32)):
+    os.makedirs(dir_name, exist_ok=True)
+    for name in names:
+        cv2.imwrite(os.path.join(dir_name, name), np.zeros(size + (3,), dtype=np.uint8))
+
+
+def set_old_mtime(dir_name):
+    """
+    Backdates a directory so that its manifest can be saved (see MTIME_RESOLUTION)
+    """
+    mtime = time.time() - 60
+    os.utime(dir_name, (mtime, mtime))
+
+
+class TestVideoManifest:
+
+    def test_read_image_header(self, tmp_path):
+        make_frames(str(tmp_path), ["a.jpg"], size=(30, 50))
+        make_frames(str(tmp_path), ["b.png"], size=(7, 3))
+        (tmp_path / "c.jpg").write_bytes(b"not an image")
+
+        assert read_image_header(str(tmp_path / "a.jpg")) == (30, 50)
+        assert read_image_header(str(tmp_path / "b.png")) == (7, 3)
+        assert read_image_header(str(tmp_path / "c.jpg")) is None
+        assert read_image_header(str(tmp_path / "missing.jpg")) is None
+
+    def test_sort_image_names(self):
+        names = ["10.jpg", "9.png", "100.jpg", "0.jpg", "11.jpg"]
+        assert sort_image_names(names) == ["0.jpg", "9.png", "10.jpg", "11.jpg", "100.jpg"]
+
+        names = ["frame10.jpg", "frame2.jpg", "Frame3.png", "1.jpg"]
+        assert sort_image_names(names) == sorted(names, key=utils.natural_sort_key)
+
+    def test_build_save_load(self, tmp_path):
+        dir_name = str(tmp_path / "video")
+        make_frames(dir_name, ["2.jpg", "10.jpg", "1.png"])
+        (tmp_path / "video" / "notes.txt").write_text("")
+        set_old_mtime(dir_name)
+
+        manifest = VideoManifest(dir_name)
+        assert manifest.build() and manifest.save()
+        assert manifest.path == dir_name + ".manifest.json"
+
+        loaded = VideoManifest(dir_name)
+        assert loaded.load()
+        assert loaded.names == ["1.png", "2.jpg", "10.jpg"]
+        assert loaded.stems == ["1", "2", "10"]
+        assert loaded.get_image_size(2) == (24, 32)
+        assert loaded.file_sizes == [os.path.getsize(p) for p in loaded.get_paths()]
+
+        # A new frame invalidates the manifest
+        make_frames(dir_name, ["3.jpg"])
+        assert not VideoManifest(dir_name).load()
+        assert load_manifest(dir_name).names == ["1.png", "2.jpg", "3.jpg", "10.jpg"]
+
+    def test_recently_modified_directory_is_not_saved(self, tmp_path):
+        dir_name = str(tmp_path / "video")
+        make_frames(dir_name, ["0.jpg"])
+
+        manifest = VideoManifest(dir_name)
+        assert manifest.build()
+        assert not manifest.save()
+        assert not os.path.exists(manifest.path)
+
+    def test_import_without_gui(self):
+        # As imported by the detection server (detector.py), where PyQt5 and pynput are not installed
+        code = ("import sys; sys.modules['PyQt5'] = sys.modules['pynput'] = None; "
+                "from ultimatelabeling.models.video_manifest import load_manifest; "
+                "from ultimatelabeling.models.track_info import TrackInfo")
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+
+    def test_state(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(state_module, "DATA_DIR", str(tmp_path))
+        monkeypatch.setattr(track_info_module, "OUTPUT_DIR", str(tmp_path / "output"))
+        dir_name = str(tmp_path / "video")
+        make_frames(dir_name, ["{}.jpg".format(i) for i in range(12)], size=(40, 60))
+        set_old_mtime(dir_name)
+
+        state = State()
+        state.current_video = "video"
+        state.update_file_names()
+        state.manifest.thread.join()
+
+        assert state.nb_frames == 12
+        assert state.get_file_name(11) == "11"
+        assert state.file_names[10] == os.path.join(dir_name, "10.jpg")
+        assert state.image_size == (40, 60)
+        assert state.get_image_size(3) == (40, 60)
+
+        # The manifest saved by the background thread is used on the next switch
+        state.update_file_names()
+        assert state.manifest.is_complete() and state.manifest.thread is None
+        assert state.file_stems == [str(i) for i in range(12)]
+        assert state.track_info is None  # opened by load_state
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from ultimatelabeling.models.viewport import Viewport, get_visible_area
+
+BACKGROUND = (38, 38, 38)
+
+
+def sample(img, scale, offset, canvas_size):
+    """
+    Canvas pixel (X, Y) shows the image pixel containing ((X, Y) - offset) / scale (as ImageWidget.get_abs_pos)
+    """
+    canvas = np.empty((canvas_size[1], canvas_size[0], 3), dtype=np.uint8)
+    canvas[:] = BACKGROUND
+    xs = np.floor((np.arange(canvas_size[0]) - offset[0]) / scale).astype(int)
+    ys = np.floor((np.arange(canvas_size[1]) - offset[1]) / scale).astype(int)
+    valid_x = (xs >= 0) & (xs < img.shape[1])
+    valid_y = (ys >= 0) & (ys < img.shape[0])
+    canvas[np.ix_(valid_y, valid_x)] = img[np.ix_(ys[valid_y], xs[valid_x])]
+    return canvas
+
+
+class TestViewport:
+
+    @pytest.fixture
+    def img(self):
+        return np.random.RandomState(0).randint(0, 255, (300, 400, 3)).astype(np.uint8)
+
+    @pytest.mark.parametrize("scale, offset", [(1, (0, 0)), (2, (-150, -70)), (4, (37, 21)), (0.5, (10, -20)),
+                                               (8, (-1000, -640))])
+    def test_render(self, img, scale, offset):
+        canvas = Viewport().render(img, scale, offset, (500, 350), BACKGROUND)
+        expected = sample(img, scale, offset, (500, 350))
+
+        assert canvas.shape == (350, 500, 3)
+        # Pixel boundaries may be rounded differently on the borders of the scaled pixels
+        assert (canvas != expected).any(axis=2).mean() < 0.02
+
+    def test_outside(self, img):
+        canvas = Viewport().render(img, 2, (600, 0), (500, 350), BACKGROUND)
+        assert (canvas == BACKGROUND).all()
+
+    def test_buffers_reused(self, img):
+        viewport = Viewport()
+        first = viewport.render(img, 2, (-10, -10), (500, 350), BACKGROUND)
+        second = viewport.render(img, 2, (-20, -10), (500, 350), BACKGROUND)
+        scaled = viewport.scaled
+
+        # The canvases are used in turn, the displayed one is not overwritten
+        assert second is not first
+        assert viewport.render(img, 2, (-30, -10), (500, 350), BACKGROUND) is first
+        assert viewport.scaled is scaled
+
+        assert viewport.render(img, 2, (-30, -10), (600, 350), BACKGROUND).shape == (350, 600, 3)
+
+    def test_visible_area(self):
+        assert get_visible_area((300, 400), 2, (-100, -50), (500, 350)) == (50, 25, 250, 175)
+        assert get_visible_area((300, 400), 0.5, (20, 10), (500, 350)) == (0, 0, 400, 300)
@@ -0,0 +1,60 @@
+import os
+from ultimatelabeling.models.yolo_export import YoloExporter, export_videos
+
+
+class TestYoloExport:
+
+    def test_export_is_incremental(self, tmp_path, make_detections, make_video):
+        output_dir, data_dir = tmp_path / "output", tmp_path / "data"
+        store = make_video(output_dir, data_dir, "video", 4)
+
+        exporter = YoloExporter("video", str(output_dir), str(data_dir))
+        assert exporter.export(img_size=(100, 200)) == {"written": 4, "unchanged": 0, "removed": 0}
+
+        label_path = output_dir / "video" / YoloExporter.LABELS_DIR / "00002.txt"
+        lines = label_path.read_text().splitlines()
+        assert len(lines) == 3
+        assert lines[1] == "1 {} {} {} {}".format(1 / 200, 2 / 100, 11 / 200, 21 / 100)
+
+        store.set_frame("00002", make_detections(1))
+        store.set_frame("00003", [])
+        store.commit()
+
+        exporter = YoloExporter("video", str(output_dir), str(data_dir))
+        assert exporter.export(img_size=(100, 200)) == {"written": 2, "unchanged": 2, "removed": 0}
+        assert len(label_path.read_text().splitlines()) == 1
+        assert (output_dir / "video" / YoloExporter.LABELS_DIR / "00003.txt").read_text() == ""
+
+        # Labels of frames missing from the store are removed
+        manifest = exporter.load_manifest()
+        manifest["00009"] = "stale"
+        exporter.save_manifest(manifest)
+        (output_dir / "video" / YoloExporter.LABELS_DIR / "00009.txt").write_text("0 0 0 0 0\n")
+        assert exporter.export(img_size=(100, 200)) == {"written": 0, "unchanged": 4, "removed": 1}
+        assert not (output_dir / "video" / YoloExporter.LABELS_DIR / "00009.txt").exists()
+
+        # A different image size changes every label
+        assert exporter.export(img_size=(50, 50))["written"] == 4
+
+    def test_export_videos_training_list(self, tmp_path, make_video):
+        output_dir, data_dir = tmp_path / "output", tmp_path / "data"
+        make_video(output_dir, data_dir, "a", 2)
+        make_video(output_dir, data_dir, "b", 3)
+
+        progress = []
+        list_path = str(tmp_path / "train.txt")
+        stats = export_videos(["a", "b"], list_path=list_path, processes=2, output_dir=str(output_dir),
+                              data_dir=str(data_dir), on_progress=lambda *args: progress.append(args))
+
+        assert stats == {"a": {"written": 2, "unchanged": 0, "removed": 0},
+                         "b": {"written": 3, "unchanged": 0, "removed": 0}}
+        assert sorted(p[1:] for p in progress) == [(2, "a"), (2, "b")]
+
+        with open(list_path) as f:
+            lines = sorted(f.read().splitlines())
+        assert lines == sorted(os.path.abspath(str(data_dir / video / "{:05d}.jpg".format(i)))
+                               for video, n in [("a", 2), ("b", 3)] for i in range(n))
+
+        # The image size is read from the frames (h, w)
+        label = (output_dir / "a" / YoloExporter.LABELS_DIR / "00000.txt").read_text()
+        assert label == "0 0.0 0.0 {} {}\n".format(10 / 80, 20 / 40)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from ultimatelabeling.models import track_info as track_info_module
+from ultimatelabeling.models import yolo_import
+from ultimatelabeling.models.track_info import TrackInfo
+from ultimatelabeling.models.yolo_import import find_label_files, import_yolo_labels, parse_yolo
+
+
+class TestYoloImport:
+
+    @pytest.fixture
+    def track_info(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(track_info_module, "OUTPUT_DIR", str(tmp_path / "output"))
+        track_info = TrackInfo("video")
+        yield track_info
+        track_info.close()
+
+    def test_parse(self):
+        class_ids, boxes = parse_yolo("1 0.5 0.5 0.2 0.4\n\n2 0.1 0.2 0.1 0.1 0.93\n", (100, 200))
+        assert class_ids.tolist() == [1, 2]
+        assert np.allclose(boxes, [[80, 30, 40, 40], [10, 15, 20, 10]])
+
+        class_ids, boxes = parse_yolo("", (100, 200))
+        assert len(class_ids) == 0 and boxes.shape == (0, 4)
+
+    def test_find_label_files(self, tmp_path):
+        for name in ["a.txt", "b.txt", "b.csv", "c.jpg"]:
+            (tmp_path / name).write_text("")
+        (tmp_path / "d.txt").mkdir()
+
+        assert find_label_files(str(tmp_path)) == {"a": str(tmp_path / "a.txt"), "b": str(tmp_path / "b.csv")}
+
+    def test_import(self, tmp_path, track_info, monkeypatch, make_detections):
+        monkeypatch.setattr(yolo_import, "BATCH_SIZE", 2)
+        file_names = ["{:05d}".format(i) for i in range(6)]
+        for file_name in file_names:
+            track_info.set_frame(file_name, make_detections(2, offset=50))
+        track_info.load_detections(file_names[1])
+
+        labels_dir = tmp_path / "labels"
+        labels_dir.mkdir()
+        for i in [1, 2, 3, 5]:
+            (labels_dir / "{}.txt".format(file_names[i])).write_text("0 0.5 0.5 0.5 0.5\n" * i)
+        (labels_dir / "{}.txt".format(file_names[3])).write_text("")
+        (labels_dir / "unknown.txt").write_text("0 0.5 0.5 0.5 0.5\n")
+
+        progress, segments = [], []
+
+        def on_progress(*args):
+            progress.append(args)
+            segments.extend(track_info.journal.get_segments())
+
+        nb_frames = import_yolo_labels(track_info, str(labels_dir), file_names, (100, 200), on_progress=on_progress)
+
+        assert nb_frames == 4
+        assert progress == [(2, 4), (4, 4)]
+        assert segments == []  # the journal was compacted before the import
+
+        # Frames without a label file are unchanged, track ids are numbered in frame order
+        assert track_info.get_detections(file_names[0]).track_ids.tolist() == [50, 51]
+        assert track_info.get_detections(file_names[1]).track_ids.tolist() == [0]
+        assert track_info.get_detections(file_names[2]).track_ids.tolist() == [1, 2]
+        assert len(track_info.get_detections(file_names[3])) == 0
+        assert track_info.get_detections(file_names[5]).track_ids.tolist() == [3, 4, 5, 6, 7]
+        assert track_info.get_detections(file_names[5]).boxes[0].tolist() == [50, 25, 100, 50]
+
+        # The displayed frame is reloaded and the journal compacted
+        assert track_info.detections.track_ids.tolist() == [0]
+        track_info.save_to_disk()
+        store = type(track_info.store)(track_info.store.dir_name)
+        assert store.get_frame(file_names[2]).track_ids.tolist() == [1, 2]
@@ -4,4 +4,35 @@ ROOT_DIR = ""
 STATE_PATH = os.path.join(ROOT_DIR, "state.pkl")
 DATA_DIR = os.path.join(ROOT_DIR, "data")
 OUTPUT_DIR = os.path.join(ROOT_DIR, "output")
-RESOURCES_DIR = os.path.join(ROOT_DIR, "res")
\ No newline at end of file
+RESOURCES_DIR = os.path.join(ROOT_DIR, "res")
+
+# Maximum number of decoded frames kept in memory by TrackInfo before being written back to the store
+FRAME_CACHE_SIZE = 512
+
+# Number of journaled edits after which the journal is compacted into the annotation store
+JOURNAL_COMPACTION_SIZE = 10000
+
+# Annotation store of each video: "columnar" (single numpy file) or "sqlite" (embedded database)
+# Existing annotations can be converted with: python -m ultimatelabeling.migrate --to <backend>
+ANNOTATION_BACKEND = "columnar"
+
+# Undo history: memory used by the most recent steps (older ones are spilled to disk) and maximum number of steps
+HISTORY_MEMORY_SIZE = 64 * 1024 * 1024
+HISTORY_SIZE = 1000
+
+# Number of videos whose frames are extracted at the same time (ffmpeg processes) at startup
+EXTRACTION_WORKERS = 2
+
+# Decoded frames kept in memory for the player and the slider (bytes), threads decoding ahead of the current frame
+# and number of frames decoded ahead
+FRAME_PROVIDER_MEMORY = 512 * 1024 * 1024
+FRAME_PROVIDER_WORKERS = 2
+PREFETCH_SIZE = 8
+
+# Tiled pyramid cache of the large frames (e.g. 8K): frames whose largest side is at least PYRAMID_MIN_SIZE are stored
+# in output/<video>/pyramids as levels of halved resolution cut into tiles, so that panning and zooming only decode
+# the visible tiles. Tile size (pixels) and decoded tiles kept in memory (bytes).
+PYRAMID_CACHE = False
+PYRAMID_MIN_SIZE = 4096
+PYRAMID_TILE_SIZE = 512
+PYRAMID_TILE_MEMORY = 256 * 1024 * 1024
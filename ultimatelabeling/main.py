@@ -26,6 +26,7 @@ class MainWindow(QMainWindow):
         mainMenu = self.menuBar()
 
         fileMenu = mainMenu.addMenu('&File')
+        editMenu = mainMenu.addMenu('&Edit')
         helpMenu = mainMenu.addMenu('&Help')
 
         close = QAction('Close window', self)
@@ -43,11 +44,31 @@ class MainWindow(QMainWindow):
         export.triggered.connect(self.central_widget.io.on_export_click)
         fileMenu.addAction(export)
 
+        export_project = QAction('Export project', self)
+        export_project.setShortcut('Ctrl+Shift+E')
+        export_project.triggered.connect(self.central_widget.io.on_export_project_click)
+        fileMenu.addAction(export_project)
+
+        export_yolo = QAction('Export YOLO labels', self)
+        export_yolo.setShortcut('Ctrl+Y')
+        export_yolo.triggered.connect(self.central_widget.io.on_export_yolo_click)
+        fileMenu.addAction(export_yolo)
+
         """save = QAction('Save', self)
         save.setShortcut('Ctrl+S')
         save.triggered.connect()
         fileMenu.addAction(save)"""
 
+        undo = QAction('Undo', self)
+        undo.setShortcut('Ctrl+Z')
+        undo.triggered.connect(self.central_widget.state.undo)
+        editMenu.addAction(undo)
+
+        redo = QAction('Redo', self)
+        redo.setShortcut('Ctrl+Shift+Z')
+        redo.triggered.connect(self.central_widget.state.redo)
+        editMenu.addAction(redo)
+
         help = QAction('Documentation', self)
         help.triggered.connect(self.open_url)
         helpMenu.addAction(help)
@@ -70,7 +91,8 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         print("exiting")
-        self.central_widget.state.track_info.save_to_disk()
+        self.central_widget.state.stop_extraction()
+        self.central_widget.state.save_to_disk()
         self.central_widget.state.save_state()
         exit()
 
@@ -96,6 +118,7 @@ class CentralWidget(QWidget, StateListener):
         self.tracking_manager = TrackingManager(self.state)
         self.hungarian_button = HungarianManager(self.state)
         self.info_detection = InfoDetection(self.state)
+        self.statistics = StatisticsPanel(self.state)
 
         self.io = IO(self, self.state)
 
@@ -146,6 +169,7 @@ class CentralWidget(QWidget, StateListener):
         control_layout.addWidget(self.hungarian_button)
         control_layout.addWidget(self.tracking_manager)
         control_layout.addWidget(self.info_detection)
+        control_layout.addWidget(self.statistics)
 
         control_layout.addStretch()
         control_box.setLayout(control_layout)
@@ -0,0 +1,63 @@
+"""
+Converts the annotations of the output/ tree to another storage backend.
+
+    python -m ultimatelabeling.migrate --to sqlite [video ...]
+
+The annotations of each video are read from its current store (any backend), or from the legacy layout
+(one <frame>.txt file per frame) if there is none. Edits still in the journal are kept and replayed on the new store
+when the video is opened. Set ANNOTATION_BACKEND in config.py to use the new backend.
+"""
+import argparse
+import os
+from ultimatelabeling.config import OUTPUT_DIR
+from ultimatelabeling.models.stores import STORES, create_store, store_exists
+
+
+def migrate_video(dir_name, backend, force=False):
+    """
+    Copies the annotations of a video directory into a store of the given backend.
+    Returns the number of migrated frames, None if the target store already exists.
+    """
+    if store_exists(dir_name, backend) and not force:
+        return None
+
+    target_path = os.path.join(dir_name, STORES[backend].FILE_NAME)
+    for path in [target_path, target_path + "-wal", target_path + "-shm"]:
+        if os.path.exists(path):
+            os.remove(path)
+
+    sources = [name for name in STORES if name != backend and store_exists(dir_name, name)]
+    target = create_store(dir_name, backend)
+
+    if sources:
+        source = create_store(dir_name, sources[0])
+        file_names = source.get_file_names()
+        target.set_frames({file_name: source.get_frame(file_name) for file_name in file_names})
+        nb_frames = len(file_names)
+    else:
+        nb_frames = target.import_txt()
+
+    target.commit()
+    return nb_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts the annotations of the output/ tree to another backend.")
+    parser.add_argument("--to", required=True, choices=list(STORES), help="target backend")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="annotations directory")
+    parser.add_argument("--force", action="store_true", help="overwrite existing stores of the target backend")
+    parser.add_argument("videos", nargs="*", help="videos to migrate (all by default)")
+    args = parser.parse_args()
+
+    videos = args.videos or sorted(next(os.walk(args.output_dir))[1])
+
+    for video in videos:
+        nb_frames = migrate_video(os.path.join(args.output_dir, video), args.to, args.force)
+        if nb_frames is None:
+            print("{}: already migrated".format(video))
+        else:
+            print("{}: {} frames migrated".format(video, nb_frames))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,21 @@
-from .state import *
-from .keyboard_listener import KeyboardNotifier, KeyboardListener
+import importlib
 from .track_info import TrackInfo, Detection
 
+# Models of the GUI, which need PyQt5 and pynput: imported on first access, so that the annotation models can be
+# imported without them (e.g. track_info and video_manifest by the detection server, detector.py)
+GUI_MODELS = {
+    "State": "state",
+    "StateListener": "state",
+    "FrameMode": "state",
+    "RightClickOption": "state",
+    "KeyboardNotifier": "keyboard_listener",
+    "KeyboardListener": "keyboard_listener"
+}
+
+
+def __getattr__(name):
+    if name not in GUI_MODELS:
+        raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+    module = importlib.import_module("." + GUI_MODELS[name], __name__)
+    return getattr(module, name)
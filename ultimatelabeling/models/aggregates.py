@@ -0,0 +1,165 @@
+import os
+from collections import Counter
+import numpy as np
+
+
+class Aggregates:
+    """
+    Statistics of the annotations of a video (detections per class, track lengths, detections per frame, frames
+    without labels), maintained incrementally.
+
+    The aggregates are built once from the columns of the whole video. Edited frames are then invalidated and, on the
+    next query, their previous contribution is subtracted and the new one added: the cost of a query depends on the
+    number of frames edited since the previous one, not on the length of the video.
+    """
+
+    def __init__(self, get_columns, get_ids):
+        self.get_columns = get_columns  # file_names -> columns of the frames ("frame", "track_id", "class_id")
+        self.get_ids = get_ids  # file_name -> (track ids, class ids) of a frame
+
+        self.file_paths = []
+        self.file_names = []
+        self.positions = {}  # file_name -> frame
+        self.frame_ids = []  # (track ids, class ids) of each frame, as last counted
+        self.density = np.zeros(0, dtype=np.int64)  # number of detections of each frame
+        self.class_counts = Counter()  # class_id -> number of detections
+        self.track_lengths = Counter()  # track_id -> number of frames
+        self.density_counts = Counter()  # number of detections -> number of frames
+        self.nb_detections = 0
+        self.built = False
+        self.stale = set()  # frames whose contribution has to be recomputed
+
+    def set_file_paths(self, file_paths):
+        """
+        Sets the image paths of the frames, in order. The aggregates are rebuilt only if the frames changed.
+        """
+        if file_paths == self.file_paths:
+            return
+
+        self.file_paths = list(file_paths)
+        self.file_names = [os.path.splitext(os.path.basename(path))[0] for path in self.file_paths]
+        self.positions = {file_name: frame for frame, file_name in enumerate(self.file_names)}
+        self.built = False
+        self.stale = set()
+
+    def invalidate(self, file_names=None):
+        """
+        Marks frames as modified (all frames if file_names is None)
+        """
+        if file_names is None:
+            self.built = False
+            return
+
+        if isinstance(file_names, str):
+            file_names = [file_names]
+
+        for file_name in file_names:
+            frame = self.positions.get(file_name)
+            if frame is not None:
+                self.stale.add(frame)
+
+    def build(self):
+        c = self.get_columns(self.file_names)
+        frames, track_ids, class_ids = c["frame"].astype(np.int64), c["track_id"], c["class_id"]
+        bounds = np.searchsorted(frames, np.arange(len(self.file_names) + 1))
+
+        self.frame_ids = [(track_ids[start:end], class_ids[start:end])
+                          for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist())]
+        self.density = np.diff(bounds).astype(np.int64)
+        self.class_counts = Counter(dict(zip(*[values.tolist() for values in np.unique(class_ids,
+                                                                                       return_counts=True)])))
+
+        # A track counts once per frame, even if it appears several times in it
+        pairs = np.unique(np.stack([frames, track_ids.astype(np.int64)], axis=1), axis=0) if len(frames) else \
+            np.zeros((0, 2), dtype=np.int64)
+        self.track_lengths = Counter(dict(zip(*[values.tolist() for values in np.unique(pairs[:, 1],
+                                                                                        return_counts=True)])))
+
+        self.density_counts = Counter(self.density.tolist())
+        self.nb_detections = len(frames)
+        self.built = True
+        self.stale = set()
+
+    @staticmethod
+    def _add(counter, key, n):
+        counter[key] += n
+        if counter[key] == 0:
+            del counter[key]
+
+    def _count(self, frame, sign):
+        track_ids, class_ids = self.frame_ids[frame]
+        for class_id, n in Counter(class_ids.tolist()).items():
+            self._add(self.class_counts, class_id, sign * n)
+        for track_id in set(track_ids.tolist()):
+            self._add(self.track_lengths, track_id, sign)
+        self._add(self.density_counts, len(track_ids), sign)
+        self.nb_detections += sign * len(track_ids)
+
+    def update(self):
+        if not self.built:
+            self.build()
+            return
+
+        for frame in self.stale:
+            self._count(frame, -1)
+            track_ids, class_ids = self.get_ids(self.file_names[frame])
+            self.frame_ids[frame] = (np.array(track_ids), np.array(class_ids))
+            self.density[frame] = len(track_ids)
+            self._count(frame, 1)
+        self.stale = set()
+
+    def get_nb_frames(self):
+        return len(self.file_names)
+
+    def get_nb_detections(self):
+        self.update()
+        return self.nb_detections
+
+    def get_class_counts(self):
+        """
+        Number of detections of each class id
+        """
+        self.update()
+        return dict(self.class_counts)
+
+    def get_track_length(self, track_id):
+        """
+        Number of frames containing a track
+        """
+        self.update()
+        return self.track_lengths.get(track_id, 0)
+
+    def get_track_lengths(self):
+        self.update()
+        return dict(self.track_lengths)
+
+    def get_density(self, frame=None):
+        """
+        Number of detections of a frame, or of every frame (array) if frame is None
+        """
+        self.update()
+        return self.density.copy() if frame is None else int(self.density[frame])
+
+    def get_nb_empty_frames(self):
+        self.update()
+        return self.density_counts.get(0, 0)
+
+    def get_empty_frames(self):
+        """
+        Indexes of the frames without any detection
+        """
+        self.update()
+        return np.flatnonzero(self.density == 0)
+
+    def get_summary(self):
+        self.update()
+        nb_frames = len(self.file_names)
+        return {
+            "nb_frames": nb_frames,
+            "nb_detections": self.nb_detections,
+            "nb_tracks": len(self.track_lengths),
+            "nb_empty_frames": self.density_counts.get(0, 0),
+            "mean_density": self.nb_detections / nb_frames if nb_frames else 0.,
+            "max_density": max(self.density_counts, default=0),
+            "class_counts": dict(self.class_counts)
+        }
@@ -0,0 +1,48 @@
+import threading
+
+
+class BufferStats:
+    """
+    Counts the image buffers allocated and the bytes copied by the frame pipeline (decode, compositing, viewport),
+    to measure them per displayed frame
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.nb_frames = 0
+            self.nb_allocations = 0
+            self.allocated = 0
+            self.nb_copies = 0
+            self.copied = 0
+
+    def allocation(self, nbytes):
+        with self.lock:
+            self.nb_allocations += 1
+            self.allocated += nbytes
+
+    def copy(self, nbytes):
+        with self.lock:
+            self.nb_copies += 1
+            self.copied += nbytes
+
+    def frame(self):
+        with self.lock:
+            self.nb_frames += 1
+
+    def get_statistics(self):
+        nb_frames = max(self.nb_frames, 1)
+        return {
+            "nb_frames": self.nb_frames,
+            "allocations_per_frame": self.nb_allocations / nb_frames,
+            "allocated_per_frame": self.allocated / nb_frames,
+            "copies_per_frame": self.nb_copies / nb_frames,
+            "copied_per_frame": self.copied / nb_frames
+        }
+
+
+# Shared by the frame provider, the compositor and the viewport
+buffer_stats = BufferStats()
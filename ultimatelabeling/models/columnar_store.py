@@ -0,0 +1,426 @@
+import os
+import threading
+import numpy as np
+from .detection_set import DetectionSet, take_ragged, concat_ragged
+from .track_index import TrackIndex
+from .locking import get_video_lock
+from . import txt_format
+from ultimatelabeling import utils
+
+
+class ColumnarStore:
+    """
+    Single-file columnar annotation store of one video.
+
+    Rows are sorted by frame and kept in fixed-width numeric columns (frame, track_id, class_id, x, y, w, h).
+    Polygons and keypoints are stored as flat float buffers indexed by per-row offsets.
+    Frame `i` owns rows frame_offsets[i]:frame_offsets[i + 1], so looking up a frame is O(1).
+
+    Edits are kept in an in-memory overlay of whole frames until commit() merges them into the columns and
+    atomically replaces the file on disk. A TrackIndex gives the frames and rows of each track_id.
+
+    All accesses are serialized by a reentrant lock so that the store can be committed from a background thread
+    (see PersistenceThread): only the in-memory merge holds the lock, not the disk write.
+
+    The file is shared with other processes (e.g. the detection server) through the lock of the video (see
+    VideoLock): it is read under the read lock, and commit() holds the write lock while it reloads the file if another
+    process replaced it, merges the overlay (edits of this process win, frame by frame) and atomically replaces it.
+    """
+
+    FILE_NAME = "annotations.npz"
+
+    def __init__(self, dir_name):
+        self.dir_name = dir_name
+        self.file_path = os.path.join(dir_name, self.FILE_NAME)
+        self.lock = threading.RLock()
+        self.file_lock = get_video_lock(dir_name)
+        self.file_signature = None  # identifies the version of the file the columns were loaded from
+
+        self.frame_names = []
+        self.frame_index = {}
+        self.frame_offsets = np.zeros(1, dtype=np.int64)
+        self.columns = self.empty_columns()
+        self.track_index = self.build_track_index()
+
+        self.overlay = {}  # file_name -> DetectionSet, overrides the committed columns
+        self.removed = set()  # frames deleted since the last commit (empty in the overlay)
+        self.track_edits = []  # batch edits of committed rows since the last commit, re-applied on reload
+        self.dirty = False
+
+        self.load()
+
+    @staticmethod
+    def empty_columns():
+        return {
+            "frame": np.zeros(0, dtype=np.int32),
+            "track_id": np.zeros(0, dtype=np.int32),
+            "class_id": np.zeros(0, dtype=np.int32),
+            "x": np.zeros(0, dtype=float),
+            "y": np.zeros(0, dtype=float),
+            "w": np.zeros(0, dtype=float),
+            "h": np.zeros(0, dtype=float),
+            "polygon_offsets": np.zeros(1, dtype=np.int64),
+            "polygon_data": np.zeros(0, dtype=float),
+            "kp_offsets": np.zeros(1, dtype=np.int64),
+            "kp_data": np.zeros(0, dtype=float)
+        }
+
+    def exists(self):
+        return os.path.exists(self.file_path)
+
+    def get_file_signature(self):
+        if not self.exists():
+            return None
+
+        stat = os.stat(self.file_path)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def load(self):
+        with self.lock:
+            track_order = self._load_committed()
+            self.track_index = self.build_track_index(track_order)
+            self.overlay = {}
+            self.removed = set()
+            self.track_edits = []
+            self.dirty = False
+
+    def _load_committed(self):
+        """
+        Loads the committed rows from the file, returns the persisted order of the track index
+        """
+        with self.file_lock.read():
+            self.file_signature = self.get_file_signature()
+            if self.file_signature is None:
+                return None
+
+            with np.load(self.file_path, allow_pickle=False) as data:
+                self.frame_names = data["frame_names"].tolist()
+                self.frame_offsets = data["frame_offsets"]
+                self.columns = {k: data[k] for k in self.empty_columns()}
+                track_order = data["track_order"] if "track_order" in data else None
+
+        self.frame_index = {name: i for i, name in enumerate(self.frame_names)}
+        return track_order
+
+    def refresh(self):
+        """
+        Reloads the committed rows if the file was replaced by another process, keeping the overlay and re-applying
+        the batch edits of committed rows. Returns True if the file was reloaded.
+        """
+        with self.lock:
+            if self.get_file_signature() == self.file_signature:
+                return False
+
+            self._load_committed()
+            self._reindex()
+            for edit, args in self.track_edits:
+                edit(*args)
+            return True
+
+    def has_frame(self, file_name):
+        with self.lock:
+            if file_name in self.overlay:
+                return file_name not in self.removed
+            return file_name in self.frame_index
+
+    def get_file_names(self):
+        with self.lock:
+            names = (set(self.frame_index) | set(self.overlay)) - self.removed
+            return sorted(names, key=utils.natural_sort_key)
+
+    def _get_rows(self, file_name):
+        i = self.frame_index[file_name]
+        return self.frame_offsets[i], self.frame_offsets[i + 1]
+
+    def get_frame(self, file_name):
+        """
+        Returns a copy of the detections of a frame as a DetectionSet (empty if the frame has no annotations)
+        """
+        with self.lock:
+            if file_name in self.overlay:
+                return self.overlay[file_name].copy()
+
+            if file_name not in self.frame_index:
+                return DetectionSet()
+
+            start, end = self._get_rows(file_name)
+            return DetectionSet.from_columns(self.columns, start, end)
+
+    def get_columns(self, file_names):
+        """
+        Returns the rows of several frames as one set of columns, in a single pass over the store.
+        The "frame" column is the index of the frame in file_names and rows are sorted by frame.
+        """
+        with self.lock:
+            positions = {name: i for i, name in enumerate(file_names)}
+
+            # Committed frame number -> position in file_names, -1 if not requested or overridden by the overlay
+            frame_map = np.array([-1 if name in self.overlay else positions.get(name, -1)
+                                  for name in self.frame_names], dtype=np.int32)
+            c = self.columns
+            keep = frame_map[c["frame"]] >= 0 if len(c["frame"]) else np.zeros(0, dtype=bool)
+
+            parts = [self._take_rows(c, keep, frame_map)]
+            parts.extend(self.columns_from_detections(detections, frame=positions[file_name])
+                         for file_name, detections in self.overlay.items() if file_name in positions)
+
+        columns = self._concat_columns(parts)
+        return self._take_rows(columns, np.argsort(columns["frame"], kind="stable"))
+
+    def get_track_ids(self, file_name):
+        with self.lock:
+            if file_name in self.overlay:
+                return np.sort(self.overlay[file_name].track_ids)
+
+            if file_name not in self.frame_index:
+                return np.zeros(0, dtype=np.int32)
+
+            start, end = self._get_rows(file_name)
+            return np.sort(self.columns["track_id"][start:end])
+
+    def build_track_index(self, track_order=None):
+        return TrackIndex(self.frame_names, self.columns["frame"], self.columns["track_id"], track_order)
+
+    def get_track_frames(self, track_id):
+        with self.lock:
+            return self.track_index.get_frames(track_id)
+
+    def set_frame(self, file_name, detections):
+        with self.lock:
+            if file_name not in self.overlay and self._frame_equals(file_name, detections):
+                return
+
+            self.overlay[file_name] = DetectionSet(detections)
+            self.track_index.set_frame(file_name, self.overlay[file_name].track_ids)
+            self.removed.discard(file_name)
+            self.dirty = True
+
+    def remove_frame(self, file_name):
+        """
+        Deletes a frame (e.g. removed from the video), its rows are dropped from the file on commit
+        """
+        with self.lock:
+            self.set_frame(file_name, DetectionSet())
+            self.removed.add(file_name)
+
+    def set_frames(self, frames):
+        """
+        Sets several frames at once, frames is a dictionary file_name -> DetectionSet (or list of Detection)
+        """
+        with self.lock:
+            for file_name, detections in frames.items():
+                self.set_frame(file_name, detections)
+
+    def remove_track(self, track_id, file_names):
+        """
+        Removes a track from the given frames in a single batch.
+        Committed rows are deleted directly using the track index, without decoding the frames.
+        """
+        with self.lock:
+            file_names = set(file_names)
+
+            for file_name in file_names & set(self.overlay):
+                detections = self.overlay[file_name]
+                self.set_frame(file_name, detections.filter(detections.track_ids != track_id))
+
+            self.track_edits.append((self._remove_track_rows, (track_id, file_names)))
+            self._remove_track_rows(track_id, file_names)
+
+    def _remove_track_rows(self, track_id, file_names):
+        with self.lock:
+            rows = self.track_index.get_committed_rows(track_id, file_names)
+            if len(rows) == 0:
+                return
+
+            keep = np.ones(len(self.columns["frame"]), dtype=bool)
+            keep[rows] = False
+            self.columns = self._take_rows(self.columns, keep)
+
+            counts = np.bincount(self.columns["frame"], minlength=len(self.frame_names))
+            self.frame_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+            self._reindex()
+
+    def modify_track_class_id(self, track_id, class_id, file_names):
+        """
+        Changes the class of a track in the given frames in a single batch.
+        Committed rows are modified in place using the track index, without decoding the frames.
+        """
+        with self.lock:
+            file_names = set(file_names)
+
+            for file_name in file_names & set(self.overlay):
+                self.overlay[file_name].set_class(track_id, class_id)
+                self.dirty = True
+
+            self.track_edits.append((self._set_track_class_rows, (track_id, class_id, file_names)))
+            self._set_track_class_rows(track_id, class_id, file_names)
+
+    def _set_track_class_rows(self, track_id, class_id, file_names):
+        with self.lock:
+            rows = self.track_index.get_committed_rows(track_id, file_names)
+            if len(rows) == 0:
+                return
+
+            class_ids = self.columns["class_id"].copy()
+            class_ids[rows] = class_id
+            self.columns = dict(self.columns, class_id=class_ids)
+            self.dirty = True
+
+    def _reindex(self):
+        """
+        Rebuilds the committed part of the track index after the columns changed, keeping overlay frames indexed
+        """
+        overlay = self.track_index.overlay
+        self.track_index = self.build_track_index()
+        for file_name, track_ids in overlay.items():
+            self.track_index.set_frame(file_name, track_ids)
+        self.dirty = True
+
+    def _frame_equals(self, file_name, detections):
+        """
+        Checks whether detections are identical to the committed rows of a frame, to avoid needless rewrites
+        """
+        if file_name not in self.frame_index:
+            return False
+
+        start, end = self._get_rows(file_name)
+        if end - start != len(detections):
+            return False
+
+        c = self.columns
+        new = self.columns_from_detections(detections)
+        rows = np.arange(start, end)
+        committed = self._take_rows(c, rows)
+
+        return all(np.array_equal(new[k], committed[k]) for k in new if k != "frame")
+
+    @staticmethod
+    def columns_from_detections(detections, frame=0):
+        """
+        Builds the column arrays of the detections (DetectionSet or list of Detection) of a frame.
+        """
+        if not isinstance(detections, DetectionSet):
+            detections = DetectionSet(detections)
+        return detections.to_columns(frame)
+
+    def commit(self):
+        """
+        Merges the overlay into the columns and atomically rewrites the store file.
+        Returns False if there was nothing to commit.
+        """
+        with self.file_lock.write():
+            self.refresh()
+
+            snapshot = self.merge()
+            if snapshot is None:
+                return False
+
+            self.write(snapshot)
+            return True
+
+    def merge(self):
+        """
+        Merges the overlay into the columns in memory.
+        Returns the snapshot to pass to write(), or None if there was nothing to commit.
+        """
+        with self.lock:
+            if not self.dirty:
+                return None
+
+            return self._merge()
+
+    def _merge(self):
+        frame_names = self.get_file_names()
+        new_index = {name: i for i, name in enumerate(frame_names)}
+
+        # Committed rows whose frame was not overridden are kept as-is, only their frame number is remapped
+        old_to_new = np.array([new_index.get(name, -1) for name in self.frame_names], dtype=np.int32)
+        kept_frames = np.array([name not in self.overlay for name in self.frame_names], dtype=bool)
+        c = self.columns
+        keep = kept_frames[c["frame"]] if len(c["frame"]) else np.zeros(0, dtype=bool)
+
+        parts = [self._take_rows(c, keep, old_to_new)]
+        parts.extend(self.columns_from_detections(detections, frame=new_index[file_name])
+                     for file_name, detections in self.overlay.items() if file_name not in self.removed)
+
+        columns = self._concat_columns(parts)
+
+        # Sort rows by frame (stable to preserve the order of detections inside a frame)
+        order = np.argsort(columns["frame"], kind="stable")
+        columns = self._take_rows(columns, order)
+
+        counts = np.bincount(columns["frame"], minlength=len(frame_names))
+        frame_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        track_index = TrackIndex(frame_names, columns["frame"], columns["track_id"])
+
+        self.frame_names = frame_names
+        self.frame_index = new_index
+        self.frame_offsets = frame_offsets
+        self.columns = columns
+        self.track_index = track_index
+        self.overlay = {}
+        self.removed = set()
+        self.track_edits = []
+        self.dirty = False
+
+        return frame_names, frame_offsets, columns, track_index.order
+
+    @staticmethod
+    def _take_rows(columns, rows, frame_map=None):
+        """
+        Selects rows (boolean mask or index array) of a column dictionary, including the ragged buffers.
+        """
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+
+        taken = {k: columns[k][rows] for k in ["frame", "track_id", "class_id", "x", "y", "w", "h"]}
+        if frame_map is not None:
+            taken["frame"] = frame_map[taken["frame"]].astype(np.int32)
+
+        for k in ["polygon", "kp"]:
+            taken[k + "_offsets"], taken[k + "_data"] = take_ragged(columns[k + "_offsets"], columns[k + "_data"], rows)
+
+        return taken
+
+    @staticmethod
+    def _concat_columns(parts):
+        columns = {k: np.concatenate([p[k] for p in parts]) for k in ["frame", "track_id", "class_id",
+                                                                      "x", "y", "w", "h"]}
+        for k in ["polygon", "kp"]:
+            columns[k + "_offsets"], columns[k + "_data"] = concat_ragged([(p[k + "_offsets"], p[k + "_data"])
+                                                                           for p in parts])
+        return columns
+
+    def write(self, snapshot):
+        """
+        Atomically writes a snapshot returned by merge() to disk. Does not hold the lock: columns are never modified
+        in place once merged. Should be called under the write lock of the video (see commit()).
+        """
+        frame_names, frame_offsets, columns, track_order = snapshot
+
+        if not os.path.exists(self.dir_name):
+            os.makedirs(self.dir_name)
+
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, frame_names=np.array(frame_names, dtype=str), frame_offsets=frame_offsets,
+                     track_order=track_order, **columns)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.file_path)
+        self.file_signature = self.get_file_signature()
+
+    def import_txt(self, dir_name=None, workers=None):
+        """
+        Imports the legacy layout (one space-separated <frame>.txt file per frame) into the overlay.
+        Returns the number of imported frames.
+        """
+        return txt_format.import_txt(self, self.dir_name if dir_name is None else dir_name, workers)
+
+    def export_txt(self, dir_name=None):
+        """
+        Exports every annotated frame to the legacy layout (one space-separated <frame>.txt file per frame).
+        """
+        txt_format.export_txt(self, self.dir_name if dir_name is None else dir_name)
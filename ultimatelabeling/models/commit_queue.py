@@ -0,0 +1,57 @@
+import threading
+from collections import deque
+
+
+class CommitQueue(threading.Thread):
+    """
+    Single writer of the annotation edits produced by background workers (tracker, detector).
+
+    Workers submit edits (a function and its arguments) and go on with the next frame without waiting: the edits are
+    applied in submission order by this thread, so concurrent tracking and detection runs never interleave inside
+    an edit and don't go through the GUI thread. barrier() waits until every edit submitted before the call is applied,
+    e.g. before displaying a frame.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+
+        self.condition = threading.Condition()
+        self.edits = deque()
+        self.submitted = 0
+        self.completed = 0
+
+    def submit(self, function, *args):
+        with self.condition:
+            if not self.is_alive():
+                self.start()
+
+            self.edits.append((function, args))
+            self.submitted += 1
+            self.condition.notify_all()
+
+    def barrier(self, timeout=None):
+        """
+        Waits until every edit submitted before this call is applied. Returns False if the timeout expired.
+        """
+        if threading.current_thread() is self:
+            return True
+
+        with self.condition:
+            ticket = self.submitted
+            return self.condition.wait_for(lambda: self.completed >= ticket, timeout)
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.edits)
+                edits, self.edits = self.edits, deque()
+
+            for function, args in edits:
+                try:
+                    function(*args)
+                except Exception as e:
+                    print("Error while applying an annotation edit: {}".format(e))
+
+            with self.condition:
+                self.completed += len(edits)
+                self.condition.notify_all()
@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+from .viewport import get_buffer
+from .buffer_stats import buffer_stats
+
+# Pixels around the coordinates of a detection covered by its drawing (line thickness, keypoint lines)
+DRAWING_MARGIN = 8
+
+
+def get_extent(detection):
+    """
+    Rectangle (x1, y1, x2, y2) containing the coordinates of a detection, None if it has none
+    """
+    xs, ys = [], []
+    if detection.bbox:
+        x1, y1, x2, y2 = detection.bbox.corners
+        xs += [x1, x2]
+        ys += [y1, y2]
+    xs += detection.polygon.coords[0::2].tolist() + detection.keypoints.coords[0::3].tolist()
+    ys += detection.polygon.coords[1::2].tolist() + detection.keypoints.coords[1::3].tolist()
+
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def union(rect1, rect2):
+    if rect1 is None:
+        return rect2
+    if rect2 is None:
+        return rect1
+    return min(rect1[0], rect2[0]), min(rect1[1], rect2[1]), max(rect1[2], rect2[2]), max(rect1[3], rect2[3])
+
+
+class Compositor:
+    """
+    Image displayed by the viewer, composed of three layers:
+    - base: the decoded frame (read-only, shared with the frame provider)
+    - overlay: the base with the detections which are not being edited drawn on it, cached until they change
+    - dynamic: the detection being edited (dragged, resized, drawn), blended with the other layers
+
+    The overlay is copy-on-write: without static drawings it is the base itself, the frame is only copied (into a
+    reused buffer) to be drawn on. While a detection is edited, the displayed image is the overlay faded into the base
+    (computed once) and each update of the dynamic layer only recomposites the rectangle covering its previous and new
+    drawings.
+    """
+
+    def __init__(self, transparency=0.8):
+        self.transparency = transparency  # weight of the base under the drawings while editing
+        self.base = None
+        self.overlay = None  # base, or buffer with the static drawings
+        self.buffer = None  # buffer of the overlay, reused from frame to frame
+        self.composite = None  # faded overlay with the dynamic layer, while editing
+        self.layer = None  # buffer of the dirty rectangle, reused while large enough
+        self.editing = False
+        self.dynamic_rect = None  # rectangle of the last drawing of the dynamic layer
+
+    def set_frame(self, base, draw=None):
+        """
+        Sets the base and draws the static detections with draw(overlay), if there are some
+        """
+        self.base = base
+        if draw is None:
+            self.overlay = base
+        else:
+            self.buffer = get_buffer(self.buffer, base.shape)
+            np.copyto(self.buffer, base)
+            buffer_stats.copy(base.nbytes)
+            draw(self.buffer)
+            self.overlay = self.buffer
+
+        self.editing = False
+        self.dynamic_rect = None
+
+    def get_image(self):
+        return self.composite if self.editing else self.overlay
+
+    def clip(self, rect, margin=DRAWING_MARGIN):
+        if rect is None:
+            return None
+
+        h, w = self.base.shape[:2]
+        x1, y1 = max(int(rect[0]) - margin, 0), max(int(rect[1]) - margin, 0)
+        x2, y2 = min(int(np.ceil(rect[2])) + margin + 1, w), min(int(np.ceil(rect[3])) + margin + 1, h)
+        return (x1, y1, x2, y2) if x2 > x1 and y2 > y1 else None
+
+    def draw_dynamic(self, draw, extent):
+        """
+        Draws the detection being edited with draw(layer, offset), offset being the position of the layer in the image,
+        the drawing is contained in the rectangle extent (image coordinates). Returns the recomposited rectangle.
+        """
+        if not self.editing:
+            self.composite = get_buffer(self.composite, self.base.shape)
+            cv2.addWeighted(self.base, self.transparency, self.overlay, 1 - self.transparency, 0, dst=self.composite)
+            buffer_stats.copy(self.composite.nbytes)
+            self.editing = True
+
+        rect = self.clip(extent)
+        dirty = union(rect, self.dynamic_rect)
+        self.dynamic_rect = rect
+        if dirty is None:
+            return None
+
+        x1, y1, x2, y2 = dirty
+        if self.layer is None or self.layer.shape[0] < y2 - y1 or self.layer.shape[1] < x2 - x1:
+            self.layer = get_buffer(None, self.base.shape)  # allocated once, at the size of the frame
+        layer = self.layer[:y2 - y1, :x2 - x1]
+
+        np.copyto(layer, self.overlay[y1:y2, x1:x2])
+        draw(layer, (x1, y1))
+        cv2.addWeighted(self.base[y1:y2, x1:x2], self.transparency, layer, 1 - self.transparency, 0,
+                        dst=self.composite[y1:y2, x1:x2])
+        buffer_stats.copy(2 * layer.nbytes)
+        return dirty
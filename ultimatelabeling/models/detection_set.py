@@ -0,0 +1,504 @@
+import numpy as np
+from .polygon import Polygon, Bbox, Keypoints
+
+
+def take_ragged(offsets, data, rows):
+    """
+    Selects rows (index array) of a ragged buffer, returns the new offsets and data
+    """
+    starts, ends = offsets[rows], offsets[rows + 1]
+    lengths = ends - starts
+    new_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+    if new_offsets[-1] == 0:
+        return new_offsets, np.zeros(0, dtype=float)
+
+    idx = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+    return new_offsets, data[idx]
+
+
+def concat_ragged(parts):
+    """
+    Concatenates (offsets, data) ragged buffers
+    """
+    offsets, shift = [np.zeros(1, dtype=np.int64)], 0
+    for part_offsets, _ in parts:
+        offsets.append(part_offsets[1:] + shift)
+        shift += part_offsets[-1]
+    return np.concatenate(offsets).astype(np.int64), np.concatenate([data for _, data in parts]).astype(float)
+
+
+def ragged_to_str(offsets, data):
+    """
+    Formats each row of a ragged buffer as a space-separated string (same format as Polygon.to_str)
+    """
+    values = data.astype(str)
+    return [" ".join(values[start:end]) for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def ragged_from_str(strings):
+    """
+    Parses space-separated strings (or sequences of coordinates) into a ragged buffer (offsets, data)
+    """
+    rows = [s.split() if isinstance(s, str) else s for s in strings]
+    lengths = [len(row) for row in rows]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+    if offsets[-1] == 0:
+        return offsets, np.zeros(0, dtype=float)
+    return offsets, np.array([x for row in rows for x in row], dtype=float)
+
+
+class Detection:
+    """
+    A detection is either standalone, or a view on a row of a DetectionSet: its attributes then read and write the
+    arrays of the set. A view is detached (becomes standalone again) when it is removed from its set.
+    """
+
+    __slots__ = ("_set", "_row", "_class_id", "_track_id", "_polygon", "_bbox", "_keypoints")
+
+    def __init__(self, class_id=0, track_id=0, polygon=Polygon(), bbox=Bbox(), keypoints=Keypoints()):
+        self._set = None
+        self._row = None
+
+        self._class_id = class_id
+        self._track_id = track_id
+        self._polygon = polygon
+        self._bbox = bbox
+        self._keypoints = keypoints
+
+    @property
+    def class_id(self):
+        if self._set is None:
+            return self._class_id
+        return int(self._set.class_ids[self._row])
+
+    @class_id.setter
+    def class_id(self, class_id):
+        if self._set is None:
+            self._class_id = class_id
+        else:
+            self._set.class_ids[self._row] = class_id
+
+    @property
+    def track_id(self):
+        if self._set is None:
+            return self._track_id
+        return int(self._set.track_ids[self._row])
+
+    @track_id.setter
+    def track_id(self, track_id):
+        if self._set is None:
+            self._track_id = track_id
+        else:
+            self._set.track_ids[self._row] = track_id
+
+    @property
+    def bbox(self):
+        if self._set is not None and self._bbox is None:
+            # Writes back to the row of the set, kept until the view is rebound
+            self._bbox = Bbox.from_array(self._set.boxes[self._row])
+        return self._bbox
+
+    @bbox.setter
+    def bbox(self, bbox):
+        if self._set is None:
+            self._bbox = bbox
+        else:
+            self._set.boxes[self._row] = bbox.xywh
+            self._bbox = None
+
+    @property
+    def polygon(self):
+        if self._set is None:
+            return self._polygon
+        return Polygon.from_array(self._set.get_polygon(self._row))
+
+    @polygon.setter
+    def polygon(self, polygon):
+        if self._set is None:
+            self._polygon = polygon
+        else:
+            self._set.set_polygon(self._row, polygon.coords)
+
+    @property
+    def keypoints(self):
+        if self._set is None:
+            return self._keypoints
+        return Keypoints.from_array(self._set.get_keypoints(self._row))
+
+    @keypoints.setter
+    def keypoints(self, keypoints):
+        if self._set is None:
+            self._keypoints = keypoints
+        else:
+            self._set.set_keypoints(self._row, keypoints.coords)
+
+    def _bind(self, detection_set, row):
+        self._set, self._row = detection_set, row
+        self._polygon = self._bbox = self._keypoints = None
+
+    def _detach(self):
+        self._class_id, self._track_id = self.class_id, self.track_id
+        self._polygon, self._bbox, self._keypoints = self.polygon.copy(), self.bbox.copy(), self.keypoints.copy()
+        self._set, self._row = None, None
+
+    @staticmethod
+    def from_json(data):
+        return Detection(data["class_id"], data["track_id"],
+                         Polygon(data["polygon"]), Bbox(*data["bbox"]), Keypoints(data["keypoints"]))
+
+    def to_json(self):
+        return {
+            "track_id": self.track_id,
+            "class_id": self.class_id,
+            "polygon": self.polygon.to_json(),
+            "bbox": self.bbox.to_json(),
+            "keypoints": self.keypoints.to_json()
+        }
+
+    def to_dict(self):
+        return {"track_id": self.track_id, "class_id": self.class_id, **self.bbox.to_dict(),
+                "polygon": self.polygon.to_str(), "kp": self.keypoints.to_str()}
+
+    @staticmethod
+    def from_df(row):
+        bbox = Bbox(row.x, row.y, row.w, row.h)
+        return Detection(row.class_id, row.track_id, Polygon.from_str(row.polygon), bbox, Keypoints.from_str(row.kp))
+
+    def copy(self):
+        return Detection(self.class_id, self.track_id, self.polygon.copy(), self.bbox.copy(), self.keypoints.copy())
+
+    def __repr__(self):
+        return "Detection(class_id={}, track_id={}, bbox={}, polygon={}, keypoints={})".format(self.class_id, self.track_id,
+                                                                                 self.bbox, self.polygon, self.keypoints)
+
+
+class DetectionSet:
+    """
+    Detections of one frame stored as a structure of arrays: track_ids, class_ids, boxes (N x 4 array of x, y, w, h)
+    and ragged polygon / keypoints buffers (flat data indexed by per-row offsets).
+
+    The set behaves like a list of Detection: indexing or iterating returns Detection views on its rows (the same
+    view object for a given row), append/insert/__setitem__ take ownership of standalone detections (which become
+    views), and pop/remove detach the removed views. Vectorized operations (filter, lookup, IoU) work on the arrays
+    directly.
+    """
+
+    def __init__(self, detections=()):
+        """
+        Copies the values of a list of detections (or of another DetectionSet)
+        """
+        if isinstance(detections, DetectionSet):
+            self._set_arrays(detections._get_arrays(copy=True))
+        else:
+            self._set_arrays(self._arrays_from_detections(list(detections)))
+        self.views = [None] * len(self.track_ids)
+
+    @staticmethod
+    def from_arrays(track_ids, class_ids, boxes, polygon_offsets=None, polygon_data=None, kp_offsets=None,
+                    kp_data=None):
+        n = len(track_ids)
+        empty_offsets, empty_data = np.zeros(n + 1, dtype=np.int64), np.zeros(0, dtype=float)
+
+        detection_set = DetectionSet.__new__(DetectionSet)
+        detection_set._set_arrays({
+            "track_ids": np.asarray(track_ids, dtype=np.int32),
+            "class_ids": np.asarray(class_ids, dtype=np.int32),
+            "boxes": np.asarray(boxes, dtype=float).reshape(-1, 4),
+            "polygon_offsets": empty_offsets if polygon_offsets is None else np.asarray(polygon_offsets, np.int64),
+            "polygon_data": empty_data if polygon_data is None else np.asarray(polygon_data, dtype=float),
+            "kp_offsets": empty_offsets if kp_offsets is None else np.asarray(kp_offsets, dtype=np.int64),
+            "kp_data": empty_data if kp_data is None else np.asarray(kp_data, dtype=float)
+        })
+        detection_set.views = [None] * n
+        return detection_set
+
+    @staticmethod
+    def from_columns(columns, start, end):
+        """
+        Copies rows start:end of the columns of a ColumnarStore
+        """
+        poly_offsets, kp_offsets = columns["polygon_offsets"], columns["kp_offsets"]
+        boxes = np.stack([columns[k][start:end] for k in ["x", "y", "w", "h"]], axis=1)
+
+        return DetectionSet.from_arrays(
+            columns["track_id"][start:end].copy(), columns["class_id"][start:end].copy(), boxes,
+            poly_offsets[start:end + 1] - poly_offsets[start],
+            columns["polygon_data"][poly_offsets[start]:poly_offsets[end]].copy(),
+            kp_offsets[start:end + 1] - kp_offsets[start],
+            columns["kp_data"][kp_offsets[start]:kp_offsets[end]].copy())
+
+    def to_columns(self, frame=0):
+        """
+        Returns the columns of a ColumnarStore for this frame
+        """
+        return {
+            "frame": np.full(len(self), frame, dtype=np.int32),
+            "track_id": self.track_ids.copy(),
+            "class_id": self.class_ids.copy(),
+            "x": self.boxes[:, 0].copy(),
+            "y": self.boxes[:, 1].copy(),
+            "w": self.boxes[:, 2].copy(),
+            "h": self.boxes[:, 3].copy(),
+            "polygon_offsets": self.polygon_offsets.copy(),
+            "polygon_data": self.polygon_data.copy(),
+            "kp_offsets": self.kp_offsets.copy(),
+            "kp_data": self.kp_data.copy()
+        }
+
+    @staticmethod
+    def _arrays_from_detections(detections):
+        polygons = [d.polygon.coords for d in detections]
+        keypoints = [d.keypoints.coords for d in detections]
+
+        return {
+            "track_ids": np.array([d.track_id for d in detections], dtype=np.int32),
+            "class_ids": np.array([d.class_id for d in detections], dtype=np.int32),
+            "boxes": np.array([d.bbox.xywh for d in detections], dtype=float).reshape(-1, 4),
+            "polygon_offsets": np.concatenate([[0], np.cumsum([len(p) for p in polygons])]).astype(np.int64),
+            "polygon_data": np.concatenate(polygons).astype(float) if polygons else np.zeros(0, dtype=float),
+            "kp_offsets": np.concatenate([[0], np.cumsum([len(k) for k in keypoints])]).astype(np.int64),
+            "kp_data": np.concatenate(keypoints).astype(float) if keypoints else np.zeros(0, dtype=float)
+        }
+
+    def _get_arrays(self, copy=False):
+        arrays = {k: getattr(self, k) for k in ["track_ids", "class_ids", "boxes", "polygon_offsets", "polygon_data",
+                                                 "kp_offsets", "kp_data"]}
+        return {k: v.copy() for k, v in arrays.items()} if copy else arrays
+
+    def _set_arrays(self, arrays):
+        for k, v in arrays.items():
+            setattr(self, k, v)
+
+    def _take(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        polygon_offsets, polygon_data = take_ragged(self.polygon_offsets, self.polygon_data, rows)
+        kp_offsets, kp_data = take_ragged(self.kp_offsets, self.kp_data, rows)
+
+        return {
+            "track_ids": self.track_ids[rows],
+            "class_ids": self.class_ids[rows],
+            "boxes": self.boxes[rows].reshape(-1, 4),
+            "polygon_offsets": polygon_offsets,
+            "polygon_data": polygon_data,
+            "kp_offsets": kp_offsets,
+            "kp_data": kp_data
+        }
+
+    def _assign(self, entries):
+        """
+        Rebuilds the set from a list of entries: row numbers of this set or Detection objects.
+        Views of removed rows are detached, standalone detections become views of the set.
+        """
+        n = len(self)
+        rows, others = [], []
+        for entry in entries:
+            if isinstance(entry, Detection):
+                if entry._set is self:
+                    rows.append(entry._row)
+                else:
+                    rows.append(n + len(others))
+                    others.append(entry)
+            else:
+                rows.append(int(entry))
+
+        combined = DetectionSet.__new__(DetectionSet)
+        combined._set_arrays(self._get_arrays())
+        if others:
+            other_arrays = self._arrays_from_detections(others)
+            combined._set_arrays({
+                "track_ids": np.concatenate([self.track_ids, other_arrays["track_ids"]]),
+                "class_ids": np.concatenate([self.class_ids, other_arrays["class_ids"]]),
+                "boxes": np.concatenate([self.boxes, other_arrays["boxes"]])
+            })
+            for k in ["polygon", "kp"]:
+                offsets, data = concat_ragged([(getattr(self, k + "_offsets"), getattr(self, k + "_data")),
+                                               (other_arrays[k + "_offsets"], other_arrays[k + "_data"])])
+                setattr(combined, k + "_offsets", offsets)
+                setattr(combined, k + "_data", data)
+
+        arrays = combined._take(rows)
+
+        # Each existing view follows its row (only the first occurrence if a row is duplicated)
+        views, seen, bound = [], set(), set()
+        for row in rows:
+            if row < n and row not in seen:
+                views.append(self.views[row])
+                seen.add(row)
+            elif row >= n and others[row - n]._set is None and id(others[row - n]) not in bound:
+                views.append(others[row - n])
+                bound.add(id(others[row - n]))
+            else:
+                views.append(None)
+
+        for row, view in enumerate(self.views):
+            if view is not None and row not in seen:
+                view._detach()
+
+        self._set_arrays(arrays)
+        self.views = views
+        for row, view in enumerate(views):
+            if view is not None:
+                view._bind(self, row)
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def _get_view(self, row):
+        view = self.views[row]
+        if view is None:
+            view = Detection()
+            view._bind(self, row)
+            self.views[row] = view
+        return view
+
+    def _normalize_index(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("DetectionSet index out of range")
+        return i
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._get_view(row) for row in range(*i.indices(len(self)))]
+        return self._get_view(self._normalize_index(i))
+
+    def __setitem__(self, i, value):
+        entries = list(range(len(self)))
+        if isinstance(i, slice):
+            entries[i] = list(value)
+        else:
+            entries[self._normalize_index(i)] = value
+        self._assign(entries)
+
+    def __delitem__(self, i):
+        entries = list(range(len(self)))
+        del entries[i]
+        self._assign(entries)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self._get_view(row)
+
+    def __contains__(self, detection):
+        return isinstance(detection, Detection) and detection._set is self
+
+    def append(self, detection):
+        self._assign(list(range(len(self))) + [detection])
+
+    def extend(self, detections):
+        self._assign(list(range(len(self))) + list(detections))
+
+    def insert(self, i, detection):
+        entries = list(range(len(self)))
+        entries.insert(i, detection)
+        self._assign(entries)
+
+    def pop(self, i=-1):
+        detection = self[i]
+        del self[detection._row]
+        return detection
+
+    def remove(self, detection):
+        del self[self.index(detection)]
+
+    def index(self, detection):
+        if detection not in self:
+            raise ValueError("{} is not in the DetectionSet".format(detection))
+        return detection._row
+
+    def clear(self):
+        self._assign([])
+
+    def copy(self):
+        return DetectionSet(self)
+
+    def to_detections(self):
+        """
+        Returns standalone copies of the detections
+        """
+        return [d.copy() for d in self]
+
+    def get_polygon(self, row):
+        return self.polygon_data[self.polygon_offsets[row]:self.polygon_offsets[row + 1]]
+
+    def get_keypoints(self, row):
+        return self.kp_data[self.kp_offsets[row]:self.kp_offsets[row + 1]]
+
+    def _set_ragged(self, k, row, coords):
+        offsets, data = getattr(self, k + "_offsets"), getattr(self, k + "_data")
+        coords = np.asarray(coords, dtype=float)
+        start, end = offsets[row], offsets[row + 1]
+
+        setattr(self, k + "_data", np.concatenate([data[:start], coords, data[end:]]))
+        offsets = offsets.copy()
+        offsets[row + 1:] += len(coords) - (end - start)
+        setattr(self, k + "_offsets", offsets)
+
+    def set_polygon(self, row, coords):
+        self._set_ragged("polygon", row, coords)
+
+    def set_keypoints(self, row, coords):
+        self._set_ragged("kp", row, coords)
+
+    def has_keypoints(self):
+        """
+        Boolean mask of the rows with keypoints
+        """
+        return np.diff(self.kp_offsets) > 0
+
+    def filter(self, mask):
+        """
+        Returns a new DetectionSet with the rows selected by a boolean mask (or an index array)
+        """
+        rows = np.arange(len(self))[mask]
+        detection_set = DetectionSet.__new__(DetectionSet)
+        detection_set._set_arrays(self._take(rows))
+        detection_set.views = [None] * len(rows)
+        return detection_set
+
+    def lookup(self, track_id):
+        """
+        Returns the row of the first detection with a track_id, or -1
+        """
+        rows = np.flatnonzero(self.track_ids == track_id)
+        return int(rows[0]) if len(rows) else -1
+
+    def remove_track(self, track_id):
+        self._assign(np.flatnonzero(self.track_ids != track_id))
+
+    def set_class(self, track_id, class_id):
+        self.class_ids[self.track_ids == track_id] = class_id
+
+    def set_track_id(self, track_id, new_track_id):
+        self.track_ids[self.track_ids == track_id] = new_track_id
+
+    def contains_point(self, p):
+        """
+        Boolean mask of the boxes containing a point
+        """
+        x, y, w, h = self.boxes.T
+        return (x <= p[0]) & (p[0] <= x + w) & (y <= p[1]) & (p[1] <= y + h)
+
+    def iou(self, boxes):
+        """
+        IoU matrix between the boxes of the set and other boxes (a DetectionSet or an M x 4 array of x, y, w, h)
+        """
+        if isinstance(boxes, DetectionSet):
+            boxes = boxes.boxes
+        a = self.boxes[:, None, :]
+        b = np.asarray(boxes, dtype=float).reshape(-1, 4)[None, :, :]
+
+        w = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+        h = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+        intersection = np.clip(w, 0, None) * np.clip(h, 0, None)
+        union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - intersection
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(union > 0, intersection / union, 0.)
+
+    def __repr__(self):
+        return "DetectionSet({})".format(list(self))
@@ -0,0 +1,309 @@
+import json
+import multiprocessing
+import os
+from xml.sax.saxutils import escape, quoteattr
+import numpy as np
+from .stores import create_store
+from .video_manifest import load_manifest
+from .polygon import split_ragged
+from .detection_set import ragged_to_str
+from .txt_format import format_float, quote
+from ultimatelabeling.class_names import DEFAULT_CLASS_NAMES
+from ultimatelabeling.config import OUTPUT_DIR, DATA_DIR
+
+
+"""
+Streaming exporters of the annotations of a video to other formats (legacy CSV, MOTChallenge, COCO, CVAT).
+
+Frames are read one at a time from the annotation store and written as soon as they are formatted, so the memory
+used by an export doesn't depend on the length of the video. The output is written to a temporary file which
+replaces the target path once complete.
+"""
+
+# Number of frames between two progress callbacks
+PROGRESS_STEP = 500
+
+
+def iter_frames(store, file_names):
+    """
+    Generator of (frame, file_name, detections) over the given frames, frame being the index in file_names
+    """
+    for frame, file_name in enumerate(file_names):
+        yield frame, file_name, store.get_frame(file_name)
+
+
+def read_class_names(dir_name):
+    """
+    Class names saved in the info.json of a video directory (the default ones if there is none)
+    """
+    json_file = os.path.join(dir_name, "info.json")
+    if not os.path.exists(json_file):
+        return DEFAULT_CLASS_NAMES
+
+    with open(json_file, "r") as f:
+        return {int(k): v for k, v in json.loads(json.load(f)["class_names"]).items()}
+
+
+class Exporter:
+    """
+    Writes an export file in three parts: header, one call per frame, footer
+    """
+
+    NAME = ""
+    EXTENSION = ""
+
+    def __init__(self, f, video_name="", class_names=None, img_size=None):
+        self.f = f
+        self.video_name = video_name
+        self.class_names = DEFAULT_CLASS_NAMES if class_names is None else class_names
+        self.img_size = img_size  # (h, w) of the frames, None if unknown
+
+    def get_label(self, class_id):
+        return self.class_names.get(class_id, str(class_id))
+
+    def write_header(self, image_names):
+        pass
+
+    def write_frame(self, frame, file_name, detections):
+        raise NotImplementedError
+
+    def write_footer(self):
+        pass
+
+
+class CsvExporter(Exporter):
+    """
+    Whole-video CSV of the Export action: frame class_id track_id xc yc w h infer "polygon" "keypoints"
+    """
+
+    NAME = "CSV"
+    EXTENSION = ".csv"
+
+    def write_frame(self, frame, file_name, detections):
+        boxes = detections.boxes
+        # Same truncation as the DataFrame export (astype(int) of the centers and sizes)
+        values = np.stack([boxes[:, 0] + boxes[:, 2] / 2, boxes[:, 1] + boxes[:, 3] / 2,
+                           boxes[:, 2], boxes[:, 3]], axis=1).astype(int).tolist()
+        polygons = ragged_to_str(detections.polygon_offsets, detections.polygon_data)
+        keypoints = ragged_to_str(detections.kp_offsets, detections.kp_data)
+
+        self.f.writelines("{} {} {} {} {} {} {} 0 {} {}\n".format(frame, class_id, track_id, *box, quote(polygon),
+                                                                  quote(kp))
+                          for class_id, track_id, box, polygon, kp in zip(detections.class_ids.tolist(),
+                                                                          detections.track_ids.tolist(), values,
+                                                                          polygons, keypoints))
+
+
+class MotExporter(Exporter):
+    """
+    MOTChallenge txt: frame,id,bb_left,bb_top,bb_width,bb_height,conf,x,y,z (frames numbered from 1)
+    """
+
+    NAME = "MOTChallenge"
+    EXTENSION = ".txt"
+
+    def write_frame(self, frame, file_name, detections):
+        self.f.writelines("{},{},{},{},{},{},1,-1,-1,-1\n".format(frame + 1, track_id, *map(format_float, box))
+                          for track_id, box in zip(detections.track_ids.tolist(), detections.boxes.tolist()))
+
+
+class CocoExporter(Exporter):
+    """
+    COCO JSON. Images and annotations are serialized in chunks of CHUNK_SIZE objects, the track id of each
+    annotation is kept in its "attributes".
+    """
+
+    NAME = "COCO"
+    EXTENSION = ".json"
+    CHUNK_SIZE = 1000
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chunk = []
+        self.nb_annotations = 0
+
+    def write_objects(self, objects, first):
+        if objects:
+            self.f.write(("" if first else ",\n") + ",\n".join(json.dumps(obj) for obj in objects))
+
+    def write_header(self, image_names):
+        h, w = self.img_size if self.img_size is not None else (0, 0)
+
+        self.f.write('{"info": ' + json.dumps({"description": self.video_name}) + ',\n"images": [\n')
+        for start in range(0, len(image_names), self.CHUNK_SIZE):
+            self.write_objects([{"id": frame + 1, "file_name": image_name, "width": w, "height": h}
+                                for frame, image_name in enumerate(image_names[start:start + self.CHUNK_SIZE],
+                                                                   start)], first=start == 0)
+        self.f.write('\n],\n"annotations": [\n')
+
+    def flush(self):
+        self.write_objects(self.chunk, first=self.nb_annotations == len(self.chunk))
+        self.chunk = []
+
+    def write_frame(self, frame, file_name, detections):
+        polygons = split_ragged(detections.polygon_offsets, detections.polygon_data)
+        keypoints = split_ragged(detections.kp_offsets, detections.kp_data)
+
+        for track_id, class_id, (x, y, w, h), polygon, kp in zip(detections.track_ids.tolist(),
+                                                                 detections.class_ids.tolist(),
+                                                                 detections.boxes.tolist(), polygons, keypoints):
+            self.nb_annotations += 1
+            self.chunk.append({
+                "id": self.nb_annotations,
+                "image_id": frame + 1,
+                "category_id": class_id,
+                "bbox": [x, y, w, h],
+                "area": w * h,
+                "iscrowd": 0,
+                "segmentation": [polygon.tolist()] if len(polygon) else [],
+                "keypoints": kp.tolist(),
+                "num_keypoints": int(np.count_nonzero(kp[2::3])),
+                "attributes": {"track_id": track_id}
+            })
+
+        if len(self.chunk) >= self.CHUNK_SIZE:
+            self.flush()
+
+    def write_footer(self):
+        self.flush()
+        categories = [{"id": class_id, "name": name} for class_id, name in sorted(self.class_names.items())]
+        self.f.write('\n],\n"categories": ' + json.dumps(categories) + '}\n')
+
+
+class CvatExporter(Exporter):
+    """
+    CVAT for images 1.1 XML: one <image> element per frame, the track id of each shape is kept as an attribute.
+    (The "CVAT for video" format groups shapes by track, which can't be written frame by frame.)
+    """
+
+    NAME = "CVAT"
+    EXTENSION = ".xml"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.image_names = []
+
+    @staticmethod
+    def format_points(coords):
+        return ";".join("{},{}".format(format_float(x), format_float(y)) for x, y in coords.reshape(-1, 2).tolist())
+
+    def write_header(self, image_names):
+        self.image_names = image_names
+        labels = "".join("<label><name>{}</name></label>".format(escape(name))
+                         for _, name in sorted(self.class_names.items()))
+
+        self.f.write('<?xml version="1.0" encoding="utf-8"?>\n<annotations>\n<version>1.1</version>\n')
+        self.f.write("<meta><task><name>{}</name><size>{}</size><mode>annotation</mode><labels>{}</labels></task>"
+                     "</meta>\n".format(escape(self.video_name), len(image_names), labels))
+
+    def write_frame(self, frame, file_name, detections):
+        h, w = self.img_size if self.img_size is not None else (0, 0)
+        lines = ['<image id="{}" name={} width="{}" height="{}">'.format(frame, quoteattr(self.image_names[frame]),
+                                                                          w, h)]
+
+        polygons = split_ragged(detections.polygon_offsets, detections.polygon_data)
+        keypoints = split_ragged(detections.kp_offsets, detections.kp_data)
+        for track_id, class_id, (x, y, bw, bh), polygon, kp in zip(detections.track_ids.tolist(),
+                                                                   detections.class_ids.tolist(),
+                                                                   detections.boxes.tolist(), polygons, keypoints):
+            label = quoteattr(self.get_label(class_id))
+            attribute = '<attribute name="track_id">{}</attribute>'.format(track_id)
+
+            lines.append('<box label={} occluded="0" xtl="{}" ytl="{}" xbr="{}" ybr="{}" z_order="0">{}</box>'.format(
+                label, format_float(x), format_float(y), format_float(x + bw), format_float(y + bh), attribute))
+            if len(polygon):
+                lines.append('<polygon label={} occluded="0" points="{}" z_order="0">{}</polygon>'.format(
+                    label, self.format_points(polygon), attribute))
+            kp = kp.reshape(-1, 3)
+            if np.any(kp[:, 2] > 0):
+                lines.append('<points label={} occluded="0" points="{}" z_order="0">{}</points>'.format(
+                    label, self.format_points(kp[kp[:, 2] > 0, :2]), attribute))
+
+        lines.append("</image>\n")
+        self.f.write("\n".join(lines))
+
+    def write_footer(self):
+        self.f.write("</annotations>\n")
+
+
+EXPORTERS = {
+    "csv": CsvExporter,
+    "mot": MotExporter,
+    "coco": CocoExporter,
+    "cvat": CvatExporter
+}
+
+
+def export(store, file_names, path, fmt, image_names=None, video_name="", class_names=None, img_size=None,
+           on_progress=None):
+    """
+    Exports the given frames of a store to path in the format fmt (a key of EXPORTERS).
+    image_names are the names of the image files of the frames (<file_name>.jpg by default).
+    on_progress(nb_done, nb_frames) is called every PROGRESS_STEP frames and at the end.
+    """
+    if image_names is None:
+        image_names = [file_name + ".jpg" for file_name in file_names]
+
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(tmp_path, "w") as f:
+            exporter = EXPORTERS[fmt](f, video_name, class_names, img_size)
+            exporter.write_header(image_names)
+            for frame, file_name, detections in iter_frames(store, file_names):
+                exporter.write_frame(frame, file_name, detections)
+                if on_progress is not None and (frame + 1) % PROGRESS_STEP == 0:
+                    on_progress(frame + 1, len(file_names))
+            exporter.write_footer()
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if on_progress is not None:
+        on_progress(len(file_names), len(file_names))
+
+
+def export_video(video_name, fmt, path, output_dir=OUTPUT_DIR, data_dir=DATA_DIR, on_progress=None):
+    """
+    Exports the annotations of a video from its store on disk. The frames are the images of the video, or the
+    annotated frames if the images are missing. Returns the number of exported frames.
+    """
+    dir_name = os.path.join(output_dir, video_name)
+    store = create_store(dir_name)
+
+    manifest = load_manifest(os.path.join(data_dir, video_name))
+    if len(manifest) > 0:
+        file_names, image_names, img_size = manifest.stems, manifest.names, manifest.get_image_size()
+    else:
+        file_names, image_names, img_size = store.get_file_names(), None, None
+
+    export(store, file_names, path, fmt, image_names, video_name, read_class_names(dir_name), img_size, on_progress)
+    return len(file_names)
+
+
+def _export_video(args):
+    video_name, fmt, export_dir, output_dir, data_dir = args
+    path = os.path.join(export_dir, video_name + EXPORTERS[fmt].EXTENSION)
+    return video_name, export_video(video_name, fmt, path, output_dir, data_dir)
+
+
+def export_videos(video_names, fmt, export_dir, processes=None, output_dir=OUTPUT_DIR, data_dir=DATA_DIR,
+                  on_progress=None):
+    """
+    Exports several videos in parallel processes, to export_dir/<video><extension>.
+    on_progress(nb_done, nb_videos, video_name) is called after each video. Returns the number of frames of each video.
+    """
+    if not os.path.exists(export_dir):
+        os.makedirs(export_dir)
+
+    tasks = [(video_name, fmt, export_dir, output_dir, data_dir) for video_name in video_names]
+    nb_frames = {}
+
+    # Spawn rather than fork: the application process runs background threads holding locks
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        for i, (video_name, n) in enumerate(pool.imap_unordered(_export_video, tasks)):
+            nb_frames[video_name] = n
+            if on_progress is not None:
+                on_progress(i + 1, len(tasks), video_name)
+
+    return nb_frames
@@ -0,0 +1,252 @@
+import math
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from ultimatelabeling.config import DATA_DIR, EXTRACTION_WORKERS
+
+VIDEO_EXTENSIONS = (".mp4", ".mov")
+FFMPEG = ["ffmpeg"]
+
+# One frame out of FRAME_STEP frames of the video is extracted
+FRAME_STEP = 5
+
+# Marker next to the frame directory of a video whose extraction is not complete
+PENDING_SUFFIX = ".extracting"
+
+# Minimum time in seconds between two progress callbacks of a job
+PROGRESS_INTERVAL = 2.0
+
+
+def find_raw_videos(data_dir):
+    """
+    Paths of the video files (mp4, mov) of the data directory, by video name
+    """
+    if not os.path.isdir(data_dir):
+        return OrderedDict()
+
+    with os.scandir(data_dir) as entries:
+        paths = sorted(entry.path for entry in entries
+                       if entry.name.lower().endswith(VIDEO_EXTENSIONS) and entry.is_file())
+    return OrderedDict((os.path.splitext(os.path.basename(path))[0], path) for path in paths)
+
+
+def get_nb_frames(video_path):
+    """
+    Number of frames that will be extracted from a video, read from its container (0 if unknown)
+    """
+    video = cv2.VideoCapture(video_path)
+    try:
+        nb_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        video.release()
+    return int(math.ceil(max(nb_frames, 0) / FRAME_STEP))
+
+
+def get_resume_frame(dir_name):
+    """
+    Index of the first frame to extract in a partially extracted directory. The last extracted frame is removed and
+    extracted again, it may have been interrupted while being written.
+    """
+    frames = {}
+    with os.scandir(dir_name) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            if ext == ".jpg" and stem.isdigit():
+                frames[int(stem)] = entry.path
+
+    if not frames:
+        return 0
+
+    last = max(frames)
+    os.remove(frames[last])
+    return last
+
+
+class ExtractionJob:
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STOPPED = "stopped"
+
+    def __init__(self, video_path, dir_name):
+        self.video_name = os.path.basename(dir_name)
+        self.video_path = video_path
+        self.dir_name = dir_name
+        self.marker_path = os.path.normpath(dir_name) + PENDING_SUFFIX
+
+        self.status = self.PENDING
+        self.first_frame = 0
+        self.nb_done = 0
+        self.nb_total = 0
+        self.error = None
+        self.process = None
+
+    def is_active(self):
+        return self.status in (self.PENDING, self.RUNNING)
+
+    def get_command(self):
+        select = "select=not(mod(n\\,{}))*gte(n\\,{})".format(FRAME_STEP, self.first_frame * FRAME_STEP)
+        return FFMPEG + ["-nostdin", "-loglevel", "error", "-i", self.video_path, "-vf", select, "-vsync", "vfr",
+                         "-qscale:v", "2", "-start_number", str(self.first_frame), "-progress", "pipe:1", "-nostats",
+                         os.path.join(self.dir_name, "%05d.jpg")]
+
+
+class ExtractionManager:
+    """
+    Background extraction of the frames of the raw videos (data/<video>.mp4 or .mov) into data/<video>/.
+
+    start() returns immediately: the frame directories are created right away, so the videos appear in the video list,
+    and the extractions run with ffmpeg in a pool of at most `workers` jobs. A video can be browsed as soon as its
+    first frames are written. A marker file (data/<video>.extracting) is kept until the extraction completes, so an
+    extraction interrupted by closing the application or a crash resumes from its last frame on the next start.
+
+    on_progress(video_name, nb_done, nb_total) is called from the worker threads.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, workers=EXTRACTION_WORKERS, on_progress=None):
+        self.data_dir = data_dir
+        self.workers = workers
+        self.on_progress = on_progress
+
+        self.condition = threading.Condition()
+        self.jobs = OrderedDict()  # video_name -> ExtractionJob
+        self.executor = None
+        self.stopping = False
+
+    def find_jobs(self):
+        """
+        Raw videos without frame directory, or whose extraction was interrupted
+        """
+        jobs = []
+        for video_name, video_path in find_raw_videos(self.data_dir).items():
+            job = ExtractionJob(video_path, os.path.join(self.data_dir, video_name))
+            if not os.path.isdir(job.dir_name) or os.path.exists(job.marker_path):
+                jobs.append(job)
+        return jobs
+
+    def start(self):
+        """
+        Starts the extraction of the new and interrupted videos, returns their names
+        """
+        jobs = [job for job in self.find_jobs() if job.video_name not in self.jobs]
+        if not jobs:
+            return []
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        for job in jobs:
+            with open(job.marker_path, "w"):
+                pass
+            os.makedirs(job.dir_name, exist_ok=True)
+            job.first_frame = job.nb_done = get_resume_frame(job.dir_name)
+
+            with self.condition:
+                self.jobs[job.video_name] = job
+            self.executor.submit(self.run, job)
+
+        return [job.video_name for job in jobs]
+
+    def run(self, job):
+        try:
+            self.extract(job)
+        except Exception as e:
+            self.set_status(job, ExtractionJob.FAILED, str(e))
+
+    def extract(self, job):
+        job.nb_total = get_nb_frames(job.video_path)
+
+        with self.condition:
+            # Checked with the lock held: stop() terminates the processes started before it
+            if self.stopping:
+                self.set_status(job, ExtractionJob.STOPPED)
+                return
+
+            print("Extracting video {}...".format(os.path.basename(job.video_path)))
+            job.process = subprocess.Popen(job.get_command(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                           universal_newlines=True)
+            job.status = ExtractionJob.RUNNING
+
+        messages = []
+        last_progress = 0
+        for line in job.process.stdout:
+            key, sep, value = line.strip().partition("=")
+            if not sep:
+                messages.append(line.strip())
+            elif key == "frame" and value.isdigit():
+                with self.condition:
+                    job.nb_done = job.first_frame + int(value)
+                    self.condition.notify_all()
+
+                if time.time() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.time()
+                    self.notify(job)
+
+        returncode = job.process.wait()
+        if self.stopping:
+            self.set_status(job, ExtractionJob.STOPPED)
+        elif returncode != 0:
+            error = "\n".join(messages[-5:]) or "ffmpeg exited with code {}".format(returncode)
+            self.set_status(job, ExtractionJob.FAILED, error)
+        else:
+            os.remove(job.marker_path)
+            job.nb_total = job.nb_done
+            self.set_status(job, ExtractionJob.DONE)
+
+    def set_status(self, job, status, error=None):
+        with self.condition:
+            job.status = status
+            job.error = error
+            job.process = None
+            self.condition.notify_all()
+
+        if error is not None:
+            print("Extraction of {} failed: {}".format(job.video_name, error))
+        self.notify(job)
+
+    def notify(self, job):
+        if self.on_progress is not None:
+            self.on_progress(job.video_name, job.nb_done, job.nb_total)
+
+    def get_job(self, video_name):
+        with self.condition:
+            return self.jobs.get(video_name)
+
+    def is_extracting(self, video_name):
+        job = self.get_job(video_name)
+        return job is not None and job.is_active()
+
+    def wait_for_frames(self, video_name, timeout=None):
+        """
+        Waits until the first frames of a video being extracted are written (or its extraction ended)
+        """
+        with self.condition:
+            job = self.jobs.get(video_name)
+            if job is not None:
+                self.condition.wait_for(lambda: job.nb_done > 0 or not job.is_active(), timeout)
+
+    def wait(self):
+        """
+        Waits until every extraction is complete
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: not any(job.is_active() for job in self.jobs.values()))
+
+    def stop(self):
+        """
+        Interrupts the running extractions, they are resumed by the next start()
+        """
+        with self.condition:
+            self.stopping = True
+            for job in self.jobs.values():
+                if job.process is not None:
+                    job.process.terminate()
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
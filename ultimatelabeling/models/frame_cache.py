@@ -0,0 +1,123 @@
+from collections import OrderedDict
+
+
+class CacheEntry:
+    def __init__(self, detections, dirty=False):
+        self.detections = detections
+        self.dirty = dirty
+
+
+class FrameCache:
+    """
+    LRU cache of decoded per-frame detection lists with write-back semantics.
+
+    Entries are loaded with `loader(file_name)` on a miss. Modified entries are flagged as dirty and only handed to
+    `writer(file_name, detections)` when they are evicted or when flush() is called.
+    """
+
+    def __init__(self, loader, writer, max_size=512):
+        self.loader = loader
+        self.writer = writer
+        self.max_size = max(max_size, 1)
+
+        self.entries = OrderedDict()
+        self.pinned = None  # file_name that must never be evicted (the frame currently displayed)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+
+    def __contains__(self, file_name):
+        return file_name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, file_name):
+        """
+        Returns the cached detection list of a frame, loading it on a miss. The list is shared with the cache:
+        in-place modifications must be followed by mark_dirty().
+        """
+        entry = self.entries.get(file_name)
+
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(file_name)
+            return entry.detections
+
+        self.misses += 1
+        entry = CacheEntry(self.loader(file_name))
+        self._insert(file_name, entry)
+        return entry.detections
+
+    def put(self, file_name, detections, dirty=True):
+        entry = self.entries.get(file_name)
+
+        if entry is not None:
+            entry.detections = detections
+            entry.dirty = entry.dirty or dirty
+            self.entries.move_to_end(file_name)
+        else:
+            self._insert(file_name, CacheEntry(detections, dirty))
+
+    def mark_dirty(self, file_name):
+        entry = self.entries.get(file_name)
+        if entry is not None:
+            entry.dirty = True
+
+    def is_dirty(self, file_name):
+        entry = self.entries.get(file_name)
+        return entry is not None and entry.dirty
+
+    def discard(self, file_name):
+        """
+        Drops an entry without writing it back (used when the underlying frame was overwritten)
+        """
+        self.entries.pop(file_name, None)
+
+    def _insert(self, file_name, entry):
+        self.entries[file_name] = entry
+        self._evict()
+
+    def _evict(self):
+        candidates = iter(list(self.entries))
+        while len(self.entries) > self.max_size:
+            file_name = next(candidates, None)
+            if file_name is None:
+                break
+            if file_name == self.pinned:
+                continue
+
+            entry = self.entries.pop(file_name)
+            self.evictions += 1
+            if entry.dirty:
+                self._write_back(file_name, entry)
+
+    def _write_back(self, file_name, entry):
+        self.writer(file_name, entry.detections)
+        entry.dirty = False
+        self.flushes += 1
+
+    def flush(self):
+        """
+        Writes back every dirty entry, entries stay cached
+        """
+        for file_name, entry in self.entries.items():
+            if entry.dirty:
+                self._write_back(file_name, entry)
+
+    def clear(self):
+        self.flush()
+        self.entries.clear()
+
+    def get_stats(self):
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "dirty": sum(entry.dirty for entry in self.entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "flushes": self.flushes
+        }
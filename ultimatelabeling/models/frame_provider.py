@@ -0,0 +1,235 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+import cv2
+from .buffer_stats import buffer_stats
+from ultimatelabeling.config import FRAME_PROVIDER_MEMORY, FRAME_PROVIDER_WORKERS, PREFETCH_SIZE
+
+
+# Decode modes of the reduced resolutions (JPEG images are decoded at that size directly by DCT scaling)
+REDUCED_MODES = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8
+}
+
+
+def get_reduction(scale):
+    """
+    Largest reduction factor of the decode of an image displayed at the given scale (screen pixels per image pixel)
+    which keeps at least one decoded pixel per screen pixel
+    """
+    for reduction in sorted(REDUCED_MODES, reverse=True):
+        if scale * reduction <= 1:
+            return reduction
+    return 1
+
+
+def read_image(image_path, reduction=1):
+    """
+    Decodes an image file to a read-only BGR array (kept in the layout of the decoder, the viewer displays it as is),
+    None if it can't be read. With a reduction factor (2, 4 or 8), the image is decoded at 1/reduction of its size
+    (rounded up).
+    """
+    img = cv2.imread(image_path, REDUCED_MODES.get(reduction, cv2.IMREAD_COLOR))
+    if img is None:
+        return None
+
+    buffer_stats.allocation(img.nbytes)
+    img.flags.writeable = False
+    return img
+
+
+class FrameProvider:
+    """
+    Decoded frames (BGR) of the current video, shared by the player, the slider and the image viewer.
+
+    Frames are kept in an LRU cache bounded by max_memory bytes. prefetch() decodes the next frames in the playback
+    direction (frame + k * speed) in a pool of worker threads, so that get() finds them already decoded. Requests
+    which are not started and are no longer ahead of the current frame (the user jumped elsewhere) are cancelled.
+    The cached arrays are read-only: callers copy them before drawing.
+
+    Frames are decoded at the resolution set by set_reduction() (see get_reduction), a cached frame of higher
+    resolution is returned if there is one: callers map coordinates from the shape of the returned image.
+    """
+
+    def __init__(self, max_memory=FRAME_PROVIDER_MEMORY, workers=FRAME_PROVIDER_WORKERS, lookahead=PREFETCH_SIZE,
+                 decode=read_image):
+        self.max_memory = max_memory
+        self.lookahead = lookahead
+        self.decode = decode
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+        self.lock = threading.Lock()
+        self.file_names = []  # image paths of the frames of the current video
+        self.paths = set()  # same as a set, late decodes of the frames which are not in it anymore are dropped
+        self.reduction = 1
+        self.cache = OrderedDict()  # (image path, reduction) -> decoded image, least recently used first
+        self.memory_size = 0
+        self.frame_size = 0  # bytes of the last decoded frame
+        self.pending = {}  # (image path, reduction) -> future of the decode
+
+        # Statistics of get()
+        self.nb_hits = 0  # frame in cache
+        self.nb_waits = 0  # frame being decoded by a worker
+        self.nb_misses = 0  # frame decoded by the caller
+        self.nb_cancelled = 0
+        self.total_latency = 0.
+        self.max_latency = 0.
+
+    def set_file_names(self, file_names):
+        """
+        Sets the image paths of the frames of the current video. The cache is kept if the frames didn't change.
+        """
+        with self.lock:
+            if file_names == self.file_names:
+                return
+
+            self.file_names = list(file_names)
+            self.paths = set(self.file_names)
+            for key in [key for key in self.cache if key[0] not in self.paths]:
+                self.memory_size -= self.cache.pop(key).nbytes
+            for key in [key for key in self.pending if key[0] not in self.paths]:
+                self.pending.pop(key).cancel()
+
+    def set_reduction(self, reduction):
+        """
+        Sets the reduction factor of the next decodes, the scheduled decodes at another resolution are cancelled
+        """
+        with self.lock:
+            if reduction == self.reduction:
+                return
+
+            self.reduction = reduction
+            for key in [key for key in self.pending if key[1] != reduction]:
+                if self.pending[key].cancel():
+                    del self.pending[key]
+                    self.nb_cancelled += 1
+
+    def _decode(self, key):
+        img = self.decode(*key)
+        with self.lock:
+            self.pending.pop(key, None)
+            if img is not None and key[0] in self.paths:
+                self._put(key, img)
+        return img
+
+    def _find(self, path, reduction):
+        """
+        Key of the cached image of a path with the highest reduction not above the given one, None if not cached
+        """
+        for r in sorted(list(REDUCED_MODES) + [1], reverse=True):
+            if r <= reduction and (path, r) in self.cache:
+                return path, r
+        return None
+
+    def _put(self, key, img):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return
+
+        self.cache[key] = img
+        self.memory_size += img.nbytes
+        self.frame_size = img.nbytes
+        while self.memory_size > self.max_memory and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.memory_size -= evicted.nbytes
+
+    def get(self, frame):
+        """
+        Decoded image of a frame (read-only), None if it can't be read
+        """
+        start = time.perf_counter()
+
+        with self.lock:
+            key = (self.file_names[frame], self.reduction)
+            cached = self._find(*key)
+            hit = cached is not None
+            img = None
+            if hit:
+                img = self.cache[cached]
+                self.cache.move_to_end(cached)
+                self.nb_hits += 1
+            future = None if hit else self.pending.get(key)
+
+        waited = False
+        if future is not None:
+            try:
+                img = future.result()
+                waited = True
+            except CancelledError:
+                pass
+        if img is None and not waited:
+            img = self._decode(key)
+
+        latency = time.perf_counter() - start
+        with self.lock:
+            if waited:
+                self.nb_waits += 1
+            elif not hit:
+                self.nb_misses += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        return img
+
+    def get_prefetch_frames(self, frame, speed):
+        """
+        Frames to decode ahead of the current frame, as many as fit in the cache
+        """
+        speed = speed or 1
+        lookahead = self.lookahead
+        if self.frame_size > 0:
+            lookahead = min(lookahead, max(1, self.max_memory // self.frame_size - 1))
+
+        frames = [frame + k * speed for k in range(1, lookahead + 1)]
+        return [f for f in frames if 0 <= f < len(self.file_names)]
+
+    def prefetch(self, frame, speed=1):
+        """
+        Schedules the decode of the frames following frame in the playback direction (speed frames per step), and
+        cancels the scheduled decodes which are not ahead anymore
+        """
+        with self.lock:
+            paths = [self.file_names[f] for f in self.get_prefetch_frames(frame, speed)]
+            wanted = set(paths)
+            if 0 <= frame < len(self.file_names):
+                wanted.add(self.file_names[frame])
+
+            for key, future in list(self.pending.items()):
+                if key[0] not in wanted and future.cancel():
+                    del self.pending[key]
+                    self.nb_cancelled += 1
+
+            # Farthest first: the frames displayed next are the most recently used, the last to be evicted
+            cached = [self._find(path, self.reduction) for path in paths]
+            for key in reversed(cached):
+                if key is not None:
+                    self.cache.move_to_end(key)
+
+            for path, cached_key in zip(paths, cached):
+                key = (path, self.reduction)
+                if cached_key is None and key not in self.pending:
+                    self.pending[key] = self.executor.submit(self._decode, key)
+
+    def get_statistics(self):
+        nb_requests = self.nb_hits + self.nb_waits + self.nb_misses
+        return {
+            "nb_requests": nb_requests,
+            "hit_rate": self.nb_hits / nb_requests if nb_requests else 0.,
+            "nb_hits": self.nb_hits,
+            "nb_waits": self.nb_waits,
+            "nb_misses": self.nb_misses,
+            "nb_cancelled": self.nb_cancelled,
+            "mean_latency": self.total_latency / nb_requests if nb_requests else 0.,
+            "max_latency": self.max_latency,
+            "nb_cached": len(self.cache),
+            "memory_size": self.memory_size
+        }
+
+    def close(self):
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending = {}
+        self.executor.shutdown(wait=True)
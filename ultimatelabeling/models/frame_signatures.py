@@ -0,0 +1,104 @@
+import hashlib
+import os
+import numpy as np
+
+
+class FrameSignatures:
+    """
+    Signature of the set of track ids of each frame of a video, and run-length segments of consecutive frames with
+    identical signatures.
+
+    Jumping to the next / previous change of the track ids is a binary search in the segment starts. Signatures are
+    computed lazily: edited frames are invalidated and recomputed (and the segments rebuilt) on the next query.
+    """
+
+    def __init__(self, get_track_ids):
+        self.get_track_ids = get_track_ids  # file_name -> array of track ids
+
+        self.file_paths = []
+        self.file_names = []
+        self.positions = {}  # file_name -> frame
+        self.signatures = np.zeros(0, dtype=np.uint64)
+        self.starts = np.zeros(0, dtype=np.int64)  # first frame of each segment
+        self.stale = set()  # frames whose signature has to be recomputed
+
+    def __len__(self):
+        return len(self.signatures)
+
+    @staticmethod
+    def get_signature(track_ids):
+        track_ids = np.sort(np.asarray(track_ids, dtype=np.int64))
+        return int.from_bytes(hashlib.blake2b(track_ids.tobytes(), digest_size=8).digest(), "little")
+
+    def set_file_paths(self, file_paths):
+        """
+        Sets the image paths of the frames, in order. Signatures are recomputed only if the frames changed.
+        """
+        if file_paths == self.file_paths:
+            return
+
+        self.file_paths = list(file_paths)
+        self.file_names = [os.path.splitext(os.path.basename(path))[0] for path in self.file_paths]
+        self.positions = {file_name: frame for frame, file_name in enumerate(self.file_names)}
+        self.signatures = np.zeros(len(self.file_names), dtype=np.uint64)
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.stale = set(range(len(self.file_names)))
+
+    def invalidate(self, file_names=None):
+        """
+        Marks frames as modified (all frames if file_names is None)
+        """
+        if file_names is None:
+            self.stale = set(range(len(self.signatures)))
+            return
+
+        if isinstance(file_names, str):
+            file_names = [file_names]
+
+        for file_name in file_names:
+            frame = self.positions.get(file_name)
+            if frame is not None:
+                self.stale.add(frame)
+
+    def update(self):
+        if not self.stale:
+            return
+
+        changed = False
+        for frame in self.stale:
+            signature = self.get_signature(self.get_track_ids(self.file_names[frame]))
+            changed = changed or signature != self.signatures[frame]
+            self.signatures[frame] = signature
+        self.stale = set()
+
+        if changed or len(self.starts) == 0:
+            boundaries = np.flatnonzero(self.signatures[1:] != self.signatures[:-1]) + 1
+            self.starts = np.concatenate([[0], boundaries]).astype(np.int64)
+
+    def frames_equal(self, frame1, frame2):
+        self.update()
+        return self.signatures[frame1] == self.signatures[frame2]
+
+    def get_segment(self, frame):
+        """
+        Returns the first and last frames of the segment containing a frame
+        """
+        self.update()
+        i = np.searchsorted(self.starts, frame, side="right") - 1
+        end = self.starts[i + 1] - 1 if i + 1 < len(self.starts) else len(self.signatures) - 1
+        return int(self.starts[i]), int(end)
+
+    def get_next_change(self, frame):
+        """
+        First frame after `frame` with different track ids, None if there is none
+        """
+        self.update()
+        i = np.searchsorted(self.starts, frame, side="right")
+        return int(self.starts[i]) if i < len(self.starts) else None
+
+    def get_previous_change(self, frame):
+        """
+        Last frame before `frame` with different track ids, None if there is none
+        """
+        start, _ = self.get_segment(frame)
+        return start - 1 if start > 0 else None
@@ -0,0 +1,264 @@
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+from .detection_set import DetectionSet
+from .journal import JournalOp
+
+
+def get_edited_track_ids(detections, op, *args):
+    """
+    Track ids of the detections of a frame modified by an edit operation (see apply_edit), None for the whole frame
+    """
+    if op in (JournalOp.ADD, JournalOp.UPDATE):
+        detection, = args
+        return [detection.track_id]
+    elif op in (JournalOp.DELETE, JournalOp.SET_CLASS):
+        return [args[0]]
+    elif op == JournalOp.DELETE_INDEX:
+        index, = args
+        return [int(detections.track_ids[index])]
+    elif op == JournalOp.SET_TRACK_ID:
+        track_id, new_track_id = args
+        return [track_id, new_track_id]
+    return None
+
+
+class FrameDelta:
+    """
+    Change of the detections of some track ids in one frame: their rows (and positions in the frame) before and after
+    """
+
+    __slots__ = ("file_name", "track_ids", "before_rows", "before", "after_rows", "after")
+
+    def __init__(self, file_name, track_ids, before, after):
+        self.file_name = file_name
+        self.track_ids = None if track_ids is None else np.unique(np.asarray(track_ids, dtype=np.int32))
+        self.before_rows, self.before = self.select(before)
+        self.after_rows, self.after = self.select(after)
+
+    def select(self, detections):
+        if not isinstance(detections, DetectionSet):
+            detections = DetectionSet(detections)
+
+        if self.track_ids is None:
+            return np.arange(len(detections)), detections.copy()
+
+        rows = np.flatnonzero(np.isin(detections.track_ids, self.track_ids))
+        return rows, detections.filter(rows)
+
+    def is_empty(self):
+        return np.array_equal(self.before_rows, self.after_rows) and \
+            all(np.array_equal(a, b) for a, b in zip(self.before._get_arrays().values(),
+                                                      self.after._get_arrays().values()))
+
+    def get_size(self):
+        """
+        Approximate memory used by the delta, in bytes
+        """
+        arrays = [self.before_rows, self.after_rows] + list(self.before._get_arrays().values()) + \
+            list(self.after._get_arrays().values())
+        return 500 + sum(array.nbytes for array in arrays)
+
+    def apply(self, detections, undo):
+        """
+        Returns the detections of the frame with the rows of the delta replaced by their previous (undo) or next state
+        """
+        rows, new = (self.before_rows, self.before) if undo else (self.after_rows, self.after)
+
+        if self.track_ids is None:
+            return new.copy()
+
+        kept = list(detections.filter(~np.isin(detections.track_ids, self.track_ids)))
+        result = [None] * (len(kept) + len(rows))
+        for row, detection in zip(rows.tolist(), new):
+            result[row] = detection
+        kept = iter(kept)
+        return DetectionSet([d if d is not None else next(kept) for d in result])
+
+
+class Change:
+    """
+    Undoable step: the frame deltas of one or several edits
+    """
+
+    def __init__(self):
+        self.deltas = []
+        self.size = 0
+
+    def add(self, delta):
+        self.deltas.append(delta)
+        self.size += delta.get_size()
+
+    def get_file_names(self):
+        return list(dict.fromkeys(delta.file_name for delta in self.deltas))
+
+
+class History:
+    """
+    Undo/redo history of the annotation edits of a video.
+
+    Edits are recorded as frame deltas (rows of the edited tracks before and after, see FrameDelta) rather than copies
+    of the frames. Edits recorded inside step() are undone as one step. The changes kept in memory are bounded by
+    max_memory bytes: the oldest ones are spilled to files in a temporary directory and loaded back when undone.
+    At most max_steps steps are kept.
+    """
+
+    def __init__(self, max_memory, max_steps):
+        self.dir_name = None  # created on the first spill
+        self.max_memory = max_memory
+        self.max_steps = max_steps
+
+        self.undo_stack = []  # Change, or path of a spilled change
+        self.redo_stack = []
+        self.memory_size = 0
+        self.current = None  # change being recorded
+        self.depth = 0  # nesting of step()
+        self.paused = 0  # edits done while undoing are not recorded
+        self.next_id = 0
+
+    def can_undo(self):
+        return len(self.undo_stack) > 0
+
+    def can_redo(self):
+        return len(self.redo_stack) > 0
+
+    def step(self):
+        return _HistoryStep(self)
+
+    def pause(self):
+        return _HistoryPause(self)
+
+    def begin(self):
+        if self.depth == 0:
+            self.current = Change()
+        self.depth += 1
+
+    def end(self):
+        self.depth -= 1
+        if self.depth > 0:
+            return
+
+        change, self.current = self.current, None
+        if not change.deltas:
+            return
+
+        self.push(self.undo_stack, change)
+        self.clear(self.redo_stack)
+
+        while len(self.undo_stack) > self.max_steps:
+            self.discard(self.undo_stack.pop(0))
+        self.spill()
+
+    def record(self, file_name, track_ids, before, after):
+        """
+        Records the change of the detections of a frame (of some track ids, or the whole frame if track_ids is None)
+        """
+        if self.paused:
+            return
+
+        delta = FrameDelta(file_name, track_ids, before, after)
+        if delta.is_empty():
+            return
+
+        with self.step():
+            self.current.add(delta)
+
+    def push(self, stack, change):
+        stack.append(change)
+        self.memory_size += change.size
+
+    def pop(self, stack):
+        entry = stack.pop()
+        if isinstance(entry, str):
+            with open(entry, "rb") as f:
+                change = pickle.load(f)
+            os.remove(entry)
+            return change
+
+        self.memory_size -= entry.size
+        return entry
+
+    def discard(self, entry):
+        if isinstance(entry, str):
+            if os.path.exists(entry):
+                os.remove(entry)
+        else:
+            self.memory_size -= entry.size
+
+    def clear(self, stack=None):
+        if stack is None:
+            self.clear(self.undo_stack)
+            self.clear(self.redo_stack)
+            return
+
+        for entry in stack:
+            self.discard(entry)
+        del stack[:]
+
+    def spill(self):
+        """
+        Writes the oldest changes to disk until the changes in memory fit in max_memory
+        """
+        for stack in [self.undo_stack, self.redo_stack]:
+            for i, entry in enumerate(stack):
+                if self.memory_size <= self.max_memory:
+                    return
+                if isinstance(entry, str):
+                    continue
+
+                if self.dir_name is None:
+                    self.dir_name = tempfile.mkdtemp(prefix="ultimatelabeling-history-")
+                path = os.path.join(self.dir_name, "{:08d}.pkl".format(self.next_id))
+                self.next_id += 1
+
+                with open(path, "wb") as f:
+                    pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+                stack[i] = path
+                self.memory_size -= entry.size
+
+    def pop_undo(self):
+        return self.pop(self.undo_stack) if self.undo_stack else None
+
+    def pop_redo(self):
+        return self.pop(self.redo_stack) if self.redo_stack else None
+
+    def push_undo(self, change):
+        self.push(self.undo_stack, change)
+        self.spill()
+
+    def push_redo(self, change):
+        self.push(self.redo_stack, change)
+        self.spill()
+
+    def get_nb_spilled(self):
+        return sum(isinstance(entry, str) for entry in self.undo_stack + self.redo_stack)
+
+    def close(self):
+        self.clear()
+        if self.dir_name is not None:
+            shutil.rmtree(self.dir_name, ignore_errors=True)
+            self.dir_name = None
+
+
+class _HistoryStep:
+    def __init__(self, history):
+        self.history = history
+
+    def __enter__(self):
+        self.history.begin()
+
+    def __exit__(self, *args):
+        self.history.end()
+
+
+class _HistoryPause:
+    def __init__(self, history):
+        self.history = history
+
+    def __enter__(self):
+        self.history.paused += 1
+
+    def __exit__(self, *args):
+        self.history.paused -= 1
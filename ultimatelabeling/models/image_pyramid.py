@@ -0,0 +1,260 @@
+import json
+import math
+import os
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from .persistence import write_file
+from .buffer_stats import buffer_stats
+from ultimatelabeling.config import PYRAMID_TILE_SIZE, PYRAMID_TILE_MEMORY
+
+MAGIC = b"ULPYR1\n"
+EXTENSION = ".pyr"
+JPEG_QUALITY = 95
+
+
+def get_source_signature(image_path):
+    st = os.stat(image_path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def build_pyramid(image_path, pyramid_path, tile_size=PYRAMID_TILE_SIZE):
+    """
+    Writes the pyramid of an image: levels of half the size of the previous one, down to a single tile, each level
+    cut into tile_size x tile_size JPEG tiles.
+
+    Container: MAGIC, length of the index (8 bytes), index (json: size of the source, of the levels, offset and length
+    of every tile, level by level in row-major order), then the tiles.
+    """
+    signature = get_source_signature(image_path)
+    img = cv2.imread(image_path)
+    if img is None:
+        raise IOError("Can't read image {}".format(image_path))
+
+    levels = [img]
+    while max(levels[-1].shape[:2]) > tile_size:
+        h, w = levels[-1].shape[:2]
+        levels.append(cv2.resize(levels[-1], ((w + 1) // 2, (h + 1) // 2), interpolation=cv2.INTER_AREA))
+
+    blobs, tiles, offset = [], [], 0
+    for level in levels:
+        h, w = level.shape[:2]
+        for y in range(0, h, tile_size):
+            for x in range(0, w, tile_size):
+                _, blob = cv2.imencode(".jpg", level[y:y + tile_size, x:x + tile_size],
+                                       [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+                blobs.append(blob.tobytes())
+                tiles.append([offset, len(blobs[-1])])
+                offset += len(blobs[-1])
+
+    index = json.dumps({
+        "source": signature,
+        "tile_size": tile_size,
+        "levels": [list(level.shape[:2]) for level in levels],
+        "tiles": tiles
+    }).encode()
+
+    os.makedirs(os.path.dirname(pyramid_path) or ".", exist_ok=True)
+    write_file(pyramid_path, b"".join([MAGIC, struct.pack("<Q", len(index)), index] + blobs))
+
+
+class Pyramid:
+    """
+    Read access to the tiles of a pyramid file (see build_pyramid)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("Not a pyramid file: {}".format(path))
+            length, = struct.unpack("<Q", f.read(8))
+            index = json.loads(f.read(length).decode())
+
+        self.data_offset = len(MAGIC) + 8 + length
+        self.source = index["source"]
+        self.tile_size = index["tile_size"]
+        self.levels = [tuple(size) for size in index["levels"]]  # (h, w) of each level
+        self.tiles = index["tiles"]
+
+        # Index of the first tile of each level
+        self.level_starts = [0]
+        for h, w in self.levels:
+            self.level_starts.append(self.level_starts[-1] + self.get_grid(h, w)[0] * self.get_grid(h, w)[1])
+
+    def get_grid(self, h, w):
+        return int(math.ceil(h / self.tile_size)), int(math.ceil(w / self.tile_size))
+
+    def get_level(self, scale):
+        """
+        Level to display the image at the given scale (screen pixels per full resolution pixel): the smallest level
+        keeping at least one pixel per screen pixel
+        """
+        level = int(math.floor(math.log2(1 / scale))) if scale < 1 else 0
+        return min(max(level, 0), len(self.levels) - 1)
+
+    def get_level_scale(self, level):
+        """
+        Size of a level relative to the full resolution
+        """
+        return self.levels[level][1] / self.levels[0][1]
+
+    def read_tile(self, f, level, row, col):
+        rows, cols = self.get_grid(*self.levels[level])
+        offset, length = self.tiles[self.level_starts[level] + row * cols + col]
+        f.seek(self.data_offset + offset)
+        tile = cv2.imdecode(np.frombuffer(f.read(length), dtype=np.uint8), cv2.IMREAD_COLOR)
+        buffer_stats.allocation(tile.nbytes)
+        return tile
+
+
+class PyramidCache:
+    """
+    Tiled pyramids (see build_pyramid) of the large frames of a video, built in the background and stored in
+    dir_name (one file per frame). Decoded tiles are kept in an LRU cache bounded by max_memory bytes.
+
+    Rendering reads only the tiles intersecting the visible area at the level matching the zoom (get_region), so the
+    cost of a pan or zoom doesn't depend on the size of the source image.
+    """
+
+    def __init__(self, dir_name=None, max_memory=PYRAMID_TILE_MEMORY, tile_size=PYRAMID_TILE_SIZE):
+        self.dir_name = dir_name
+        self.max_memory = max_memory
+        self.tile_size = tile_size
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        self.lock = threading.Lock()
+        self.pyramids = OrderedDict()  # image path -> Pyramid, of the most recent frames
+        self.pending = {}  # image path -> future of the build
+        self.tiles = OrderedDict()  # (pyramid path, level, row, col) -> decoded tile
+        self.memory_size = 0
+
+    def set_dir_name(self, dir_name):
+        with self.lock:
+            if dir_name == self.dir_name:
+                return
+
+            self.dir_name = dir_name
+            for future in self.pending.values():
+                future.cancel()
+            self.pending = {}
+            self.pyramids = OrderedDict()
+            self.tiles = OrderedDict()
+            self.memory_size = 0
+
+    def get_path(self, image_path):
+        return os.path.join(self.dir_name, os.path.splitext(os.path.basename(image_path))[0] + EXTENSION)
+
+    def open(self, image_path):
+        """
+        Pyramid of an image if it is built and up to date, None otherwise
+        """
+        with self.lock:
+            pyramid = self.pyramids.get(image_path)
+            if pyramid is not None:
+                self.pyramids.move_to_end(image_path)
+                return pyramid
+            if image_path in self.pending:
+                return None
+
+        pyramid = self.load(image_path)
+        if pyramid is None:
+            return None
+
+        with self.lock:
+            self.pyramids[image_path] = pyramid
+            while len(self.pyramids) > 16:
+                self.pyramids.popitem(last=False)
+        return pyramid
+
+    def load(self, image_path):
+        """
+        Reads the pyramid file of an image, None if it doesn't exist or was built from another version of the image
+        """
+        try:
+            pyramid = Pyramid(self.get_path(image_path))
+            return pyramid if pyramid.source == get_source_signature(image_path) else None
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+    def _build(self, image_path):
+        try:
+            if self.load(image_path) is None:
+                build_pyramid(image_path, self.get_path(image_path), self.tile_size)
+        finally:
+            with self.lock:
+                self.pending.pop(image_path, None)
+
+    def request(self, image_paths):
+        """
+        Schedules the build of the pyramids of some frames, the scheduled builds of other frames are cancelled
+        """
+        with self.lock:
+            wanted = set(image_paths)
+            for path, future in list(self.pending.items()):
+                if path not in wanted and future.cancel():
+                    del self.pending[path]
+
+            for path in image_paths:
+                if path not in self.pending and path not in self.pyramids:
+                    self.pending[path] = self.executor.submit(self._build, path)
+
+    def wait(self):
+        for future in list(self.pending.values()):
+            try:
+                future.result()
+            except Exception:
+                pass
+
+    def get_tile(self, pyramid, level, row, col, f):
+        key = (pyramid.path, level, row, col)
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is not None:
+                self.tiles.move_to_end(key)
+                return tile
+
+        tile = pyramid.read_tile(f, level, row, col)
+        tile.flags.writeable = False
+        with self.lock:
+            self.tiles[key] = tile
+            self.memory_size += tile.nbytes
+            while self.memory_size > self.max_memory and len(self.tiles) > 1:
+                _, evicted = self.tiles.popitem(last=False)
+                self.memory_size -= evicted.nbytes
+        return tile
+
+    def get_region(self, pyramid, level, x, y, w, h):
+        """
+        Region of a level of the pyramid covering the area (x, y, w, h) given in level coordinates, assembled from the
+        tiles intersecting it. Returns the region (aligned on the tiles) and the position of its top left corner.
+        """
+        H, W = pyramid.levels[level]
+        size = pyramid.tile_size
+        col1, row1 = max(int(x // size), 0), max(int(y // size), 0)
+        col2, row2 = min(int(math.ceil((x + w) / size)), int(math.ceil(W / size))), \
+            min(int(math.ceil((y + h) / size)), int(math.ceil(H / size)))
+        if col2 <= col1 or row2 <= row1:
+            return None, (0, 0)
+
+        x1, y1 = col1 * size, row1 * size
+        region = np.empty((min(row2 * size, H) - y1, min(col2 * size, W) - x1, 3), dtype=np.uint8)
+        buffer_stats.allocation(region.nbytes)
+        buffer_stats.copy(region.nbytes)
+        with open(pyramid.path, "rb") as f:
+            for row in range(row1, row2):
+                for col in range(col1, col2):
+                    tile = self.get_tile(pyramid, level, row, col, f)
+                    ty, tx = row * size - y1, col * size - x1
+                    region[ty:ty + tile.shape[0], tx:tx + tile.shape[1]] = tile
+        return region, (x1, y1)
+
+    def close(self):
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending = {}
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,315 @@
+import glob
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+from .polygon import Polygon, Bbox, Keypoints
+from .detection_set import Detection, DetectionSet
+from .locking import try_lock_file
+
+
+class JournalOp:
+    ADD = 1  # append a detection to a frame
+    UPDATE = 2  # replace the first detection with the same track_id (or append it)
+    DELETE = 3  # remove all detections with a track_id
+    DELETE_INDEX = 4  # remove the detection at an index
+    SET_CLASS = 5  # change the class of all detections with a track_id
+    SET_TRACK_ID = 6  # change the track_id of all detections with a track_id
+    SET_FRAME = 7  # replace all detections of a frame
+    REMOVE_FRAME = 8  # delete a frame (removed from the video)
+
+
+def apply_edit(detections, op, *args):
+    """
+    Applies an edit operation in place on the list of detections of a frame.
+    The same function is used when editing and when replaying the journal, so that both give the same result.
+    ADD and UPDATE return the detection as stored in the frame (a view of a DetectionSet may be a copy of the argument).
+    """
+    if op == JournalOp.ADD:
+        detection, = args
+        detections.append(detection)
+        return detections[-1]
+
+    elif op == JournalOp.UPDATE:
+        detection, = args
+        for i, d in enumerate(detections):
+            if d.track_id == detection.track_id:
+                detections[i] = detection
+                return detections[i]
+
+        detections.append(detection)
+        return detections[-1]
+
+    elif op == JournalOp.DELETE:
+        track_id, = args
+        if isinstance(detections, DetectionSet):
+            detections.remove_track(track_id)
+        else:
+            detections[:] = [d for d in detections if d.track_id != track_id]
+
+    elif op == JournalOp.DELETE_INDEX:
+        index, = args
+        return detections.pop(index)
+
+    elif op == JournalOp.SET_CLASS:
+        track_id, class_id = args
+        if isinstance(detections, DetectionSet):
+            detections.set_class(track_id, class_id)
+        else:
+            for d in detections:
+                if d.track_id == track_id:
+                    d.class_id = class_id
+
+    elif op == JournalOp.SET_TRACK_ID:
+        track_id, new_track_id = args
+        if isinstance(detections, DetectionSet):
+            detections.set_track_id(track_id, new_track_id)
+        else:
+            for d in detections:
+                if d.track_id == track_id:
+                    d.track_id = new_track_id
+
+    elif op == JournalOp.SET_FRAME:
+        new_detections, = args
+        detections[:] = new_detections
+
+    elif op == JournalOp.REMOVE_FRAME:
+        detections[:] = []
+
+    else:
+        raise ValueError("Unknown journal operation: {}".format(op))
+
+
+class Journal:
+    """
+    Append-only binary journal of the annotation edits of one video.
+
+    Each edit is appended as a record: <payload length, crc32> followed by the payload
+    (operation code, frame file name and operands). Records are written sequentially to numbered segment files.
+    On startup, the segments are replayed on top of the committed store; a torn record at the end of a segment
+    (crash in the middle of a write) fails its checksum and stops the replay.
+
+    Compaction: rotate() starts a new segment once every journaled edit has been handed to the store, and the
+    older segments are deleted with remove_segments() after the store commit is on disk.
+
+    The journal of a video belongs to a single process (the first one opening it, see journal.lock): the edits of
+    other processes opening the same video are not journaled, and they don't replay nor remove its segments.
+    """
+
+    HEADER = struct.Struct("<II")
+    OP = struct.Struct("<BH")
+    DETECTION = struct.Struct("<iiddddII")
+    INTS = struct.Struct("<ii")
+    INT = struct.Struct("<i")
+    COUNT = struct.Struct("<I")
+    DETECTION_DTYPE = np.dtype([("class_id", "<i4"), ("track_id", "<i4"), ("x", "<f8"), ("y", "<f8"),
+                                ("w", "<f8"), ("h", "<f8"), ("nb_polygon", "<u4"), ("nb_keypoints", "<u4")])
+
+    def __init__(self, dir_name):
+        self.dir_name = dir_name
+        self.lock = threading.Lock()
+
+        if not os.path.exists(dir_name):
+            os.makedirs(dir_name)
+        self.lock_fd = try_lock_file(os.path.join(dir_name, "journal.lock"))
+        self.owner = self.lock_fd is not None
+        if not self.owner:
+            print("The journal of {} is used by another process, edits are not journaled".format(dir_name))
+
+        segments = self.get_segments()
+        self.segment = segments[-1] + 1 if segments else 0
+        self.file = None
+        self.nb_records = 0  # number of records in the current segment
+
+    def get_segment_path(self, segment):
+        return os.path.join(self.dir_name, "journal.{:06d}.bin".format(segment))
+
+    def get_segments(self):
+        paths = glob.glob(os.path.join(self.dir_name, "journal.*.bin"))
+        return sorted(int(os.path.basename(p).split(".")[1]) for p in paths)
+
+    def append(self, op, file_name, *args):
+        self.append_batch([(op, file_name, args)])
+
+    def append_batch(self, records):
+        """
+        Appends several (op, file_name, args) records with a single write
+        """
+        if not records or not self.owner:
+            return
+
+        data = []
+        for op, file_name, args in records:
+            payload = self.encode(op, file_name, *args)
+            data.append(self.HEADER.pack(len(payload), zlib.crc32(payload)))
+            data.append(payload)
+
+        with self.lock:
+            if self.file is None:
+                if not os.path.exists(self.dir_name):
+                    os.makedirs(self.dir_name)
+                self.file = open(self.get_segment_path(self.segment), "ab")
+
+            self.file.write(b"".join(data))
+            self.file.flush()
+            self.nb_records += len(records)
+
+    def sync(self):
+        with self.lock:
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+
+    def rotate(self):
+        """
+        Closes the current segment and starts a new one.
+        Returns the number of the new segment: older segments can be removed once the store is committed.
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+            if self.nb_records > 0:
+                self.segment += 1
+                self.nb_records = 0
+
+            return self.segment
+
+    def remove_segments(self, before):
+        if not self.owner:
+            return
+
+        for segment in self.get_segments():
+            if segment < before:
+                os.remove(self.get_segment_path(segment))
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+            if self.lock_fd is not None:
+                os.close(self.lock_fd)
+                self.lock_fd = None
+
+    def replay(self):
+        """
+        Yields the (op, file_name, args) records of all segments, in order
+        """
+        if not self.owner:
+            return
+
+        for segment in self.get_segments():
+            with open(self.get_segment_path(segment), "rb") as f:
+                data = f.read()
+
+            offset = 0
+            while offset + self.HEADER.size <= len(data):
+                length, crc = self.HEADER.unpack_from(data, offset)
+                payload = data[offset + self.HEADER.size:offset + self.HEADER.size + length]
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    print("Journal segment {} is truncated, ignoring its last records".format(segment))
+                    break
+
+                yield self.decode(payload)
+                offset += self.HEADER.size + length
+
+    def encode(self, op, file_name, *args):
+        name = file_name.encode()
+        data = [self.OP.pack(op, len(name)), name]
+
+        if op in (JournalOp.ADD, JournalOp.UPDATE):
+            data.append(self.encode_detection(args[0]))
+        elif op in (JournalOp.DELETE, JournalOp.DELETE_INDEX):
+            data.append(self.INT.pack(args[0]))
+        elif op in (JournalOp.SET_CLASS, JournalOp.SET_TRACK_ID):
+            data.append(self.INTS.pack(*args))
+        elif op == JournalOp.SET_FRAME:
+            detections = args[0]
+            data.append(self.COUNT.pack(len(detections)))
+            if isinstance(detections, DetectionSet):
+                data.extend(self.encode_detection_set(detections))
+            else:
+                data.extend(self.encode_detection(d) for d in detections)
+        elif op != JournalOp.REMOVE_FRAME:
+            raise ValueError("Unknown journal operation: {}".format(op))
+
+        return b"".join(data)
+
+    def decode(self, payload):
+        op, name_length = self.OP.unpack_from(payload, 0)
+        offset = self.OP.size
+        file_name = payload[offset:offset + name_length].decode()
+        offset += name_length
+
+        if op in (JournalOp.ADD, JournalOp.UPDATE):
+            detection, offset = self.decode_detection(payload, offset)
+            args = (detection,)
+        elif op in (JournalOp.DELETE, JournalOp.DELETE_INDEX):
+            args = self.INT.unpack_from(payload, offset)
+        elif op in (JournalOp.SET_CLASS, JournalOp.SET_TRACK_ID):
+            args = self.INTS.unpack_from(payload, offset)
+        elif op == JournalOp.SET_FRAME:
+            count, = self.COUNT.unpack_from(payload, offset)
+            offset += self.COUNT.size
+            detections = []
+            for _ in range(count):
+                detection, offset = self.decode_detection(payload, offset)
+                detections.append(detection)
+            args = (detections,)
+        elif op == JournalOp.REMOVE_FRAME:
+            args = ()
+        else:
+            raise ValueError("Unknown journal operation: {}".format(op))
+
+        return op, file_name, args
+
+    def encode_detection(self, detection):
+        polygon, keypoints = detection.polygon.coords, detection.keypoints.coords
+        x, y, w, h = detection.bbox.xywh
+        return b"".join([self.DETECTION.pack(int(detection.class_id), int(detection.track_id), x, y, w, h,
+                                             len(polygon), len(keypoints)),
+                         struct.pack("<{}d".format(len(polygon)), *polygon),
+                         struct.pack("<{}d".format(len(keypoints)), *keypoints)])
+
+    def encode_detection_set(self, detections):
+        """
+        Same encoding as encode_detection for every row of a DetectionSet, built from its arrays
+        """
+        headers = np.zeros(len(detections), dtype=self.DETECTION_DTYPE)
+        headers["class_id"], headers["track_id"] = detections.class_ids, detections.track_ids
+        for i, k in enumerate(["x", "y", "w", "h"]):
+            headers[k] = detections.boxes[:, i]
+        headers["nb_polygon"] = np.diff(detections.polygon_offsets)
+        headers["nb_keypoints"] = np.diff(detections.kp_offsets)
+
+        size = self.DETECTION.size
+        headers = headers.tobytes()
+        polygons = detections.polygon_data.astype("<f8").tobytes()
+        keypoints = detections.kp_data.astype("<f8").tobytes()
+        polygon_offsets = (8 * detections.polygon_offsets).tolist()
+        kp_offsets = (8 * detections.kp_offsets).tolist()
+
+        parts = []
+        for i in range(len(detections)):
+            parts.append(headers[i * size:(i + 1) * size])
+            parts.append(polygons[polygon_offsets[i]:polygon_offsets[i + 1]])
+            parts.append(keypoints[kp_offsets[i]:kp_offsets[i + 1]])
+        return parts
+
+    def decode_detection(self, payload, offset):
+        class_id, track_id, x, y, w, h, nb_polygon, nb_keypoints = self.DETECTION.unpack_from(payload, offset)
+        offset += self.DETECTION.size
+        polygon = struct.unpack_from("<{}d".format(nb_polygon), payload, offset)
+        offset += 8 * nb_polygon
+        keypoints = struct.unpack_from("<{}d".format(nb_keypoints), payload, offset)
+        offset += 8 * nb_keypoints
+
+        detection = Detection(class_id, track_id, Polygon(polygon), Bbox(x, y, w, h), Keypoints(keypoints))
+        return detection, offset
@@ -0,0 +1,147 @@
+import functools
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # No inter-process locking on this platform (Windows), only threads are synchronized
+    fcntl = None
+
+
+def synchronized(method):
+    """
+    Runs a method while holding the reentrant lock of its instance (self.lock)
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def try_lock_file(path):
+    """
+    Tries to take an exclusive lock on a file without waiting, the lock is held until the returned file descriptor is
+    closed (or the process exits). Returns None if another process holds it.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is None:
+        return fd
+
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+class VideoLock:
+    """
+    Reader/writer lock of the annotations of one video, shared by the threads of a process and by processes.
+
+    Threads of a process synchronize on a condition: any number of readers, or a single writer. The process holds a
+    shared (read) or exclusive (write) flock on output/<video>/.lock while at least one of its threads does, so that
+    another process (e.g. the detection server) can't commit the store at the same time.
+    The writer thread may re-acquire the lock (read or write), a reader can't upgrade to a write lock.
+    """
+
+    LOCK_NAME = ".lock"
+
+    def __init__(self, dir_name):
+        self.dir_name = dir_name
+        self.condition = threading.Condition()
+        self.nb_readers = 0
+        self.writer = None  # thread holding the write lock
+        self.writer_depth = 0
+        self.fd = None
+
+    def _flock(self, operation):
+        """
+        operation is the name of a fcntl.flock operation ("LOCK_SH", "LOCK_EX" or "LOCK_UN")
+        """
+        if fcntl is None:
+            return
+
+        if self.fd is None:
+            if not os.path.exists(self.dir_name):
+                os.makedirs(self.dir_name)
+            self.fd = os.open(os.path.join(self.dir_name, self.LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, getattr(fcntl, operation))
+
+    def acquire_read(self):
+        with self.condition:
+            if self.writer is threading.current_thread():
+                self.writer_depth += 1
+                return
+
+            self.condition.wait_for(lambda: self.writer is None)
+            if self.nb_readers == 0:
+                self._flock("LOCK_SH")
+            self.nb_readers += 1
+
+    def release_read(self):
+        with self.condition:
+            if self.writer is threading.current_thread():
+                self.writer_depth -= 1
+                return
+
+            self.nb_readers -= 1
+            if self.nb_readers == 0:
+                self._flock("LOCK_UN")
+                self.condition.notify_all()
+
+    def acquire_write(self):
+        with self.condition:
+            if self.writer is threading.current_thread():
+                self.writer_depth += 1
+                return
+
+            self.condition.wait_for(lambda: self.writer is None and self.nb_readers == 0)
+            self._flock("LOCK_EX")
+            self.writer = threading.current_thread()
+            self.writer_depth = 1
+
+    def release_write(self):
+        with self.condition:
+            self.writer_depth -= 1
+            if self.writer_depth > 0:
+                return
+
+            self.writer = None
+            self._flock("LOCK_UN")
+            self.condition.notify_all()
+
+    def read(self):
+        return _LockContext(self.acquire_read, self.release_read)
+
+    def write(self):
+        return _LockContext(self.acquire_write, self.release_write)
+
+
+class _LockContext:
+    def __init__(self, acquire, release):
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *args):
+        self.release()
+
+
+_video_locks = {}
+_video_locks_lock = threading.Lock()
+
+
+def get_video_lock(dir_name):
+    """
+    Returns the VideoLock of a video directory, shared by all the stores of the process opened on it
+    """
+    key = os.path.abspath(dir_name)
+    with _video_locks_lock:
+        if key not in _video_locks:
+            _video_locks[key] = VideoLock(dir_name)
+        return _video_locks[key]
@@ -0,0 +1,180 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def write_file(path, data):
+    """
+    Writes a file and forces it to disk. The file is written next to its destination and renamed over it, so that
+    readers (possibly in other processes) see either the old or the new content, never a partial file.
+    """
+    mode = "wb" if isinstance(data, bytes) else "w"
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, mode) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def fsync_dir(dir_name):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+
+    fd = os.open(dir_name, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class PersistenceThread(threading.Thread):
+    """
+    Write-behind persistence of the annotations of one video.
+
+    Callers never touch the disk: they submit files to write (as a function producing the file content, evaluated
+    in the background) and request commits of the store. Pending writes to the same path are coalesced, so that a
+    burst of edits of a frame results in a single write, and commit requests are merged into a single store commit.
+    The thread writes everything pending in one batch, with fsync, then commits the store.
+
+    The queue is bounded: submit() blocks when max_pending files are waiting to be written.
+    barrier() blocks until everything submitted before the call is on disk.
+    """
+
+    def __init__(self, store, max_pending=1024):
+        super().__init__(daemon=True)
+
+        self.store = store
+        self.max_pending = max_pending
+
+        self.condition = threading.Condition()
+        self.pending = OrderedDict()  # path -> function returning the file content
+        self.commit_requested = False
+        self.commit_callbacks = []  # functions called once the requested commits are on disk
+        self.stopping = False
+
+        # Each submission gets a ticket, barrier() waits until the ticket is completed
+        self.submitted = 0
+        self.completed = 0
+
+        self.nb_batches = 0
+        self.nb_writes = 0
+        self.nb_coalesced = 0
+        self.nb_commits = 0
+
+    def _ensure_started(self):
+        if not self.is_alive() and not self.stopping:
+            self.start()
+
+    def submit(self, path, producer):
+        """
+        Schedules the write of producer() into path, replacing any pending write of the same path
+        """
+        with self.condition:
+            self._ensure_started()
+
+            while len(self.pending) >= self.max_pending and path not in self.pending:
+                self.condition.wait()
+
+            if path in self.pending:
+                self.nb_coalesced += 1
+                self.pending.move_to_end(path)
+
+            self.pending[path] = producer
+            self.submitted += 1
+            self.condition.notify_all()
+
+    def request_commit(self, on_commit=None):
+        """
+        Schedules a commit of the store, on_commit() is called from the background thread once it is on disk
+        """
+        with self.condition:
+            self._ensure_started()
+
+            self.commit_requested = True
+            if on_commit is not None:
+                self.commit_callbacks.append(on_commit)
+            self.submitted += 1
+            self.condition.notify_all()
+
+    def barrier(self, timeout=None):
+        """
+        Waits until every write and commit submitted before this call is on disk.
+        Returns False if the timeout expired.
+        """
+        with self.condition:
+            if not self.is_alive():
+                return self.completed >= self.submitted
+
+            ticket = self.submitted
+            return self.condition.wait_for(lambda: self.completed >= ticket or not self.is_alive(), timeout)
+
+    def close(self):
+        """
+        Stops the thread once everything pending is written, without waiting for it
+        """
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+
+    def has_pending(self):
+        with self.condition:
+            return self.completed < self.submitted
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.commit_requested or self.stopping)
+
+                if not self.pending and not self.commit_requested and self.stopping:
+                    return
+
+                pending, self.pending = self.pending, OrderedDict()
+                commit, self.commit_requested = self.commit_requested, False
+                callbacks, self.commit_callbacks = self.commit_callbacks, []
+                ticket = self.submitted
+                self.condition.notify_all()  # wake up blocked submitters
+
+            try:
+                self._write_batch(pending, commit)
+
+                for callback in callbacks:
+                    callback()
+            except Exception as e:
+                print("Error while saving annotations: {}".format(e))
+
+            with self.condition:
+                self.completed = ticket
+                self.condition.notify_all()
+
+    def _write_batch(self, pending, commit):
+        dir_names = set()
+        for path, producer in pending.items():
+            dir_name = os.path.dirname(path)
+            if dir_name and not os.path.exists(dir_name):
+                os.makedirs(dir_name)
+
+            write_file(path, producer())
+            dir_names.add(dir_name)
+            self.nb_writes += 1
+
+        # Only the in-memory merge holds the store lock, the disk write doesn't block readers
+        if commit and self.store.commit():
+            dir_names.add(self.store.dir_name)
+            self.nb_commits += 1
+
+        for dir_name in dir_names:
+            if dir_name:
+                fsync_dir(dir_name)
+
+        self.nb_batches += 1
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                "pending": len(self.pending),
+                "batches": self.nb_batches,
+                "writes": self.nb_writes,
+                "coalesced": self.nb_coalesced,
+                "commits": self.nb_commits
+            }
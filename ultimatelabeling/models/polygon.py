@@ -2,7 +2,22 @@ import numpy as np
 import math
 
 
+def read_only(array):
+    array.flags.writeable = False
+    return array
+
+
 class Bbox:
+    """
+    Axis-aligned box stored as four scalars (x, y, w, h).
+
+    Derived values (pos, size, corners, center, anchors) are computed on first access and cached until the next
+    mutation, they are returned as read-only arrays: a bbox is only modified through its setters and methods.
+    A bbox created by from_array() also writes its mutations to the wrapped array (e.g. a row of DetectionSet.boxes).
+    """
+
+    __slots__ = ("_x", "_y", "_w", "_h", "_target", "_cache")
+
     @staticmethod
     def get_thickness():
         return 1
@@ -12,66 +27,122 @@ class Bbox:
         return 4 * Bbox.get_thickness()
 
     def __init__(self, x=0, y=0, w=0, h=0):
-        self.pos = np.array([x, y], dtype=float)
-        self.size = np.array([w, h], dtype=float)
+        self._x, self._y, self._w, self._h = float(x), float(y), float(w), float(h)
+        self._target = None
+        self._cache = None
+
+    @staticmethod
+    def from_array(data):
+        """
+        Bbox reading x, y, w, h from an array and writing its mutations back to it
+        """
+        bbox = Bbox(*data.tolist())
+        bbox._target = data
+        return bbox
+
+    @staticmethod
+    def from_xywh(boxes):
+        """
+        Batch constructor: list of Bbox from an N x 4 array of x, y, w, h
+        """
+        return [Bbox(x, y, w, h) for x, y, w, h in np.asarray(boxes, dtype=float).reshape(-1, 4).tolist()]
+
+    def _set(self, x, y, w, h):
+        self._x, self._y, self._w, self._h = float(x), float(y), float(w), float(h)
+        self._cache = None
+        if self._target is not None:
+            self._target[:] = (self._x, self._y, self._w, self._h)
+
+    def _cached(self, key, compute):
+        if self._cache is None:
+            self._cache = {}
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = compute()
+        return value
+
+    @property
+    def pos(self):
+        return self._cached("pos", lambda: read_only(np.array([self._x, self._y])))
+
+    @pos.setter
+    def pos(self, value):
+        x, y = value
+        self._set(x, y, self._w, self._h)
+
+    @property
+    def size(self):
+        return self._cached("size", lambda: read_only(np.array([self._w, self._h])))
+
+    @size.setter
+    def size(self, value):
+        w, h = value
+        self._set(self._x, self._y, w, h)
 
     def resize(self, scale):
-        self.pos *= scale
-        self.size *= scale
+        sx, sy = np.broadcast_to(scale, 2).tolist()
+        self._set(self._x * sx, self._y * sy, self._w * sx, self._h * sy)
         return self
 
     def __bool__(self):
-        return bool(np.any(self.pos) or np.any(self.size))
+        return bool(self._x or self._y or self._w or self._h)
 
     @property
     def xywh(self):
-        return np.concatenate([self.pos, self.size])
+        return self._cached("xywh", lambda: read_only(np.array([self._x, self._y, self._w, self._h])))
 
     @property
     def x1y1x2y2(self):
-        return np.concatenate([self.pos, self.pos + self.size])
+        return self._cached("x1y1x2y2", lambda: read_only(np.array(self.corners)))
+
+    @property
+    def corners(self):
+        """
+        x1, y1, x2, y2 as a tuple of floats
+        """
+        return self._x, self._y, self._x + self._w, self._y + self._h
 
     @property
     def xcycwh(self):
-        return np.concatenate([self.center, self.size])
+        return self._cached("xcycwh", lambda: read_only(np.concatenate([self.center, self.size])))
 
     @property
     def center(self):
-        return self.pos + self.size / 2
+        return self._cached("center", lambda: read_only(np.array([self._x + self._w / 2, self._y + self._h / 2])))
 
     def set_x1(self, x1):
-        self.size[0] += (self.pos[0] - x1)
-        self.pos[0] = x1
+        self._set(x1, self._y, self._w + self._x - x1, self._h)
 
     def set_y1(self, y1):
-        self.size[1] += (self.pos[1] - y1)
-        self.pos[1] = y1
+        self._set(self._x, y1, self._w, self._h + self._y - y1)
 
     def set_x2(self, x2):
-        self.size[0] += (x2 - self.pos[0] - self.size[0])
+        self._set(self._x, self._y, x2 - self._x, self._h)
 
     def set_y2(self, y2):
-        self.size[1] += (y2 - self.pos[1] - self.size[1])
+        self._set(self._x, self._y, self._w, y2 - self._y)
 
     @staticmethod
     def from_center_size(center, size):
-        bbox = Bbox()
-        bbox.pos = center - size / 2
-        bbox.size = size
-        return bbox
+        (xc, yc), (w, h) = center, size
+        return Bbox(xc - w / 2, yc - h / 2, w, h)
 
     def correct_negative_size(self):
-        if self.size[0] < 0:
-            self.size[0] *= -1
-            self.pos[0] -= self.size[0]
-        if self.size[1] < 0:
-            self.size[1] *= -1
-            self.pos[1] -= self.size[1]
+        x, y, w, h = self._x, self._y, self._w, self._h
+        if w < 0:
+            x, w = x + w, -w
+        if h < 0:
+            y, h = y + h, -h
+        self._set(x, y, w, h)
 
     def get_anchors(self, factor=1):
-        anchors = {}
+        """
+        Returns the 8 anchors of the bbox (cached, must not be modified)
+        """
+        return self._cached(("anchors", factor), lambda: self._compute_anchors(factor))
 
-        xmin, ymin, xmax, ymax = self.x1y1x2y2
+    def _compute_anchors(self, factor):
+        xmin, ymin, xmax, ymax = self.corners
         mid_x, mid_y = (xmin + xmax) / 2, (ymin + ymax) / 2
 
         sRA = Bbox.get_thickness() * factor
@@ -83,6 +154,7 @@ class Bbox:
         _M = [mid_y - sRA, mid_y + sRA]
         _B = [ymax - sRA, ymax + sRA]
 
+        anchors = {}
         anchors['LT'] = [L_[0], _T[0], L_[1], _T[1]]
         anchors['MT'] = [M_[0], _T[0], M_[1], _T[1]]
         anchors['RT'] = [R_[0], _T[0], R_[1], _T[1]]
@@ -95,16 +167,16 @@ class Bbox:
         return anchors
 
     def intersects(self, anchor):
-        xmin, ymin, xmax, ymax = self.x1y1x2y2
-        xA = max(xmin, anchor[0])
-        yA = max(ymin, anchor[1])
-        xB = min(xmax, anchor[2])
-        yB = min(ymax, anchor[3])
+        # Same as (min(xmax, ax2) - max(xmin, ax1) + 1 > 0) and (... y ...), without building intermediate values
+        xmin, ymin = self._x, self._y
+        xmax, ymax = xmin + self._w, ymin + self._h
+        ax1, ay1, ax2, ay2 = anchor
 
-        return max(0, xB - xA + 1) * max(0, yB - yA + 1) > 0
+        return (xmax - xmin + 1 > 0 and xmax - ax1 + 1 > 0 and ax2 - xmin + 1 > 0 and ax2 - ax1 + 1 > 0 and
+                ymax - ymin + 1 > 0 and ymax - ay1 + 1 > 0 and ay2 - ymin + 1 > 0 and ay2 - ay1 + 1 > 0)
 
     def is_inside(self, p):
-        xmin, ymin, xmax, ymax = self.x1y1x2y2
+        xmin, ymin, xmax, ymax = self.corners
         return xmin <= p[0] <= xmax and ymin <= p[1] <= ymax
 
     def is_inside_anchors(self, p):
@@ -115,23 +187,44 @@ class Bbox:
         return False, ""
 
     def to_json(self):
-        return self.xywh.tolist()
+        return [self._x, self._y, self._w, self._h]
 
     def to_dict(self):
-        x, y, w, h = self.xywh
-        return {"x": x, "y": y, "w": w, "h": h}
+        return {"x": self._x, "y": self._y, "w": self._w, "h": self._h}
 
     def copy(self):
-        return Bbox(*self.to_json())
+        return Bbox(self._x, self._y, self._w, self._h)
 
     def __repr__(self):
-        return "Bbox(x={}, y={}, w={}, h={})".format(self.pos[0], self.pos[1], self.size[0], self.size[1])
+        return "Bbox(x={}, y={}, w={}, h={})".format(self._x, self._y, self._w, self._h)
+
+
+def split_ragged(offsets, data):
+    return [data[start:end] for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
 
 
 class Polygon:
+    __slots__ = ("coords",)
+
     def __init__(self, coords=[]):
         self.coords = np.array(coords, dtype=float)
 
+    @staticmethod
+    def from_ragged(offsets, data):
+        """
+        Batch constructor: list of Polygon wrapping the rows of a ragged buffer (flat data indexed by offsets)
+        """
+        return [Polygon.from_array(coords) for coords in split_ragged(offsets, data)]
+
+    @staticmethod
+    def from_array(coords):
+        """
+        Wraps an array of coordinates without copying it
+        """
+        polygon = Polygon.__new__(Polygon)
+        polygon.coords = coords
+        return polygon
+
     def resize(self, scale):
         self.coords *= scale
         return self
@@ -160,6 +253,8 @@ class Polygon:
 
 
 class Keypoints:
+    __slots__ = ("coords",)
+
     def __init__(self, coords=[]):
         """
         Keypoints are provided as list of x, y, v (where x, y are coordinates and v is visibility)
@@ -168,18 +263,30 @@ class Keypoints:
 
         self.coords = np.array(coords, dtype=float)
 
-    def get_anchors(self, factor=2):
-        anchors = {}
+    @staticmethod
+    def from_ragged(offsets, data):
+        """
+        Batch constructor: list of Keypoints wrapping the rows of a ragged buffer (flat data indexed by offsets)
+        """
+        return [Keypoints.from_array(coords) for coords in split_ragged(offsets, data)]
 
+    @staticmethod
+    def from_array(coords):
+        """
+        Wraps an array of x, y, v coordinates without copying it
+        """
+        keypoints = Keypoints.__new__(Keypoints)
+        keypoints.coords = coords
+        return keypoints
+
+    def get_anchors(self, factor=2):
         sRA = 1 * factor
 
         x, y, v = self.coords[0::3], self.coords[1::3], self.coords[2::3]
+        visible = np.flatnonzero(v > 0)
+        boxes = np.stack([x[visible] - sRA, y[visible] - sRA, x[visible] + sRA, y[visible] + sRA], axis=1)
 
-        for i in range(len(x)):
-            if v[i] > 0:
-                anchors[i] = [x[i] - sRA, y[i] - sRA, x[i] + sRA, y[i] + sRA]
-
-        return anchors
+        return dict(zip(visible.tolist(), boxes.tolist()))
 
     def __len__(self):
         return len(self.coords) // 3
@@ -0,0 +1,358 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+from .columnar_store import ColumnarStore
+from .detection_set import DetectionSet, concat_ragged
+from . import txt_format
+from ultimatelabeling import utils
+
+
+class SqliteStore:
+    """
+    Annotation store of one video in an embedded SQLite database (same interface as ColumnarStore).
+
+    Each detection is a row of the `detections` table (frame, row, track_id, class_id, x, y, w, h, polygon, kp),
+    polygons and keypoints being stored as float64 blobs. The table is indexed on (frame), (track_id, frame) and
+    (class_id), so that track and class queries are single indexed statements.
+
+    As in ColumnarStore, edited frames are kept in an in-memory overlay. merge() hands them over to write(), which
+    replaces them in a single transaction (typically from the PersistenceThread). Until then they are served from
+    memory. The database is opened in WAL mode: readers are not blocked by the background writer.
+    Each thread uses its own connection. Concurrent writers (threads or processes) are serialized by SQLite
+    transactions: a frame is replaced as a whole, the last commit of a frame wins.
+    """
+
+    FILE_NAME = "annotations.db"
+
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS frames (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS detections (frame INTEGER NOT NULL, row INTEGER NOT NULL, "
+        "track_id INTEGER NOT NULL, class_id INTEGER NOT NULL, x REAL, y REAL, w REAL, h REAL, polygon BLOB, kp BLOB)",
+        "CREATE INDEX IF NOT EXISTS detections_frame ON detections (frame)",
+        "CREATE INDEX IF NOT EXISTS detections_track ON detections (track_id, frame)",
+        "CREATE INDEX IF NOT EXISTS detections_class ON detections (class_id)"
+    ]
+
+    def __init__(self, dir_name):
+        self.dir_name = dir_name
+        self.file_path = os.path.join(dir_name, self.FILE_NAME)
+        self.lock = threading.RLock()
+        self.local = threading.local()
+
+        self.frame_ids = {}  # file_name -> id in the frames table
+        self.overlay = {}  # file_name -> DetectionSet, overrides the database
+        self.pending = {}  # file_name -> DetectionSet, merged but not written yet
+        self.removed = set()  # frames deleted (empty in memory) until they are deleted from the database
+        self.dirty = False
+
+        self.load()
+
+    def exists(self):
+        return os.path.exists(self.file_path)
+
+    def connect(self):
+        """
+        Connection of the calling thread, the database is created on first use
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            if not os.path.exists(self.dir_name):
+                os.makedirs(self.dir_name)
+
+            connection = sqlite3.connect(self.file_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                for statement in self.SCHEMA:
+                    connection.execute(statement)
+            self.local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def load(self):
+        if not self.exists():
+            return
+
+        with self.lock:
+            self.frame_ids = {name: i for i, name in self.connect().execute("SELECT id, name FROM frames")}
+            self.overlay = {}
+            self.pending = {}
+            self.removed = set()
+            self.dirty = False
+
+    def _get_memory_frame(self, file_name):
+        if file_name in self.overlay:
+            return self.overlay[file_name]
+        return self.pending.get(file_name)
+
+    def has_frame(self, file_name):
+        with self.lock:
+            if file_name in self.removed:
+                return False
+            return file_name in self.overlay or file_name in self.pending or file_name in self.frame_ids
+
+    def get_file_names(self):
+        with self.lock:
+            names = (set(self.frame_ids) | set(self.pending) | set(self.overlay)) - self.removed
+            return sorted(names, key=utils.natural_sort_key)
+
+    @staticmethod
+    def _to_detection_set(rows):
+        """
+        DetectionSet from rows (track_id, class_id, x, y, w, h, polygon, kp)
+        """
+        if not rows:
+            return DetectionSet()
+
+        track_ids, class_ids, x, y, w, h, polygons, keypoints = zip(*rows)
+        polygon_offsets, polygon_data = concat_ragged([(np.array([0, len(p) // 8]), np.frombuffer(p, dtype="<f8"))
+                                                       for p in polygons])
+        kp_offsets, kp_data = concat_ragged([(np.array([0, len(k) // 8]), np.frombuffer(k, dtype="<f8"))
+                                             for k in keypoints])
+
+        return DetectionSet.from_arrays(track_ids, class_ids, np.stack([x, y, w, h], axis=1),
+                                        polygon_offsets, polygon_data, kp_offsets, kp_data)
+
+    @staticmethod
+    def _to_rows(frame_id, detections):
+        if not isinstance(detections, DetectionSet):
+            detections = DetectionSet(detections)
+
+        polygon_offsets, kp_offsets = detections.polygon_offsets, detections.kp_offsets
+        polygons = detections.polygon_data.astype("<f8")
+        keypoints = detections.kp_data.astype("<f8")
+
+        return [(frame_id, i, int(track_id), int(class_id), x, y, w, h,
+                 polygons[polygon_offsets[i]:polygon_offsets[i + 1]].tobytes(),
+                 keypoints[kp_offsets[i]:kp_offsets[i + 1]].tobytes())
+                for i, (track_id, class_id, (x, y, w, h)) in enumerate(zip(detections.track_ids.tolist(),
+                                                                           detections.class_ids.tolist(),
+                                                                           detections.boxes.tolist()))]
+
+    def get_frame(self, file_name):
+        """
+        Returns a copy of the detections of a frame as a DetectionSet (empty if the frame has no annotations)
+        """
+        with self.lock:
+            detections = self._get_memory_frame(file_name)
+            if detections is not None:
+                return detections.copy()
+
+            frame_id = self.frame_ids.get(file_name)
+
+        if frame_id is None:
+            return DetectionSet()
+
+        rows = self.connect().execute("SELECT track_id, class_id, x, y, w, h, polygon, kp FROM detections "
+                                      "WHERE frame = ? ORDER BY row", (frame_id,)).fetchall()
+        return self._to_detection_set(rows)
+
+    def get_track_ids(self, file_name):
+        with self.lock:
+            detections = self._get_memory_frame(file_name)
+            if detections is not None:
+                return np.sort(detections.track_ids)
+
+            frame_id = self.frame_ids.get(file_name)
+
+        if frame_id is None:
+            return np.zeros(0, dtype=np.int32)
+
+        rows = self.connect().execute("SELECT track_id FROM detections WHERE frame = ? ORDER BY track_id",
+                                      (frame_id,)).fetchall()
+        return np.array([r[0] for r in rows], dtype=np.int32)
+
+    def get_track_frames(self, track_id):
+        """
+        Returns the set of file_names containing a track
+        """
+        with self.lock:
+            memory = {**self.pending, **self.overlay}
+            names = {name for name, in self.connect().execute(
+                "SELECT DISTINCT frames.name FROM detections JOIN frames ON frames.id = detections.frame "
+                "WHERE detections.track_id = ?", (int(track_id),))}
+
+        names -= set(memory)
+        names.update(name for name, detections in memory.items() if np.any(detections.track_ids == track_id))
+        return names
+
+    def count_class_per_frame(self, class_id):
+        """
+        Returns a dictionary file_name -> number of detections of a class (frames without any are omitted)
+        """
+        with self.lock:
+            memory = {**self.pending, **self.overlay}
+            counts = {name: count for name, count in self.connect().execute(
+                "SELECT frames.name, COUNT(*) FROM detections JOIN frames ON frames.id = detections.frame "
+                "WHERE detections.class_id = ? GROUP BY detections.frame", (int(class_id),))
+                if name not in memory}
+
+        for name, detections in memory.items():
+            count = int(np.count_nonzero(detections.class_ids == class_id))
+            if count > 0:
+                counts[name] = count
+        return counts
+
+    def set_frame(self, file_name, detections):
+        with self.lock:
+            self.overlay[file_name] = DetectionSet(detections)
+            self.removed.discard(file_name)
+            self.dirty = True
+
+    def remove_frame(self, file_name):
+        """
+        Deletes a frame (e.g. removed from the video), it is deleted from the database by the next write
+        """
+        with self.lock:
+            self.set_frame(file_name, DetectionSet())
+            self.removed.add(file_name)
+
+    def set_frames(self, frames):
+        """
+        Sets several frames at once, frames is a dictionary file_name -> DetectionSet (or list of Detection)
+        """
+        with self.lock:
+            for file_name, detections in frames.items():
+                self.set_frame(file_name, detections)
+
+    def _in_memory(self, file_names):
+        return set(file_names) & (set(self.overlay) | set(self.pending))
+
+    def remove_track(self, track_id, file_names):
+        """
+        Removes a track from the given frames, with a single DELETE for the frames which are not in memory
+        """
+        with self.lock:
+            file_names = set(file_names)
+            in_memory = self._in_memory(file_names)
+
+            for file_name in in_memory:
+                detections = self._get_memory_frame(file_name)
+                self.set_frame(file_name, detections.filter(detections.track_ids != track_id))
+
+            frame_ids = [self.frame_ids[name] for name in file_names - in_memory if name in self.frame_ids]
+            connection = self.connect()
+            with connection:
+                connection.executemany("DELETE FROM detections WHERE track_id = ? AND frame = ?",
+                                       [(int(track_id), frame_id) for frame_id in frame_ids])
+
+    def modify_track_class_id(self, track_id, class_id, file_names):
+        """
+        Changes the class of a track in the given frames, with a single UPDATE for the frames which are not in memory
+        """
+        with self.lock:
+            file_names = set(file_names)
+            in_memory = self._in_memory(file_names)
+
+            for file_name in in_memory:
+                detections = self._get_memory_frame(file_name).copy()
+                detections.set_class(track_id, class_id)
+                self.set_frame(file_name, detections)
+
+            frame_ids = [self.frame_ids[name] for name in file_names - in_memory if name in self.frame_ids]
+            connection = self.connect()
+            with connection:
+                connection.executemany("UPDATE detections SET class_id = ? WHERE track_id = ? AND frame = ?",
+                                       [(int(class_id), int(track_id), frame_id) for frame_id in frame_ids])
+
+    def get_columns(self, file_names):
+        """
+        Returns the rows of several frames as one set of columns (see ColumnarStore.get_columns)
+        """
+        with self.lock:
+            positions = {name: i for i, name in enumerate(file_names)}
+            memory = {name: detections for name, detections in {**self.pending, **self.overlay}.items()
+                      if name in positions}
+            frame_map = {frame_id: positions[name] for name, frame_id in self.frame_ids.items()
+                         if name in positions and name not in memory}
+
+            rows = self.connect().execute("SELECT frame, track_id, class_id, x, y, w, h, polygon, kp FROM detections "
+                                          "ORDER BY frame, row").fetchall()
+
+        rows = [row for row in rows if row[0] in frame_map]
+        parts = [self._to_detection_set([row[1:] for row in rows]).to_columns()]
+        parts[0]["frame"] = np.array([frame_map[row[0]] for row in rows], dtype=np.int32)
+        parts.extend(detections.to_columns(positions[name]) for name, detections in memory.items())
+
+        columns = ColumnarStore._concat_columns(parts)
+        return ColumnarStore._take_rows(columns, np.argsort(columns["frame"], kind="stable"))
+
+    def commit(self):
+        """
+        Writes the overlay to the database. Returns False if there was nothing to commit.
+        """
+        snapshot = self.merge()
+        if snapshot is None:
+            return False
+
+        self.write(snapshot)
+        return True
+
+    def refresh(self):
+        """
+        Reloads the frame ids, frames may have been added by other processes
+        """
+        frame_ids = {name: i for i, name in self.connect().execute("SELECT id, name FROM frames")}
+        with self.lock:
+            self.frame_ids = frame_ids
+
+    def merge(self):
+        """
+        Hands the overlay over to write(), its frames are served from memory until they are written.
+        Returns the snapshot to pass to write(), or None if there was nothing to commit.
+        """
+        with self.lock:
+            if not self.dirty:
+                return None
+
+            snapshot, self.overlay = self.overlay, {}
+            self.pending.update(snapshot)
+            self.dirty = False
+            return snapshot
+
+    def write(self, snapshot):
+        """
+        Replaces the frames of a snapshot returned by merge() in a single transaction
+        """
+        with self.lock:
+            removed = {file_name for file_name in snapshot if file_name in self.removed}
+
+        connection = self.connect()
+        with connection:
+            frame_ids = {}
+            for file_name in snapshot:
+                connection.execute("INSERT OR IGNORE INTO frames (name) VALUES (?)", (file_name,))
+                frame_ids[file_name], = connection.execute("SELECT id FROM frames WHERE name = ?",
+                                                           (file_name,)).fetchone()
+
+            connection.executemany("DELETE FROM detections WHERE frame = ?", [(i,) for i in frame_ids.values()])
+            connection.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   [row for file_name, detections in snapshot.items()
+                                    for row in self._to_rows(frame_ids[file_name], detections)])
+            connection.executemany("DELETE FROM frames WHERE id = ?", [(frame_ids[name],) for name in removed])
+
+        self.refresh()
+        with self.lock:
+            for file_name, detections in snapshot.items():
+                if self.pending.get(file_name) is detections:
+                    del self.pending[file_name]
+                    self.removed.discard(file_name)
+
+    def import_txt(self, dir_name=None, workers=None):
+        """
+        Imports the legacy layout (one space-separated <frame>.txt file per frame) into the overlay.
+        Returns the number of imported frames.
+        """
+        return txt_format.import_txt(self, self.dir_name if dir_name is None else dir_name, workers)
+
+    def export_txt(self, dir_name=None):
+        """
+        Exports every annotated frame to the legacy layout (one space-separated <frame>.txt file per frame).
+        """
+        txt_format.export_txt(self, self.dir_name if dir_name is None else dir_name)
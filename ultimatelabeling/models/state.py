@@ -1,13 +1,14 @@
 import pickle
 import os
-import glob
 import re
-import numpy as np
-from PyQt5.QtCore import QThread, QMutex
 from ultimatelabeling.styles import Theme
 from .track_info import TrackInfo
-from ultimatelabeling import utils
-from ultimatelabeling.config import DATA_DIR, STATE_PATH
+from .commit_queue import CommitQueue
+from .video_manifest import load_manifest, read_image_header
+from .extraction import ExtractionManager
+from .frame_provider import FrameProvider
+from .image_pyramid import PyramidCache
+from ultimatelabeling.config import DATA_DIR, OUTPUT_DIR, STATE_PATH, PYRAMID_CACHE, PYRAMID_MIN_SIZE
 
 
 class FrameMode:
@@ -29,8 +30,14 @@ class State:
         self.current_frame = 0
         self.nb_frames = 0
         self.file_names = []
+        self.file_stems = []
+        self.manifest = None
+        self.extraction = ExtractionManager(DATA_DIR)
+        self.frame_provider = FrameProvider()
+        self.pyramids = PyramidCache() if PYRAMID_CACHE else None
         self.theme = Theme.DARK
-        self.track_info = TrackInfo()
+        self.track_info = None  # annotations of the current video, opened by load_state
+        self.commit_queue = CommitQueue()
         self.current_detection = None
         self.frame_mode = FrameMode.MANUAL
 
@@ -69,30 +76,26 @@ class State:
         if frame is None:
             frame = self.current_frame
 
-        file_path = self.file_names[frame]
-        base = os.path.basename(file_path)
-        return os.path.splitext(base)[0]
+        return self.file_stems[frame]
 
     def remove_current_frame(self):
         current_file = self.file_names[self.current_frame]
-        base_path, file_name = os.path.split(current_file)
-        file_name, file_ext = os.path.splitext(file_name)
-        dataset_name = os.path.split(base_path)[1]
 
         print("Removing current frame: ", current_file)
         try:
             # rename current file
             os.rename(current_file, current_file + '.not')
-            # rename current file's labels
-            current_file_label = os.path.join('output', dataset_name, file_name) + '.txt'
-            current_file_yolo_label = os.path.join('output', dataset_name, 'yolo', file_name) + '.txt'
-            os.rename(current_file_label, current_file_label + '.not')
-            os.rename(current_file_yolo_label, current_file_yolo_label + '.not')
         except FileNotFoundError as e:
             print(e)
 
+        # Its annotations are deleted from the store, so that they are not exported
+        self.commit_queue.barrier()
+        self.track_info.remove_frame(self.get_file_name())
+
         del self.file_names[self.current_frame]
+        del self.file_stems[self.current_frame]
         self.nb_frames -= 1
+        self.frame_provider.set_file_names(self.file_names)
         self.increase_current_frame(frame_mode=FrameMode.MANUAL, speed=+1)
         self.increase_current_frame(frame_mode=FrameMode.MANUAL, speed=-1)
 
@@ -104,29 +107,100 @@ class State:
         return next(os.walk(DATA_DIR))[1]
 
     def check_raw_videos(self):
-        files = glob.glob(os.path.join(DATA_DIR, "*.mp4"))
-        files.extend(glob.glob(os.path.join(DATA_DIR, "*.mov")))
+        """
+        Starts the extraction of the frames of the new (or partially extracted) raw videos in the background
+        """
+        self.extraction.start()
+        self.video_list = self.find_videos()
 
-        for file in files:
-            base = os.path.basename(file)
-            filename = os.path.splitext(base)[0]
+    def is_extracting(self, video_name=None):
+        return self.extraction.is_extracting(self.current_video if video_name is None else video_name)
 
-            if filename not in self.video_list:
-                print("Extracting video {}...".format(base))
-                utils.convert_video_to_frames(file, os.path.join(DATA_DIR, filename))
-        self.video_list = self.find_videos()
+    def update_extraction(self, video_name):
+        """
+        Called from the GUI thread when frames of a video being extracted are written
+        """
+        if video_name not in self.video_list:
+            self.video_list = self.find_videos()
+
+        if video_name == self.current_video:
+            self.commit_queue.barrier()
+            current_frame = self.current_frame
+            self.update_file_names()
+            self.current_frame = max(min(current_frame, self.nb_frames - 1), 0)
+            self.notify_listeners("on_video_change")
+
+    def stop_extraction(self):
+        self.extraction.stop()
+        if self.pyramids is not None:
+            self.pyramids.close()
 
     def update_file_names(self):
+        if self.manifest is not None:
+            self.manifest.stop()
+            self.manifest = None
+
         if self.current_video:
-            file_names = glob.glob(os.path.join(DATA_DIR, self.current_video, '*.jpg'))
-            file_names.extend(glob.glob(os.path.join(DATA_DIR, self.current_video, '*.png')))
-            self.file_names = sorted(file_names, key = utils.natural_sort_key)
+            self.manifest = load_manifest(os.path.join(DATA_DIR, self.current_video))
+            # The directory of a video being extracted changes until the end of the extraction
+            if not self.manifest.is_complete() and not self.is_extracting():
+                self.manifest.update_async()
+
+            self.file_names = self.manifest.get_paths()
+            self.file_stems = list(self.manifest.stems)
             self.nb_frames = len(self.file_names)
+            self.frame_provider.set_file_names(self.file_names)
+            self.image_size = self.manifest.get_image_size() or (0, 0)
+            if self.pyramids is not None:
+                self.pyramids.set_dir_name(os.path.join(OUTPUT_DIR, self.current_video, "pyramids"))
+
+    def get_image(self, frame=None):
+        """
+        Decoded (BGR, read-only) image of a frame, from the frame provider
+        """
+        return self.frame_provider.get(self.current_frame if frame is None else frame)
+
+    def get_pyramid(self, frame=None):
+        """
+        Tiled pyramid of a frame (see PyramidCache), None if the cache is disabled, the frame is small or its pyramid
+        is not built yet
+        """
+        if self.pyramids is None or not self.nb_frames:
+            return None
+        return self.pyramids.open(self.file_names[self.current_frame if frame is None else frame])
+
+    def request_pyramids(self):
+        """
+        Builds the pyramids of the current frame and of the next one in the background, if they are large
+        """
+        if self.pyramids is None or not self.nb_frames:
+            return
+
+        frames = [self.current_frame, max(min(self.current_frame + self.speed_player, self.nb_frames - 1), 0)]
+        size = self.get_image_size()
+        if size is not None and max(size) >= PYRAMID_MIN_SIZE:
+            self.pyramids.request([self.file_names[frame] for frame in sorted(set(frames), key=frames.index)])
+
+    def get_image_size(self, frame=None):
+        """
+        Size (h, w) of a frame read from the video manifest, without decoding it
+        """
+        if frame is None:
+            frame = self.current_frame
+        if frame >= self.nb_frames:
+            return None
+
+        # The manifest may list other frames if the directory changed (removed frame, background rebuild)
+        if self.manifest is not None and self.manifest.stems[frame:frame + 1] == self.file_stems[frame:frame + 1]:
+            return self.manifest.get_image_size(frame)
+        return read_image_header(self.file_names[frame])
 
     def save_state(self):
         with open(STATE_PATH, 'wb') as f:
             state_dict = {k: v for k, v in self.__dict__.items() if k not in ["listeners", "track_info", "drawing",
-                                                                              "img_viewer", "speed_player"]}
+                                                                              "img_viewer", "speed_player",
+                                                                              "commit_queue", "manifest", "extraction",
+                                                                              "frame_provider", "pyramids"]}
             pickle.dump(state_dict, f)
 
     def load_state(self):
@@ -145,17 +219,24 @@ class State:
         self.check_raw_videos()
 
         if self.current_video not in self.video_list:
-            self.current_video = self.video_list[0] if len(self.video_list) > 0 else None
+            # Prefer a video whose frames are already extracted
+            ready = [video for video in self.video_list if not self.is_extracting(video)]
+            self.current_video = (ready or self.video_list or [None])[0]
             self.current_frame = 0
 
+        if self.current_video is not None:
+            self.extraction.wait_for_frames(self.current_video)
+
         self.update_file_names()
+        if self.track_info is not None:
+            self.track_info.close()
         self.track_info = TrackInfo(self.current_video)
         self.track_info.load_detections(self.get_file_name())
         self.frame_mode = FrameMode.MANUAL
 
     def set_current_frame(self, current_frame, frame_mode=None):
-        self.track_info.save_to_disk()
-        self.track_info.img_size = self.image_size
+        # Display the frame with the edits submitted so far by the workers
+        self.commit_queue.barrier()
 
         self.current_frame = current_frame
 
@@ -164,6 +245,10 @@ class State:
 
         self.track_info.load_detections(self.get_file_name())
 
+        # Decode the next frames while this one is displayed
+        self.frame_provider.prefetch(self.current_frame, self.speed_player)
+        self.request_pyramids()
+
         self.notify_listeners("on_current_frame_change")
 
     def increase_current_frame(self, frame_mode=None, speed=None):
@@ -175,13 +260,17 @@ class State:
 
     def set_current_video(self, video_name):
         if video_name != self.current_video:
-            self.track_info.save_to_disk()
+            self.commit_queue.barrier()
+            if self.track_info is not None:
+                self.track_info.close()
 
             self.current_video = video_name
             self.update_file_names()
             self.current_frame = 0
             self.track_info = TrackInfo(self.current_video)
             self.track_info.load_detections(self.get_file_name())
+            self.frame_provider.prefetch(self.current_frame, self.speed_player)
+            self.request_pyramids()
             self.current_detection = None
             self.frame_mode = FrameMode.MANUAL
 
@@ -193,70 +282,175 @@ class State:
             self.notify_listeners("on_theme_change")
 
     def add_detection(self, detection, frame):
-        self.track_info.add_detection(detection, self.get_file_name(frame))
+        """
+        Adds a detection from a worker thread (tracker), the edit is applied by the commit queue
+        """
+        self.commit_queue.submit(self.track_info.add_detection, detection, self.get_file_name(frame))
 
         if frame == self.current_frame:
             self.current_detection = detection
 
     def set_detections(self, detections, frame):
-        self.track_info.write_detections(self.get_file_name(frame), detections)
+        """
+        Replaces the detections of a frame from a worker thread (detector), the edit is applied by the commit queue
+        """
+        self.commit_queue.submit(self.track_info.write_detections, self.get_file_name(frame), detections)
 
         if frame == self.current_frame:
+            self.commit_queue.barrier()
             self.notify_listeners("on_detection_change")
 
+    def save_to_disk(self):
+        """
+        Applies the pending edits of the workers and waits until all annotations are on disk
+        """
+        self.commit_queue.barrier()
+        self.track_info.save_to_disk()
+
     def remove_detection(self, detection_index=None, detection=None):
+        if detection_index is None and detection is not None:
+            detection_index = self.track_info.detections.index(detection)
+
         if detection_index is not None:
-            self.track_info.detections.pop(detection_index)
-        elif detection is not None:
-            self.track_info.detections.remove(detection)
+            self.track_info.pop_detection(detection_index)
 
         # For UI responsiveness, it's preferable to keep the previous bbox visible rather than having a delay
         # self.notify_listeners("on_detection_change")
     
+    def begin_edit(self):
+        """
+        The edits done until end_edit (removing the detection at the mouse press, adding it back at the release) are
+        undone as one step
+        """
+        self.track_info.begin_step()
+
+    def end_edit(self):
+        self.track_info.end_step()
+
     def remove_detection_and_future(self, detection_index=None, detection=None):
         if detection_index is not None:
             detection = self.track_info.detections[detection_index]
 
         track_id = detection.track_id
 
-        if self.right_click_option == RightClickOption.DELETE_CURRENT:
-            self.track_info.remove_detection(track_id, self.get_file_name())
+        # Undone as one step
+        with self.track_info.step():
+            if self.right_click_option == RightClickOption.DELETE_CURRENT:
+                self.track_info.remove_detection(track_id, self.get_file_name())
 
-        elif self.right_click_option == RightClickOption.DELETE_FOLLOWING:
-            for i in range(self.current_frame, self.nb_frames):
-                if not self.track_info.remove_detection(track_id, self.get_file_name(i)):
-                    break
+            elif self.right_click_option == RightClickOption.DELETE_FOLLOWING:
+                file_names = self.get_track_span(track_id, range(self.current_frame, self.nb_frames))
+                self.track_info.remove_track(track_id, file_names)
 
-        elif self.right_click_option == RightClickOption.DELETE_PREVIOUS:
-            for i in range(self.current_frame, -1, -1):
-                if not self.track_info.remove_detection(track_id, self.get_file_name(i)):
-                    break
+            elif self.right_click_option == RightClickOption.DELETE_PREVIOUS:
+                file_names = self.get_track_span(track_id, range(self.current_frame, -1, -1))
+                self.track_info.remove_track(track_id, file_names)
 
         self.notify_listeners("on_detection_change")
 
     def modify_class_id_and_future(self, detection, class_id):
         track_id = detection.track_id
 
-        for i in range(self.current_frame, self.nb_frames):
-            if not self.track_info.modify_class_id(track_id, class_id, self.get_file_name(i)):
-                break
+        with self.track_info.step():
+            file_names = self.get_track_span(track_id, range(self.current_frame, self.nb_frames))
+            self.track_info.modify_track_class_id(track_id, class_id, file_names)
 
         self.notify_listeners("on_detection_change")
 
-    def check_frames_equal(self, frame1, frame2):
-        frame1 = os.path.split(self.file_names[frame1])[1]
-        frame1 = os.path.splitext(frame1)[0]
-        frame2 = os.path.split(self.file_names[frame2])[1]
-        frame2 = os.path.splitext(frame2)[0]
+    def undo(self):
+        self._apply_history(self.track_info.undo)
+
+    def redo(self):
+        self._apply_history(self.track_info.redo)
+
+    def _apply_history(self, function):
+        """
+        Undoes or redoes the last step, and shows its first frame if the current one was not modified
+        """
+        self.commit_queue.barrier()
+
+        file_names = function()
+        if file_names is None:
+            return
+
+        self.current_detection = None
+        if self.get_file_name() not in file_names:
+            frames = [frame for frame in range(self.nb_frames) if self.get_file_name(frame) in set(file_names)]
+            if frames:
+                self.set_current_frame(frames[0])
+
+        self.notify_listeners("on_detection_change")
+
+    def get_track_span(self, track_id, frames):
+        """
+        Returns the file names of the consecutive frames (iterated from the current one) containing a track
+        """
+        track_frames = self.track_info.get_track_frames(track_id)
 
-        return np.array_equal(self.track_info.get_track_ids(frame1), self.track_info.get_track_ids(frame2))
+        file_names = []
+        for frame in frames:
+            file_name = self.get_file_name(frame)
+            if frame != self.current_frame and file_name not in track_frames:
+                break
+            file_names.append(file_name)
+        return file_names
+
+    def get_frame_signatures(self):
+        signatures = self.track_info.signatures
+        signatures.set_file_paths(self.file_names)
+
+        # The detections of the current frame are edited in place by the views
+        signatures.invalidate(self.get_file_name())
+        return signatures
+
+    def get_aggregates(self):
+        aggregates = self.track_info.aggregates
+        aggregates.set_file_paths(self.file_names)
+
+        # The detections of the current frame are edited in place by the views
+        aggregates.invalidate(self.get_file_name())
+        return aggregates
+
+    def get_statistics(self):
+        """
+        Summary of the annotations of the current video (see Aggregates.get_summary)
+        """
+        with self.track_info.lock:
+            return self.get_aggregates().get_summary()
+
+    def get_track_length(self, track_id):
+        with self.track_info.lock:
+            return self.get_aggregates().get_track_length(track_id)
+
+    def check_frames_equal(self, frame1, frame2):
+        with self.track_info.lock:
+            return self.get_frame_signatures().frames_equal(frame1, frame2)
+
+    def get_next_change(self, frame=None):
+        """
+        First frame after the current one whose track ids differ, None if there is none
+        """
+        with self.track_info.lock:
+            return self.get_frame_signatures().get_next_change(self.current_frame if frame is None else frame)
+
+    def get_previous_change(self, frame=None):
+        """
+        Last frame before the current one whose track ids differ, None if there is none
+        """
+        with self.track_info.lock:
+            return self.get_frame_signatures().get_previous_change(self.current_frame if frame is None else frame)
     
     def set_current_detection(self, detection):
-        self.current_detection = detection
-        self.track_info.add_detection(self.current_detection)
+        # With "copy annotations", detection belongs to the previous frame: the copy in the current frame is edited next
+        self.current_detection = self.track_info.add_detection(detection)
 
         self.notify_listeners("on_detection_change")
 
+    def modify_track_id(self, detection, track_id):
+        if detection in self.track_info.detections:
+            self.track_info.modify_track_id(detection.track_id, track_id)
+        detection.track_id = track_id
+
     def set_keypoints_show_bbox(self, value):
         self.keypoints_show_bbox = value
         self.notify_listeners("on_detection_change")
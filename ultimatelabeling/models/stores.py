@@ -0,0 +1,30 @@
+import os
+from .columnar_store import ColumnarStore
+from .sqlite_store import SqliteStore
+from ultimatelabeling.config import ANNOTATION_BACKEND
+
+
+STORES = {
+    "columnar": ColumnarStore,
+    "sqlite": SqliteStore
+}
+
+
+def get_store_class(backend=None):
+    if backend is None:
+        backend = ANNOTATION_BACKEND
+
+    if backend not in STORES:
+        raise ValueError("Unknown annotation backend: {} (available: {})".format(backend, ", ".join(STORES)))
+    return STORES[backend]
+
+
+def create_store(dir_name, backend=None):
+    """
+    Opens the annotation store of a video directory with the given backend (the configured one by default)
+    """
+    return get_store_class(backend)(dir_name)
+
+
+def store_exists(dir_name, backend=None):
+    return os.path.exists(os.path.join(dir_name, get_store_class(backend).FILE_NAME))
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+class TrackIndex:
+    """
+    Maps each track_id to the frames (and rows) where it appears.
+
+    The committed rows of a ColumnarStore are indexed by a permutation ordering them by (track_id, frame): the rows
+    of a track are contiguous and found with a binary search. This permutation is persisted with the store.
+    Frames overridden since the last commit are indexed incrementally in a dictionary.
+    """
+
+    def __init__(self, frame_names, frames, track_ids, order=None):
+        if order is None:
+            order = np.lexsort((frames, track_ids))
+
+        self.frame_names = frame_names
+        self.frames = frames
+        self.order = np.asarray(order, dtype=np.int64)
+        self.sorted_track_ids = track_ids[self.order]
+
+        self.overlay = {}  # file_name -> set of track_ids, for frames overriding the committed rows
+        self.overlay_tracks = {}  # track_id -> set of file_names
+
+    def get_rows(self, track_id):
+        """
+        Returns the committed rows of a track, sorted by frame
+        """
+        start, end = np.searchsorted(self.sorted_track_ids, [track_id, track_id + 1])
+        return self.order[start:end]
+
+    def get_committed_rows(self, track_id, file_names=None):
+        """
+        Returns the committed rows of a track in frames that are not overridden, optionally restricted to file_names
+        """
+        rows = self.get_rows(track_id)
+        names = [self.frame_names[f] for f in self.frames[rows]]
+        mask = [name not in self.overlay and (file_names is None or name in file_names) for name in names]
+        return rows[np.array(mask, dtype=bool)]
+
+    def get_frames(self, track_id):
+        """
+        Returns the set of file_names containing a track
+        """
+        frames = set(self.frame_names[f] for f in self.frames[self.get_committed_rows(track_id)])
+        frames.update(self.overlay_tracks.get(track_id, ()))
+        return frames
+
+    def set_frame(self, file_name, track_ids):
+        """
+        Incrementally re-indexes a frame overriding the committed rows
+        """
+        for track_id in self.overlay.get(file_name, ()):
+            file_names = self.overlay_tracks[track_id]
+            file_names.discard(file_name)
+            if not file_names:
+                del self.overlay_tracks[track_id]
+
+        track_ids = set(int(t) for t in track_ids)
+        self.overlay[file_name] = track_ids
+        for track_id in track_ids:
+            self.overlay_tracks.setdefault(track_id, set()).add(file_name)
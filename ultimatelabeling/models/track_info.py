@@ -2,77 +2,162 @@ import json
 import os
 import pandas as pd
 import numpy as np
-import time
-from .polygon import Polygon, Bbox, Keypoints
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from .detection_set import Detection, DetectionSet, ragged_to_str, ragged_from_str
+from .stores import create_store
+from .frame_cache import FrameCache
+from .frame_signatures import FrameSignatures
+from .aggregates import Aggregates
+from .history import History, get_edited_track_ids
+from .persistence import PersistenceThread
+from .journal import Journal, JournalOp, apply_edit
+from .locking import synchronized
+from .txt_format import make_detections
 from ultimatelabeling.class_names import DEFAULT_CLASS_NAMES
-from ultimatelabeling.config import OUTPUT_DIR
-from tqdm import tqdm
-
-
-class Detection:
-    def __init__(self, class_id=0, track_id=0, polygon=Polygon(), bbox=Bbox(), keypoints=Keypoints()):
-        self.class_id = class_id
-        self.track_id = track_id
-        self.polygon = polygon
-        self.bbox = bbox
-        self.keypoints = keypoints
-
-    @staticmethod
-    def from_json(data):
-        return Detection(data["class_id"], data["track_id"],
-                         Polygon(data["polygon"]), Bbox(*data["bbox"]), Keypoints(data["keypoints"]))
-
-    def to_json(self):
-        return {
-            "track_id": self.track_id,
-            "class_id": self.class_id,
-            "polygon": self.polygon.to_json(),
-            "bbox": self.bbox.to_json(),
-            "keypoints": self.keypoints.to_json()
-        }
-
-    def to_dict(self):
-        return {"track_id": self.track_id, "class_id": self.class_id, **self.bbox.to_dict(),
-                "polygon": self.polygon.to_str(), "kp": self.keypoints.to_str()}
-
-    @staticmethod
-    def from_df(row):
-        bbox = Bbox(row.x, row.y, row.w, row.h)
-        return Detection(row.class_id, row.track_id, Polygon.from_str(row.polygon), bbox, Keypoints.from_str(row.kp))
-
-    def copy(self):
-        return Detection(self.class_id, self.track_id, self.polygon.copy(), self.bbox.copy(), self.keypoints.copy())
-
-    def __repr__(self):
-        return "Detection(class_id={}, track_id={}, bbox={}, polygon={}, keypoints={})".format(self.class_id, self.track_id,
-                                                                                 self.bbox, self.polygon, self.keypoints)
+from ultimatelabeling.config import OUTPUT_DIR, FRAME_CACHE_SIZE, JOURNAL_COMPACTION_SIZE, HISTORY_MEMORY_SIZE, \
+    HISTORY_SIZE
 
 
 class TrackInfo:
     def __init__(self, video_name=""):
         self.video_name = video_name
-        self.img_size = (0, 0)  # img_size is updated on each set_current_frame() call in state
+
+        # Serializes the accesses of the GUI thread, the commit queue and the Hungarian thread
+        self.lock = threading.RLock()
 
         dir_name = os.path.join(OUTPUT_DIR, self.video_name)
         if not os.path.exists(dir_name):
             os.makedirs(dir_name)
 
-        # Create yolo label directory
-        if self.video_name:
-            yolo_dir_name = os.path.join(OUTPUT_DIR, self.video_name, "yolo_labels")
-            if not os.path.exists(yolo_dir_name):
-                os.makedirs(yolo_dir_name)
-
         self.nb_track_ids = 0
         self.class_names = DEFAULT_CLASS_NAMES
         self.load_info()
 
+        self.store = create_store(dir_name)
+        if self.video_name and not self.store.exists() and self.store.import_txt() > 0:
+            # Migrate the legacy one-file-per-frame layout into the annotation store
+            self.store.commit()
+
+        # Decoded frames are kept in memory and only written back to the store on eviction or flush
+        self.cache = FrameCache(self.store.get_frame, self.write_back, max_size=FRAME_CACHE_SIZE)
+
+        # Disk writes are done in the background
+        self.persistence = PersistenceThread(self.store)
+
         self.file_name = None
-        self.detections = []
+        self.detections = DetectionSet()
+
+        # Track id signatures of the frames, for jumping to the next change
+        self.signatures = FrameSignatures(self.get_track_ids)
+
+        # Statistics of the annotations (class counts, track lengths, density), updated with the edited frames
+        self.aggregates = Aggregates(self.get_columns, self.get_ids)
+
+        # Edits are recorded as deltas for undo / redo
+        self.history = History(HISTORY_MEMORY_SIZE, HISTORY_SIZE)
+
+        # Every edit is appended to the journal, which is compacted into the store on flush
+        self.journal = Journal(dir_name)
+        self.replay_journal()
 
     def save_to_disk(self):
+        """
+        Flushes all modifications and waits until they are on disk
+        """
+        self.flush()
+        self.barrier()
+
+    @synchronized
+    def flush(self):
+        """
+        Writes back every modified frame and schedules the commit of the store and info.json, without waiting
+        """
         self.write_info()
-        self.write_detections(self.file_name)
+        self.mark_dirty()
+        self.cache.flush()
+
+        # All journaled edits are now in the store: the journal segments can be dropped once it is committed
+        segment = self.journal.rotate()
+        self.persistence.request_commit(lambda: self.journal.remove_segments(before=segment))
+
+    def barrier(self, timeout=None):
+        """
+        Waits until every modification flushed so far is on disk
+        """
+        return self.persistence.barrier(timeout)
+
+    @synchronized
+    def close(self):
+        """
+        Flushes all modifications, the background writer stops once they are on disk
+        """
+        self.flush()
+        self.journal.close()
+        self.persistence.close()
+        self.history.close()
+
+    def replay_journal(self):
+        """
+        Applies the edits of the journal which were not committed to the store (e.g. after a crash)
+        """
+        frames = {}
+        removed = set()
+        for op, file_name, args in self.journal.replay():
+            if file_name not in frames:
+                frames[file_name] = self.store.get_frame(file_name)
+            apply_edit(frames[file_name], op, *args)
+
+            if op == JournalOp.REMOVE_FRAME:
+                removed.add(file_name)
+            else:
+                removed.discard(file_name)
+
+        if not frames:
+            return
+
+        print("Recovered edits of {} frames from the journal".format(len(frames)))
+        self.store.set_frames(frames)
+        for file_name in removed:
+            self.store.remove_frame(file_name)
+        for detections in frames.values():
+            self.nb_track_ids = max(self.nb_track_ids, max([d.track_id for d in detections] or [0]) + 1)
+        self.flush()
+
+    @synchronized
+    def edit(self, file_name, op, *args):
+        """
+        Journals an edit operation and applies it on the detections of a frame
+        """
+        if file_name is not None:
+            self.journal.append(op, file_name, *args)
+
+        detections = self.detections if file_name == self.file_name else self.cache.get(file_name)
+        track_ids, before = get_edited_track_ids(detections, op, *args), detections.copy()
+        result = apply_edit(detections, op, *args)
+        if file_name is not None:
+            self.history.record(file_name, track_ids, before, detections)
+        self.mark_dirty(file_name)
+
+        self.compact_if_needed()
+        return result
+
+    def compact_if_needed(self):
+        if self.journal.nb_records >= JOURNAL_COMPACTION_SIZE:
+            self.flush()
+
+    @synchronized
+    def write_back(self, file_name, detections):
+        # The whole frame is journaled: the edits before it which are not idempotent (ADD, DELETE_INDEX) can be
+        # replayed over a store committed after this write, the frame is then set back to the written detections
+        self.journal.append(JournalOp.SET_FRAME, file_name, detections)
+        # YOLO labels are generated by the export stage (see yolo_export.py), not on every write
+        self.store.set_frame(file_name, detections)
+
+    @synchronized
+    def get_cache_stats(self):
+        return {**self.cache.get_stats(), **self.persistence.get_stats()}
 
     def load_info(self):
         json_file = os.path.join(OUTPUT_DIR, "{}/info.json".format(self.video_name))
@@ -85,85 +170,196 @@ class TrackInfo:
             self.nb_track_ids = data["nb_track_ids"]
             self.class_names = {int(k): v for k, v in json.loads(data["class_names"]).items()}
 
-    @staticmethod
-    def df_from_csv(file_name):
-        if not os.path.exists(file_name):
-            return pd.DataFrame(columns=["track_id", "class_id", "x", "y", "w", "h", "polygon", "kp"])
+    @synchronized
+    def get_columns(self, file_names):
+        """
+        Columns of the detections of all the given frames ("frame" being the index in file_names), see
+        ColumnarStore.get_columns
+        """
+        self.cache.flush()
+        return self.store.get_columns(file_names)
 
-        return pd.read_csv(file_name, header=None, names=["track_id", "class_id", "x", "y", "w", "h", "polygon", "kp"],
-                           na_filter=False, sep=" ")
+    @synchronized
+    def get_ids(self, file_name):
+        """
+        Track ids and class ids of the detections of a frame, without loading it in the cache
+        """
+        detections = self.peek_detections(file_name)
+        return detections.track_ids, detections.class_ids
 
-    @staticmethod
-    def df_to_csv(df, file_name):
-        df.to_csv(file_name, index=None, header=False, sep=" ")
+    @synchronized
+    def peek_detections(self, file_name):
+        """
+        Detections of a frame, without loading it in the cache (not to be modified)
+        """
+        if file_name == self.file_name:
+            return self.detections
 
-    @staticmethod
-    def df_add_detection(df, detection: Detection):
-        return df.append(detection.to_dict(), ignore_index=True)
+        entry = self.cache.entries.get(file_name)
+        return entry.detections if entry is not None else self.store.get_frame(file_name)
 
+    @synchronized
     def to_df(self, file_names):
-        df = pd.DataFrame(columns=["frame", "class_id", "track_id", "xc", "yc", "w", "h", "infer", "polygon", "kp"])
+        """
+        DataFrame of the detections of all the given frames, "frame" being the index of the frame in file_names.
+        Built from the columns of the whole video at once.
+        """
+        c = self.get_columns(file_names)
+
+        return pd.DataFrame({
+            "frame": c["frame"].astype(int),
+            "class_id": c["class_id"].astype(int),
+            "track_id": c["track_id"].astype(int),
+            "xc": c["x"] + c["w"] / 2,
+            "yc": c["y"] + c["h"] / 2,
+            "w": c["w"],
+            "h": c["h"],
+            "infer": 0,
+            "polygon": ragged_to_str(c["polygon_offsets"], c["polygon_data"]),
+            "kp": ragged_to_str(c["kp_offsets"], c["kp_data"])
+        }, columns=["frame", "class_id", "track_id", "xc", "yc", "w", "h", "infer", "polygon", "kp"])
+
+    @synchronized
+    def from_df_all(self, df, file_names, workers=None):
+        """
+        Replaces the detections of all the given frames by the rows of df ("frame" being the index in file_names).
+        The rows are split by frame in a single pass, the frames are built in a thread pool if workers is given.
+        """
+        file_names = list(file_names)  # may be a generator (State.get_file_names)
+        frames = df.frame.values.astype(int)
+        order = np.argsort(frames, kind="stable")
+        bounds = np.searchsorted(frames[order], np.arange(len(file_names) + 1))
+
+        w, h = df.w.values.astype(float)[order], df.h.values.astype(float)[order]
+        boxes = np.stack([df.xc.values.astype(float)[order] - w / 2, df.yc.values.astype(float)[order] - h / 2,
+                          w, h], axis=1)
+        track_ids = df.track_id.values.astype(int)[order]
+        class_ids = df.class_id.values.astype(int)[order]
+        # Rows added by the tracker (interpolated boxes) have no polygon nor keypoints
+        polygons = df.polygon.fillna("").values[order] if "polygon" in df else [""] * len(df)
+        keypoints = df.kp.fillna("").values[order] if "kp" in df else [""] * len(df)
+
+        def build_frame(i):
+            start, end = bounds[i], bounds[i + 1]
+            return DetectionSet.from_arrays(track_ids[start:end], class_ids[start:end], boxes[start:end],
+                                            *ragged_from_str(polygons[start:end]),
+                                            *ragged_from_str(keypoints[start:end]))
+
+        if workers:
+            with ThreadPoolExecutor(workers) as pool:
+                detection_sets = list(pool.map(build_frame, range(len(file_names))))
+        else:
+            detection_sets = [build_frame(i) for i in range(len(file_names))]
 
-        for i, file_name in enumerate(file_names):
-            txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
-            if not os.path.exists(txt_file):
-                continue
+        self.set_frames(dict(zip(file_names, detection_sets)))
+        self.flush()
 
-            df_frame = self.df_from_csv(txt_file)
-            df_frame["frame"] = i
-            df_frame["xc"] = df_frame["x"] + df_frame["w"] / 2
-            df_frame["yc"] = df_frame["y"] + df_frame["h"] / 2
-            df_frame["infer"] = 0
+    @synchronized
+    def write_from_df(self, df, file_name):
+        self.set_frame(file_name, self.detections_from_df(df))
+        self.compact_if_needed()
 
-            df_frame = df_frame[["frame", "class_id", "track_id", "xc", "yc", "w", "h", "infer", "polygon", "kp"]]
-            df = df.append(df_frame, ignore_index=True)
-        return df
+    @staticmethod
+    def detections_to_df(detections):
+        return pd.DataFrame([d.to_dict() for d in detections],
+                            columns=["track_id", "class_id", "x", "y", "w", "h", "polygon", "kp"])
 
-    def from_df_all(self, df, file_names):
-        df["x"] = df.xc - df.w / 2
-        df["y"] = df.yc - df.h / 2
+    @staticmethod
+    def detections_from_df(df):
+        return make_detections(df.track_id.values, df.class_id.values, df[["x", "y", "w", "h"]].values,
+                               df.polygon.values, df.kp.values)
 
-        df[["class_id", "track_id"]] = df[["class_id", "track_id"]].astype(int)
-        df[["x", "y", "w", "h"]] = df[["x", "y", "w", "h"]].astype(float)
+    @synchronized
+    def get_detections(self, file_name):
+        return self.cache.get(file_name)
 
-        for i, file_name in enumerate(file_names):
-            txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
+    @synchronized
+    def get_track_ids(self, file_name):
+        if file_name in self.cache:
+            return np.sort(self.cache.get(file_name).track_ids).astype(int)
 
-            df_frame = df[df.frame == i]
-            df_frame = df_frame[["track_id", "class_id", "x", "y", "w", "h", "polygon", "kp"]]
-            self.df_to_csv(df_frame, txt_file)
+        return self.store.get_track_ids(file_name)
 
-        # Update current detections
-        self.detections = self.get_detections(self.file_name)
+    @synchronized
+    def load_detections(self, file_name):
+        if self.file_name is not None and self.file_name != file_name:
+            # The displayed frame is edited in place by the views, conservatively consider it modified.
+            # Unchanged frames are discarded by the store on write-back.
+            self.cache.mark_dirty(self.file_name)
 
-    def write_from_df(self, df, file_name):
-        txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
-        self.df_to_csv(df, txt_file)
+        self.file_name = file_name
+        self.cache.pinned = file_name
+        self.detections = self.get_detections(file_name)
 
-        # Update current detections
+    @synchronized
+    def set_frame(self, file_name, detections):
+        """
+        Replaces the detections of a frame directly in the store, bypassing the cache
+        """
+        self.history.record(file_name, None, self.peek_detections(file_name), detections)
+        self.journal.append(JournalOp.SET_FRAME, file_name, detections)
+        self.store.set_frame(file_name, detections)
+        self.discard([file_name])
+        self.invalidate(file_name)
+
+    @synchronized
+    def set_frames(self, frames, journal=True):
+        """
+        Replaces the detections of several frames (dictionary file_name -> detections) with a single journal write,
+        undone as one step. Bulk imports skip the journal and the history (journal=False) and flush once done.
+        """
+        if journal:
+            with self.history.step():
+                for file_name, detections in frames.items():
+                    self.history.record(file_name, None, self.peek_detections(file_name), detections)
+
+            self.journal.append_batch([(JournalOp.SET_FRAME, file_name, (detections,))
+                                       for file_name, detections in frames.items()])
+        self.store.set_frames(frames)
+        self.discard(frames)
+        self.invalidate(frames)
+
+    @synchronized
+    def remove_frame(self, file_name):
+        """
+        Deletes a frame removed from the video. It is not undoable and is not the current frame anymore.
+        """
         if file_name == self.file_name:
-            self.detections = self.get_detections(self.file_name)
+            self.file_name = None
+            self.cache.pinned = None
+            self.detections = DetectionSet()
 
-    def get_detections(self, file_name):
-        txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
+        self.journal.append(JournalOp.REMOVE_FRAME, file_name)
+        self.store.remove_frame(file_name)
+        self.cache.discard(file_name)
+        self.invalidate(file_name)
 
-        if not os.path.exists(txt_file):
-            return []
-        df = self.df_from_csv(txt_file)
-        return [Detection.from_df(row) for _, row in df.iterrows()]
+    def discard(self, file_names):
+        """
+        Drops the cached frames overwritten in the store, the current frame is reloaded
+        """
+        for file_name in file_names:
+            self.cache.discard(file_name)
 
-    def get_track_ids(self, file_name):
-        txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
+        if self.file_name in file_names:
+            self.detections = self.get_detections(self.file_name)
 
-        if not os.path.exists(txt_file):
-            return []
-            
-        return np.sort(pd.read_csv(txt_file, header=None, usecols=[0], sep=" ").values.flatten())
+    @synchronized
+    def mark_dirty(self, file_name=None):
+        if file_name is None:
+            file_name = self.file_name
 
-    def load_detections(self, file_name):
-        self.file_name = file_name
-        self.detections = self.get_detections(file_name)
+        self.cache.mark_dirty(file_name)
+        self.invalidate(file_name)
 
+    def invalidate(self, file_names):
+        """
+        Marks frames as modified for the track id signatures and the aggregates
+        """
+        self.signatures.invalidate(file_names)
+        self.aggregates.invalidate(file_names)
+
+    @synchronized
     def write_info(self):
         json_file = os.path.join(OUTPUT_DIR, "{}/info.json".format(self.video_name))
 
@@ -173,77 +369,198 @@ class TrackInfo:
             "class_names": json.dumps(self.class_names)
         }
 
-        with open(json_file, "w") as f:
-            json.dump(data, f)
+        self.persistence.submit(json_file, lambda: json.dumps(data))
 
+    @synchronized
     def write_detections(self, file_name, detections=None):
-        txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
+        if file_name is None:
+            return
 
         if detections is None:
             detections = self.detections
+        elif not isinstance(detections, DetectionSet):
+            detections = DetectionSet(detections)
+
+        self.history.record(file_name, None, self.peek_detections(file_name), detections)
 
         if file_name == self.file_name:
             self.detections = detections
 
-        df = pd.DataFrame(columns=["track_id", "class_id", "x", "y", "w", "h", "polygon", "kp"])
-        if len(detections) > 0:
-            df = df.append([d.to_dict() for d in detections], ignore_index=True)
-        self.df_to_csv(df, txt_file)
-
-        if self.img_size != (0, 0):
-            # Save labels in yolo format
-            h, w = self.img_size
-            df_yolo = df[["class_id", "x", "y", "w", "h"]].copy()
-            df_yolo[["x", "w"]] = df_yolo[["x", "w"]].copy().div(w)
-            df_yolo[["y", "h"]] = df_yolo[["y", "h"]].copy().div(h)
-            yolo_txt_file = os.path.join(OUTPUT_DIR, "{}/yolo_labels/{}.txt".format(self.video_name, file_name))
-            self.df_to_csv(df_yolo, yolo_txt_file)
+        self.journal.append(JournalOp.SET_FRAME, file_name, detections)
+        self.cache.put(file_name, detections)
+        self.invalidate(file_name)
+        self.compact_if_needed()
 
         self.nb_track_ids = max(self.nb_track_ids, max([d.track_id for d in detections] or [0]) + 1)
 
+    @synchronized
     def add_detection(self, detection: Detection, file_name=None):
+        """
+        Adds a detection to a frame (the current one by default). Returns the detection as stored in the frame: a
+        detection of another frame is copied, the argument stays bound to that frame.
+        """
         if file_name is None or file_name == self.file_name:
-            self.detections.append(detection)
+            added = self.edit(self.file_name, JournalOp.ADD, detection)
         else:
-            txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
-            track_id = detection.track_id
-
-            df = self.df_from_csv(txt_file)
-            count = (df.track_id == track_id).sum()
-            if count > 0:
-                df[df.track_id == track_id] = detection.to_dict().values()
-                self.df_to_csv(df, txt_file)
-            else:
-                self.df_to_csv(self.df_add_detection(df, detection), txt_file)
+            added = self.edit(file_name, JournalOp.UPDATE, detection)
 
-        self.nb_track_ids = max(self.nb_track_ids, detection.track_id + 1)
+        self.nb_track_ids = max(self.nb_track_ids, added.track_id + 1)
+        return added
 
+    @synchronized
     def remove_detection(self, track_id, file_name):
         """
         Removes detections with specific track_id from detections file
         Returns true if at least one detection was deleted
         """
         if file_name == self.file_name:
-            self.detections = [d for d in self.detections if d.track_id != track_id]
+            self.edit(file_name, JournalOp.DELETE, track_id)
             return True
 
-        txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
-
-        if not os.path.exists(txt_file):
+        if file_name not in self.cache and not self.store.has_frame(file_name):
             return False
 
-        df = self.df_from_csv(txt_file)
-
-        count = (df.track_id == track_id).sum()
-        if count == 0:
+        if not any(d.track_id == track_id for d in self.cache.get(file_name)):
             return False
 
-        self.df_to_csv(df[df.track_id != track_id], txt_file)
+        self.edit(file_name, JournalOp.DELETE, track_id)
         return True
 
+    @synchronized
+    def pop_detection(self, index):
+        """
+        Removes the detection at a given index of the current frame and returns it
+        """
+        return self.edit(self.file_name, JournalOp.DELETE_INDEX, index)
+
+    @synchronized
+    def get_track_frames(self, track_id):
+        """
+        Returns the set of file_names in which a track appears, using the track index of the store and the cached frames
+        """
+        frames = self.store.get_track_frames(track_id)
+
+        for file_name, entry in self.cache.entries.items():
+            if any(d.track_id == track_id for d in entry.detections):
+                frames.add(file_name)
+            else:
+                frames.discard(file_name)
+
+        return frames
+
+    @synchronized
+    def remove_track(self, track_id, file_names):
+        """
+        Removes detections with specific track_id from several frames in one batch
+        """
+        file_names = set(file_names)
+        cached = file_names & set(self.cache.entries)
+
+        self.record_track_edit(file_names, JournalOp.DELETE, track_id)
+        self.journal.append_batch([(JournalOp.DELETE, file_name, (track_id,)) for file_name in file_names])
+
+        for file_name in cached:
+            apply_edit(self.cache.get(file_name), JournalOp.DELETE, track_id)
+            self.mark_dirty(file_name)
+
+        self.store.remove_track(track_id, file_names - cached)
+        self.invalidate(file_names)
+        self.compact_if_needed()
+
+    @synchronized
+    def modify_track_class_id(self, track_id, class_id, file_names):
+        """
+        Modifies class id of detections with specific track_id in several frames in one batch
+        """
+        file_names = set(file_names)
+        cached = file_names & set(self.cache.entries)
+
+        self.record_track_edit(file_names, JournalOp.SET_CLASS, track_id, class_id)
+        self.journal.append_batch([(JournalOp.SET_CLASS, file_name, (track_id, class_id)) for file_name in file_names])
+
+        for file_name in cached:
+            apply_edit(self.cache.get(file_name), JournalOp.SET_CLASS, track_id, class_id)
+            self.mark_dirty(file_name)
+
+        self.store.modify_track_class_id(track_id, class_id, file_names - cached)
+        self.aggregates.invalidate(file_names)
+        self.compact_if_needed()
+
+    def record_track_edit(self, file_names, op, track_id, *args):
+        """
+        Records an edit of a track in several frames as one undo step
+        """
+        if self.history.paused:
+            return
+
+        with self.history.step():
+            for file_name in file_names:
+                before = self.peek_detections(file_name)
+                after = before.copy()
+                apply_edit(after, op, track_id, *args)
+                self.history.record(file_name, [track_id], before, after)
+
+    @contextmanager
+    def step(self):
+        """
+        Groups the edits done in the block into one undo step
+        """
+        with self.lock, self.history.step():
+            yield
+
+    @synchronized
+    def begin_step(self):
+        """
+        Starts an undo step which is ended by end_step, for edits done across several calls (a mouse gesture)
+        """
+        self.history.begin()
+
+    @synchronized
+    def end_step(self):
+        if self.history.depth > 0:  # not ended if the video changed during the gesture
+            self.history.end()
+
+    @synchronized
+    def undo(self):
+        """
+        Undoes the last step. Returns the file names of the modified frames, None if there is nothing to undo.
+        """
+        change = self.history.pop_undo()
+        if change is None:
+            return None
+
+        self.apply_change(change, undo=True)
+        self.history.push_redo(change)
+        return change.get_file_names()
+
+    @synchronized
+    def redo(self):
+        """
+        Redoes the last undone step. Returns the file names of the modified frames, None if there is nothing to redo.
+        """
+        change = self.history.pop_redo()
+        if change is None:
+            return None
+
+        self.apply_change(change, undo=False)
+        self.history.push_undo(change)
+        return change.get_file_names()
+
+    def apply_change(self, change, undo):
+        frames = {}
+        for delta in (reversed(change.deltas) if undo else change.deltas):
+            detections = frames[delta.file_name] if delta.file_name in frames else \
+                self.peek_detections(delta.file_name)
+            frames[delta.file_name] = delta.apply(detections, undo)
+
+        with self.history.pause():
+            self.set_frames(frames)
+        self.compact_if_needed()
+
     def get_min_available_track_id(self):
         return self.nb_track_ids
 
+    @synchronized
     def modify_class_id(self, track_id, class_id, file_name):
         """
         Modifies class id with specific track_id from detections file
@@ -251,23 +568,25 @@ class TrackInfo:
         """
 
         if file_name == self.file_name:
-            for d in self.detections:
-                if d.track_id == track_id:
-                    d.class_id = class_id
+            self.edit(file_name, JournalOp.SET_CLASS, track_id, class_id)
             return True
 
-        txt_file = os.path.join(OUTPUT_DIR, "{}/{}.txt".format(self.video_name, file_name))
-
-        if not os.path.exists(txt_file):
+        if file_name not in self.cache and not self.store.has_frame(file_name):
             return False
 
-        df = self.df_from_csv(txt_file)
-
-        count = (df.track_id == track_id).sum()
-        if count == 0:
+        if not any(d.track_id == track_id for d in self.cache.get(file_name)):
             return False
 
-        df.loc[df.track_id == track_id, "class_id"] = class_id
-
-        self.df_to_csv(df, txt_file)
+        self.edit(file_name, JournalOp.SET_CLASS, track_id, class_id)
         return True
+
+    @synchronized
+    def modify_track_id(self, track_id, new_track_id, file_name=None):
+        """
+        Changes the track id of detections with specific track_id in a frame (the current one by default)
+        """
+        if file_name is None:
+            file_name = self.file_name
+
+        self.edit(file_name, JournalOp.SET_TRACK_ID, track_id, new_track_id)
+        self.nb_track_ids = max(self.nb_track_ids, new_track_id + 1)
@@ -49,7 +49,7 @@ class SiamMaskTracker(Tracker):
 
     def init(self, image_path, bbox):
         img = cv2.imread(image_path)
-        self.state = siamese_init(img, bbox.center, bbox.size, self.tracker, self.cfg['hp'], use_cuda=self.use_cuda)
+        self.state = siamese_init(img, bbox.center.copy(), bbox.size.copy(), self.tracker, self.cfg['hp'], use_cuda=self.use_cuda)
 
     def track(self, image_path):
         img = cv2.imread(image_path)
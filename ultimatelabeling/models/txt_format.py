@@ -0,0 +1,173 @@
+import csv
+import glob
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .polygon import Polygon, Bbox, Keypoints
+from .detection_set import Detection, DetectionSet
+
+
+"""
+Reader and writer of the space-separated txt format of the annotations (one <frame>.txt file per frame):
+
+    track_id class_id x y w h "polygon coords" "keypoints coords"
+
+The output is identical to the pandas path (DataFrame.to_csv of TrackInfo.detections_to_df), without building
+a DataFrame: numeric columns are parsed in one shot and the polygon / keypoints fields are only parsed when accessed.
+"""
+
+COLUMNS = ["track_id", "class_id", "x", "y", "w", "h", "polygon", "kp"]
+
+
+def format_float(x):
+    # Same representation as pandas (shortest repr, NaN written as an empty field)
+    return "" if math.isnan(x) else repr(x)
+
+
+def quote(s):
+    # Minimal quoting of the csv module, fields are separated by spaces
+    if " " in s or '"' in s or "\n" in s or "\r" in s:
+        return '"{}"'.format(s.replace('"', '""'))
+    return s
+
+
+def make_detections(track_ids, class_ids, boxes, polygons, keypoints):
+    """
+    Builds Detection objects from columns, polygons and keypoints are lists of coordinates (or strings)
+    """
+    detections = []
+    for track_id, class_id, (x, y, w, h), polygon, kp in zip(track_ids, class_ids, boxes, polygons, keypoints):
+        if isinstance(polygon, str):
+            polygon = polygon.split()
+        if isinstance(kp, str):
+            kp = kp.split()
+        detections.append(Detection(int(class_id), int(track_id), Polygon(polygon), Bbox(x, y, w, h), Keypoints(kp)))
+    return detections
+
+
+class TxtFrame:
+    """
+    Detections of one frame in the txt format, stored as columns
+    """
+
+    def __init__(self, track_ids, class_ids, boxes, tails):
+        self.track_ids = track_ids
+        self.class_ids = class_ids
+        self.boxes = boxes  # N x 4 array of x, y, w, h
+        self.tails = tails  # raw polygon and keypoints fields of each line
+        self._polygons = None
+        self._keypoints = None
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    @staticmethod
+    def parse(text):
+        lines = [line.rstrip("\r") for line in text.split("\n")]
+        rows = [line.split(" ", 6) for line in lines if line]
+
+        if not rows:
+            return TxtFrame(np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros((0, 4)), [])
+
+        numbers = np.array(" ".join(" ".join(row[:6]) for row in rows).split(), dtype=float).reshape(-1, 6)
+        tails = [row[6] if len(row) > 6 else "" for row in rows]
+
+        return TxtFrame(numbers[:, 0].astype(int), numbers[:, 1].astype(int), numbers[:, 2:], tails)
+
+    def _parse_tails(self):
+        self._polygons, self._keypoints = [], []
+
+        for tail in self.tails:
+            if not tail.strip():
+                polygon, kp = "", ""
+            else:
+                fields = next(csv.reader([tail], delimiter=" "))
+                polygon, kp = (fields + ["", ""])[:2]
+
+            self._polygons.append(np.array(polygon.split(), dtype=float))
+            self._keypoints.append(np.array(kp.split(), dtype=float))
+
+    @property
+    def polygons(self):
+        if self._polygons is None:
+            self._parse_tails()
+        return self._polygons
+
+    @property
+    def keypoints(self):
+        if self._keypoints is None:
+            self._parse_tails()
+        return self._keypoints
+
+    def to_detections(self):
+        polygons, keypoints = self.polygons, self.keypoints
+        return DetectionSet.from_arrays(
+            self.track_ids, self.class_ids, self.boxes,
+            np.concatenate([[0], np.cumsum([len(p) for p in polygons])]), np.concatenate([np.zeros(0)] + polygons),
+            np.concatenate([[0], np.cumsum([len(k) for k in keypoints])]), np.concatenate([np.zeros(0)] + keypoints))
+
+
+def read_txt(file_name):
+    with open(file_name, "r") as f:
+        return TxtFrame.parse(f.read())
+
+
+def format_txt(detections):
+    lines = []
+    for d in detections:
+        x, y, w, h = d.bbox.xywh.tolist()
+        lines.append(" ".join([str(d.track_id), str(d.class_id), format_float(x), format_float(y), format_float(w),
+                               format_float(h), quote(d.polygon.to_str()), quote(d.keypoints.to_str())]))
+    return "".join(line + "\n" for line in lines)
+
+
+def write_txt(file_name, detections):
+    with open(file_name, "w") as f:
+        f.write(format_txt(detections))
+
+
+def import_txt(store, dir_name, workers=None):
+    """
+    Imports the legacy layout (one <frame>.txt file per frame) into the overlay of a store (ColumnarStore or
+    SqliteStore). Returns the number of imported frames.
+    """
+    txt_files = glob.glob(os.path.join(dir_name, "*.txt"))
+
+    # Reading is I/O bound, the files are read in parallel
+    with ThreadPoolExecutor(workers) as pool:
+        for txt_file, frame in zip(txt_files, pool.map(read_txt, txt_files)):
+            file_name = os.path.splitext(os.path.basename(txt_file))[0]
+            store.set_frame(file_name, frame.to_detections())
+
+    return len(txt_files)
+
+
+def export_txt(store, dir_name):
+    """
+    Exports every annotated frame of a store to the legacy layout (one <frame>.txt file per frame)
+    """
+    if not os.path.exists(dir_name):
+        os.makedirs(dir_name)
+
+    for file_name in store.get_file_names():
+        write_txt(os.path.join(dir_name, "{}.txt".format(file_name)), store.get_frame(file_name))
+
+
+def format_yolo(detections, img_size):
+    """
+    YOLO labels: class_id and bbox relative to the image size
+    """
+    if not detections:
+        return ""
+
+    h, w = img_size
+    if isinstance(detections, DetectionSet):
+        boxes = detections.boxes
+    else:
+        boxes = np.array([d.bbox.xywh for d in detections], dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        boxes = boxes / np.array([w, h, w, h], dtype=float)
+
+    return "".join("{} {}\n".format(d.class_id, " ".join(format_float(v) for v in box))
+                   for d, box in zip(detections, boxes.tolist()))
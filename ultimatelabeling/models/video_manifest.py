@@ -0,0 +1,238 @@
+import json
+import os
+import struct
+import threading
+import time
+from ultimatelabeling import utils
+from .persistence import write_file
+
+IMAGE_EXTENSIONS = (".jpg", ".png")
+MANIFEST_SUFFIX = ".manifest.json"
+
+# A manifest is not saved if the directory changed less than this many seconds ago: on file systems with a coarse
+# mtime resolution, a frame added in the same tick would not invalidate it
+MTIME_RESOLUTION = 2
+
+
+def read_image_header(image_path):
+    """
+    Size (h, w) of a jpg or png image read from its header, without decoding the image. None if it can't be read.
+    """
+    try:
+        with open(image_path, "rb") as f:
+            head = f.read(24)
+            if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+                w, h = struct.unpack(">II", head[16:24])
+                return h, w
+            if head.startswith(b"\xff\xd8"):
+                f.seek(2)
+                return _read_jpeg_size(f)
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def _read_jpeg_size(f):
+    """
+    Walks the jpeg markers up to the start of frame segment
+    """
+    while True:
+        byte = f.read(1)
+        if byte != b"\xff":
+            return None
+
+        marker = byte
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            return None
+
+        m = marker[0]
+        if m == 0x01 or 0xD0 <= m <= 0xD8:  # markers without payload
+            continue
+
+        length, = struct.unpack(">H", f.read(2))
+        if 0xC0 <= m <= 0xCF and m not in (0xC4, 0xC8, 0xCC):
+            h, w = struct.unpack(">xHH", f.read(5))
+            return h, w
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def sort_image_names(names):
+    """
+    Sorts image names in natural order. Numbered frames (the common case) are sorted without the regex key.
+    """
+    splits = [os.path.splitext(name) for name in names]
+    if all(stem.isdigit() for stem, _ in splits):
+        order = sorted(range(len(names)), key=lambda i: (int(splits[i][0]), splits[i][1].lower()))
+        return [names[i] for i in order]
+    return sorted(names, key=utils.natural_sort_key)
+
+
+class VideoManifest:
+    """
+    Cached listing of the frames of a video: image names in natural order, frame stems, file sizes and image sizes
+    read from the image headers.
+
+    The manifest is saved next to the frame directory and is valid as long as the modification time of the directory
+    is unchanged, so that switching to a video costs a stat of its directory instead of a listing and a sort of all
+    its frames. A missing or outdated manifest is replaced by a quick listing of the names (scan), the file and image
+    sizes being read by a background thread (update_async) which saves the manifest.
+    """
+
+    VERSION = 1
+
+    def __init__(self, dir_name, path=None):
+        self.dir_name = dir_name
+        self.path = path or os.path.normpath(dir_name) + MANIFEST_SUFFIX
+
+        self.mtime_ns = None
+        self.names = []
+        self.stems = []
+        self.file_sizes = None  # None until the manifest is built
+        self.heights = None
+        self.widths = None
+
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def __len__(self):
+        return len(self.names)
+
+    def is_complete(self):
+        return self.file_sizes is not None
+
+    def get_mtime_ns(self):
+        try:
+            return os.stat(self.dir_name).st_mtime_ns
+        except OSError:
+            return None
+
+    def get_paths(self):
+        return [os.path.join(self.dir_name, name) for name in self.names]
+
+    def get_image_size(self, frame=0):
+        """
+        Size (h, w) of a frame, read from its header if the manifest is not built yet. None if unknown.
+        """
+        if frame >= len(self.names):
+            return None
+        if self.heights is not None and self.heights[frame] > 0:
+            return self.heights[frame], self.widths[frame]
+        return read_image_header(os.path.join(self.dir_name, self.names[frame]))
+
+    def scan_names(self):
+        with os.scandir(self.dir_name) as entries:
+            return sort_image_names([entry.name for entry in entries
+                                     if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()])
+
+    def set_names(self, names):
+        self.names = names
+        self.stems = [os.path.splitext(name)[0] for name in names]
+
+    def scan(self):
+        """
+        Lists the frames of the directory, without the file and image sizes
+        """
+        self.mtime_ns = None
+        self.file_sizes = self.heights = self.widths = None
+        self.set_names(self.scan_names() if os.path.isdir(self.dir_name) else [])
+
+    def build(self):
+        """
+        Lists the frames with their file and image sizes. Returns False if stopped (see stop) before the end.
+        """
+        mtime_ns = self.get_mtime_ns()  # before listing: a frame added meanwhile invalidates the manifest
+        names = self.scan_names()
+
+        file_sizes, heights, widths = [], [], []
+        for name in names:
+            if self.stopping.is_set():
+                return False
+
+            path = os.path.join(self.dir_name, name)
+            size = read_image_header(path) or (0, 0)
+            try:
+                file_sizes.append(os.stat(path).st_size)
+            except OSError:
+                file_sizes.append(0)
+            heights.append(size[0])
+            widths.append(size[1])
+
+        self.set_names(names)
+        self.heights, self.widths, self.file_sizes = heights, widths, file_sizes
+        self.mtime_ns = mtime_ns
+        return True
+
+    def load(self):
+        """
+        Loads the saved manifest, returns False if there is none or if the directory changed since it was saved
+        """
+        mtime_ns = self.get_mtime_ns()
+        if mtime_ns is None or not os.path.exists(self.path):
+            return False
+
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if data.get("version") != self.VERSION or data.get("mtime_ns") != mtime_ns:
+            return False
+
+        self.mtime_ns = mtime_ns
+        self.names, self.stems = data["names"], data["stems"]
+        self.file_sizes, self.heights, self.widths = data["file_sizes"], data["heights"], data["widths"]
+        return True
+
+    def save(self):
+        """
+        Saves the built manifest. Returns False if it was not saved (directory changed too recently, not writable).
+        """
+        if self.mtime_ns is None or time.time() - self.mtime_ns / 1e9 < MTIME_RESOLUTION:
+            return False
+
+        data = {
+            "version": self.VERSION,
+            "mtime_ns": self.mtime_ns,
+            "names": self.names,
+            "stems": self.stems,
+            "file_sizes": self.file_sizes,
+            "heights": self.heights,
+            "widths": self.widths
+        }
+        try:
+            write_file(self.path, json.dumps(data, separators=(",", ":")))
+        except OSError:
+            return False
+        return True
+
+    def update(self):
+        if self.build():
+            self.save()
+
+    def update_async(self):
+        """
+        Builds and saves the manifest in a background thread
+        """
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.update, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+
+
+def load_manifest(dir_name, path=None):
+    """
+    Saved manifest of a frame directory if it is up to date, otherwise a quick listing of its frames
+    """
+    manifest = VideoManifest(dir_name, path)
+    if not manifest.load():
+        manifest.scan()
+    return manifest
@@ -0,0 +1,108 @@
+import math
+import cv2
+import numpy as np
+from .buffer_stats import buffer_stats
+
+# Number of canvases rendered in turn: the canvas displayed by the GUI thread is not overwritten by the next render
+NB_CANVASES = 2
+
+
+def get_visible_area(image_size, scale, offset, canvas_size):
+    """
+    Area (x, y, w, h) of an image of size (h, w) visible in a canvas of size (w, h), in image coordinates. The image
+    pixel (x, y) is displayed at offset + (x, y) * scale.
+    """
+    (h, w), (canvas_w, canvas_h), (offset_x, offset_y) = image_size, canvas_size, offset
+
+    x = min(max(-offset_x / scale, 0), w)
+    y = min(max(-offset_y / scale, 0), h)
+    return x, y, min((canvas_w - offset_x) / scale, w) - x, min((canvas_h - offset_y) / scale, h) - y
+
+
+def get_buffer(buffer, shape):
+    """
+    Buffer of the given shape, reused if it already has it
+    """
+    if buffer is not None and buffer.shape == shape:
+        return buffer
+
+    buffer = np.empty(shape, dtype=np.uint8)
+    buffer_stats.allocation(buffer.nbytes)
+    return buffer
+
+
+def fill(canvas, x1, y1, x2, y2, color):
+    """
+    Fills a rectangle of the canvas (much faster than assigning a color to a slice of a 3 channels array)
+    """
+    if x2 > x1 and y2 > y1:
+        cv2.rectangle(canvas, (x1, y1), (x2 - 1, y2 - 1), color, thickness=-1)
+
+
+class Viewport:
+    """
+    Renders the visible part of an image into a canvas of the size of the widget: the visible pixels are cropped
+    before being scaled, so the cost of a render depends on the size of the screen, not on the size of the image.
+
+    The canvases and the buffer of the scaled region are reused from one render to the next while their size doesn't
+    change. Images are rendered in their channel order (BGR), the canvas is converted to RGB in place if rgb is set
+    (for displays without a BGR image format).
+    """
+
+    def __init__(self, rgb=False):
+        self.rgb = rgb
+        self.canvases = [None] * NB_CANVASES
+        self.index = 0
+        self.scaled = None
+
+    def render(self, img, scale, offset, canvas_size, background):
+        """
+        Canvas (h, w, 3) of size canvas_size = (w, h) showing img scaled by scale and moved by offset, filled with
+        background outside of the image
+        """
+        canvas_w, canvas_h = canvas_size
+        self.index = (self.index + 1) % NB_CANVASES
+        canvas = self.canvases[self.index] = get_buffer(self.canvases[self.index], (canvas_h, canvas_w, 3))
+
+        # Image pixels at least partly visible
+        x, y, w, h = get_visible_area(img.shape[:2], scale, offset, canvas_size)
+        x1, y1 = int(math.floor(x)), int(math.floor(y))
+        x2, y2 = int(math.ceil(x + w)), int(math.ceil(y + h))
+        if x2 <= x1 or y2 <= y1:
+            fill(canvas, 0, 0, canvas_w, canvas_h, background)
+            return canvas
+
+        self.draw(canvas, img[y1:y2, x1:x2], scale, offset[0] + x1 * scale, offset[1] + y1 * scale, background)
+        if self.rgb:
+            cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB, dst=canvas)
+            buffer_stats.copy(canvas.nbytes)
+        return canvas
+
+    def draw(self, canvas, region, scale, x, y, background):
+        """
+        Draws a region scaled by scale with its top left corner at (x, y) on the canvas, the rest of the canvas is
+        filled with background
+        """
+        canvas_h, canvas_w = canvas.shape[:2]
+
+        # Position and size of the scaled pixels on the canvas, partly outside of it on the borders
+        sx, sy = int(round(x)), int(round(y))
+        sw, sh = max(int(round(region.shape[1] * scale)), 1), max(int(round(region.shape[0] * scale)), 1)
+
+        cx1, cy1 = max(sx, 0), max(sy, 0)
+        cx2, cy2 = min(sx + sw, canvas_w), min(sy + sh, canvas_h)
+        fill(canvas, 0, 0, canvas_w, cy1, background)
+        fill(canvas, 0, cy2, canvas_w, canvas_h, background)
+        fill(canvas, 0, cy1, cx1, cy2, background)
+        fill(canvas, cx2, cy1, canvas_w, cy2, background)
+
+        if (cx1, cy1, cx2, cy2) == (sx, sy, sx + sw, sy + sh):
+            # Scaled directly into the canvas
+            cv2.resize(region, (sw, sh), dst=canvas[cy1:cy2, cx1:cx2], interpolation=cv2.INTER_NEAREST)
+            buffer_stats.copy(sw * sh * 3)
+            return
+
+        self.scaled = get_buffer(self.scaled, (sh, sw, 3))
+        cv2.resize(region, (sw, sh), dst=self.scaled, interpolation=cv2.INTER_NEAREST)
+        canvas[cy1:cy2, cx1:cx2] = self.scaled[cy1 - sy:cy2 - sy, cx1 - sx:cx2 - sx]
+        buffer_stats.copy(sw * sh * 3 + (cx2 - cx1) * (cy2 - cy1) * 3)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import multiprocessing
+from .stores import create_store
+from .persistence import write_file
+from .video_manifest import load_manifest
+from .txt_format import format_yolo
+from ultimatelabeling.config import OUTPUT_DIR, DATA_DIR
+
+
+class YoloExporter:
+    """
+    Exports the annotations of a video as YOLO labels (output/<video>/yolo_labels/<frame>.txt).
+
+    The export is incremental: a manifest keeps a signature of the class ids, boxes and image size of each exported
+    frame, so only the frames changed since the last export are rewritten. Labels of frames which are not annotated
+    anymore are removed.
+    """
+
+    LABELS_DIR = "yolo_labels"
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, video_name, output_dir=OUTPUT_DIR, data_dir=DATA_DIR):
+        self.video_name = video_name
+        self.store = create_store(os.path.join(output_dir, video_name))
+        self.labels_dir = os.path.join(output_dir, video_name, self.LABELS_DIR)
+        self.manifest_path = os.path.join(self.labels_dir, self.MANIFEST_NAME)
+
+        self.manifest = load_manifest(os.path.join(data_dir, video_name))
+        self.image_paths = dict(zip(self.manifest.stems, self.manifest.get_paths()))
+
+    def get_image_size(self):
+        """
+        Size (h, w) of the frames of the video, read from the header of the first frame
+        """
+        return self.manifest.get_image_size()
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+
+        with open(self.manifest_path, "r") as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        write_file(self.manifest_path, json.dumps(manifest))
+
+    @staticmethod
+    def get_signature(detections, img_size):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(detections.class_ids.tobytes())
+        h.update(detections.boxes.tobytes())
+        h.update(str(tuple(img_size)).encode())
+        return h.hexdigest()
+
+    def export(self, img_size=None, list_file=None):
+        """
+        Writes the labels of the frames changed since the last export.
+        If list_file is given, the image path of every exported frame is written to it in the same pass
+        (training list). Returns the number of written, unchanged and removed label files.
+        """
+        if img_size is None:
+            img_size = self.get_image_size()
+        if img_size is None:
+            raise ValueError("Could not read the image size of video {}".format(self.video_name))
+
+        if not os.path.exists(self.labels_dir):
+            os.makedirs(self.labels_dir)
+
+        manifest = self.load_manifest()
+        new_manifest = {}
+        stats = {"written": 0, "unchanged": 0, "removed": 0}
+
+        for file_name in self.store.get_file_names():
+            detections = self.store.get_frame(file_name)
+            signature = self.get_signature(detections, img_size)
+            label_path = os.path.join(self.labels_dir, "{}.txt".format(file_name))
+
+            if manifest.get(file_name) == signature and os.path.exists(label_path):
+                stats["unchanged"] += 1
+            else:
+                with open(label_path, "w") as f:
+                    f.write(format_yolo(detections, img_size))
+                stats["written"] += 1
+
+            new_manifest[file_name] = signature
+
+            if list_file is not None and file_name in self.image_paths:
+                list_file.write(os.path.abspath(self.image_paths[file_name]) + "\n")
+
+        for file_name in set(manifest) - set(new_manifest):
+            label_path = os.path.join(self.labels_dir, "{}.txt".format(file_name))
+            if os.path.exists(label_path):
+                os.remove(label_path)
+            stats["removed"] += 1
+
+        self.save_manifest(new_manifest)
+        return stats
+
+
+class ListBuffer:
+    """
+    Collects the lines of a training list in a worker process
+    """
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+
+def export_video(video_name, img_size=None, output_dir=OUTPUT_DIR, data_dir=DATA_DIR):
+    """
+    Exports one video, returns (video_name, stats, lines of the training list)
+    """
+    buffer = ListBuffer()
+    stats = YoloExporter(video_name, output_dir, data_dir).export(img_size, list_file=buffer)
+    return video_name, stats, buffer.lines
+
+
+def _export_video(args):
+    return export_video(*args)
+
+
+def export_videos(video_names, list_path=None, processes=None, output_dir=OUTPUT_DIR, data_dir=DATA_DIR,
+                  on_progress=None):
+    """
+    Exports the YOLO labels of several videos in parallel processes (one video per task).
+    The training list (image paths of all exported frames) is streamed to list_path as videos complete.
+    on_progress(nb_done, nb_videos, video_name) is called after each video. Returns the stats of each video.
+    """
+    tasks = [(video_name, None, output_dir, data_dir) for video_name in video_names]
+    all_stats = {}
+
+    list_file = open(list_path, "w") if list_path is not None else None
+    try:
+        # Spawn rather than fork: the application process runs background threads holding locks
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            for i, (video_name, stats, lines) in enumerate(pool.imap_unordered(_export_video, tasks)):
+                all_stats[video_name] = stats
+                if list_file is not None:
+                    list_file.writelines(lines)
+                    list_file.flush()
+                if on_progress is not None:
+                    on_progress(i + 1, len(tasks), video_name)
+    finally:
+        if list_file is not None:
+            list_file.close()
+
+    return all_stats
@@ -0,0 +1,119 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .detection_set import DetectionSet
+
+
+"""
+Bulk import of YOLO labels (one <frame>.txt or <frame>.csv file per frame: class_id xc yc w h, relative to the image
+size) into the annotations of a video.
+
+Label files are matched to the frames through a name -> path dictionary, read and parsed in a thread pool, and the
+frames are written to the store in batches of BATCH_SIZE (one journal write per batch).
+"""
+
+# If a frame has several label files, the first extension wins
+LABEL_EXTENSIONS = (".csv", ".txt")
+
+# Number of frames written to the store at once
+BATCH_SIZE = 2000
+
+# Number of files read by a task of the thread pool
+TASK_SIZE = 64
+
+
+def find_label_files(folder_path):
+    """
+    Returns a dictionary file_name -> path of the label files of a folder
+    """
+    label_files = {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            name, ext = os.path.splitext(entry.name)
+            if ext not in LABEL_EXTENSIONS or not entry.is_file():
+                continue
+
+            if name not in label_files or ext == LABEL_EXTENSIONS[0]:
+                label_files[name] = entry.path
+    return label_files
+
+
+def parse_yolo(text, img_size):
+    """
+    Parses YOLO labels, returns the class ids and the absolute boxes (N x 4 array of x, y, w, h).
+    Fields after the fifth one (e.g. a confidence) are ignored.
+    """
+    h, w = img_size
+    fields = text.split()
+    nb_rows = sum(1 for line in text.splitlines() if line.strip())
+
+    if nb_rows == 0:
+        return np.zeros(0, dtype=int), np.zeros((0, 4))
+
+    if len(fields) == 5 * nb_rows:
+        values = np.array(fields, dtype=float).reshape(-1, 5)
+    else:
+        values = np.array([row.split()[:5] for row in text.splitlines() if row.strip()], dtype=float)
+
+    boxes = values[:, 1:] * [w, h, w, h]
+    boxes[:, :2] -= boxes[:, 2:] / 2
+    return values[:, 0].astype(int), boxes
+
+
+def read_yolo(path, img_size):
+    with open(path, "r") as f:
+        return parse_yolo(f.read(), img_size)
+
+
+def read_yolo_files(paths, img_size):
+    return [read_yolo(path, img_size) for path in paths]
+
+
+def import_yolo_labels(track_info, folder_path, file_names, img_size, workers=None, on_progress=None):
+    """
+    Replaces the detections of the frames of a video (file_names, in order) which have a label file in folder_path.
+    Track ids are numbered from 0 in frame order. on_progress(nb_done, nb_files) is called after each batch.
+    Returns the number of imported frames.
+
+    The imported frames are not journaled (the label files are the backup): the journal is compacted before the import
+    and the imported frames are committed once at the end.
+    The import clears the undo history.
+    """
+    label_files = find_label_files(folder_path)
+    matches = [(file_name, label_files[file_name]) for file_name in file_names if file_name in label_files]
+    nb_track_ids = 0
+
+    # The journaled edits are committed first, so that none of them can be replayed over the imported frames
+    track_info.save_to_disk()
+
+    # Reading is I/O bound, the files are read in parallel
+    with ThreadPoolExecutor(workers) as pool:
+        for start in range(0, len(matches), BATCH_SIZE):
+            batch = matches[start:start + BATCH_SIZE]
+            paths = [path for _, path in batch]
+            tasks = [paths[i:i + TASK_SIZE] for i in range(0, len(paths), TASK_SIZE)]
+            labels = (label for task in pool.map(lambda task: read_yolo_files(task, img_size), tasks)
+                      for label in task)
+
+            frames = {}
+            for (file_name, _), (class_ids, boxes) in zip(batch, labels):
+                track_ids = np.arange(nb_track_ids, nb_track_ids + len(class_ids))
+                frames[file_name] = DetectionSet.from_arrays(track_ids, class_ids, boxes)
+                nb_track_ids += len(class_ids)
+
+            track_info.set_frames(frames, journal=False)
+
+            if on_progress is not None:
+                on_progress(start + len(batch), len(matches))
+
+    with track_info.lock:
+        # The imported frames are not in the undo history, the previous steps can't be undone on top of them
+        track_info.history.clear()
+        track_info.nb_track_ids = max(track_info.nb_track_ids, nb_track_ids)
+        track_info.flush()
+
+        # Update current detections
+        if track_info.file_name is not None:
+            track_info.load_detections(track_info.file_name)
+
+    return len(matches)
@@ -1,4 +1,5 @@
 import cv2
+import functools
 from .models.polygon import Bbox
 import numpy as np
 import os
@@ -15,6 +16,7 @@ COCO_PERSON_SKELETON = [
     [2, 4], [3, 5], [4, 6], [5, 7]]
 
 
+@functools.lru_cache(maxsize=4096)
 def get_color(id):
     np.random.seed(id)
     return tuple(map(int, np.random.choice(range(256), size=3)))
@@ -49,6 +51,27 @@ def draw_detection(img, detection, draw_anchors=True, color=None, kps_show_bbox=
     if detection.keypoints:
         draw_keypoints(img, detection.keypoints, object_id=detection.track_id if kps_instance_color else None)
 
+def scale_detection(detection, scale, offset=(0, 0)):
+    """
+    Copy of a detection with its coordinates (not the keypoint visibilities) multiplied by scale then shifted by
+    -offset, to draw it on a resized (and cropped) image
+    """
+    detection = detection.copy()
+    detection.bbox.resize(scale)
+    detection.polygon.resize(scale)
+    detection.keypoints.coords[0::3] *= scale
+    detection.keypoints.coords[1::3] *= scale
+
+    if offset[0] or offset[1]:
+        if detection.bbox:
+            detection.bbox.pos = detection.bbox.pos - offset
+        detection.polygon.coords[0::2] -= offset[0]
+        detection.polygon.coords[1::2] -= offset[1]
+        detection.keypoints.coords[0::3] -= offset[0]
+        detection.keypoints.coords[1::3] -= offset[1]
+    return detection
+
+
 def draw_label(img, bbox, label, thickness, color, height=0):
     b = bbox.pos.copy()
     s = bbox.size.copy()
@@ -79,7 +102,7 @@ def draw_keypoints(img, keypoints, linewidth=3, solid_threshold=0.5, object_id=N
     for ci, connection in enumerate(np.array(COCO_PERSON_SKELETON) - 1):
         if object_id is None:
             c = matplotlib.cm.get_cmap('tab20')(ci / len(COCO_PERSON_SKELETON))[:3]
-            c = [int(x * 255) for x in c]
+            c = [int(x * 255) for x in reversed(c)]  # BGR
 
         x1, x2 = x[connection].astype(int)
         y1, y2 = y[connection].astype(int)
@@ -171,4 +194,4 @@ def recvall(sock, n):
 
 def natural_sort_key(s, _nsre=re.compile('([0-9]+)')):
     return [int(text) if text.isdigit() else text.lower()
-            for text in _nsre.split(s)]
\ No newline at end of file
+            for text in _nsre.split(s)]
@@ -9,4 +9,5 @@ from .hungarian_manager import HungarianManager
 from .detection_manager import DetectionManager
 from .info_detection import InfoDetection
 from .options import Options
+from .statistics import StatisticsPanel
 from .io import IO
@@ -7,12 +7,20 @@ from ultimatelabeling.utils import draw_detection
 from ultimatelabeling.models import KeyboardListener, KeyboardNotifier
 from ultimatelabeling.models.polygon import Bbox
 from ultimatelabeling.models.track_info import Detection
+from ultimatelabeling.models.frame_provider import get_reduction
+from ultimatelabeling.models.viewport import Viewport, get_visible_area
+from ultimatelabeling.models.compositor import Compositor, get_extent
+from ultimatelabeling.models.buffer_stats import buffer_stats
 from ultimatelabeling.styles import Theme
 import numpy as np
 import math
 import time
 from ultimatelabeling import utils
 
+# The frames are kept in the BGR layout of the decoder and displayed as is, the canvas is converted to RGB on Qt
+# versions without a BGR image format (before 5.14)
+BGR_FORMAT = getattr(QImage, "Format_BGR888", None)
+
 class Event:
     DRAWING = "drawing"
     RESIZING = "resizing"
@@ -168,13 +176,13 @@ class DetectionQuadTree:
 
                 for i, bbox in enumerate(child_bboxes):
                     for detection in self.detections:
-                        if bbox.intersects(detection.bbox.x1y1x2y2):
+                        if bbox.intersects(detection.bbox.corners):
                             self.children[i].add_detection(detection)
                 self.detection = []
 
         else:
             for child in self.children:
-                if child.bbox.intersects(detection.bbox.x1y1x2y2):
+                if child.bbox.intersects(detection.bbox.corners):
                     child.add_detection(detection)
 
     def find_detection(self, p):
@@ -206,8 +214,15 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
         self.zoom = 1.0
         self.offset = QPoint(0., 0.)
         self.original_img = None
-        self.img = None
+        self.image_size = (0, 0)  # full resolution size (h, w) of the current frame
+        self.img_scale = 1.
+        self.reduction = 1  # reduction factor of the decode of the current frame (see get_reduction)
+        self.decode_scale = 1.  # size of the decoded image / full resolution size
+        self.pyramid = None  # tiled pyramid the current frame is rendered from (large frames, see PyramidCache)
+        self.viewport = Viewport(rgb=BGR_FORMAT is None)
+        self.canvas = None
         self.transparency = 0.8 # how transparent are the bboxes
+        self.compositor = Compositor(self.transparency)  # frame and detections layers
 
         self.anchors_quadtree = None
         self.detections_quadtree = None
@@ -227,46 +242,30 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
         self.on_current_frame_change()
 
     def get_visible_area(self):
-        h, w, _ = self.img.shape
-        zoom = self.zoom * self.img_scale
-
-        offset_x = min(max(-self.offset.x() / zoom, 0), w)
-        offset_y = min(max(-self.offset.y() / zoom, 0), h)
-
-        screen_offset_x = max(self.offset.x() / zoom, 0)
-        screen_offset_y = max(self.offset.y() / zoom, 0)
-
-        width = min(self.width() / zoom - screen_offset_x, w - offset_x)
-        height = min(self.height() / zoom - screen_offset_y, h - offset_y)
-
-        return offset_x, offset_y, width, height
+        return get_visible_area(self.image_size, self.zoom * self.img_scale, (self.offset.x(), self.offset.y()),
+                                (self.width(), self.height()))
 
     def on_current_frame_change(self):
         self.state.drawing = True
 
         start_time = time.time()
 
-        is_different_img = self.current_frame != self.state.current_frame or self.current_video != self.state.current_video
+        # A frame decoded at a reduced resolution is decoded again when zooming in
+        is_different_img = self.current_frame != self.state.current_frame or self.current_video != self.state.current_video or \
+            get_reduction(self.zoom * self.img_scale) < self.reduction
         if is_different_img:
             self.current_frame = self.state.current_frame
             self.current_video = self.state.current_video
+            self.load_image()
 
-            image_file = self.state.file_names[self.state.current_frame]
-            img = cv2.imread(image_file)
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-            h, w, _ = img.shape
-            self.img_scale = float(self.width()) / float(w)
-            self.original_img = img.copy()
-        else:
-            img = self.original_img.copy()
-            h, w, _ = img.shape = img.shape
-
+        h, w = self.image_size
         self.state.image_size = (h, w)
 
-        self.draw_bboxes(img)
-        self.draw_stored_area(img)
-        self.draw_image(img)
+        # The frame is only copied if there is something to draw on it
+        has_overlay = self.state.track_info.detections or self.state.use_cropping_area
+        self.compositor.set_frame(self.original_img, self.draw_overlay if has_overlay else None)
+        self.update_zoom_offset()
+        buffer_stats.frame()
 
         self.anchors_quadtree = AnchorQuadTree(Bbox(0, 0, w, h))
         self.detections_quadtree = DetectionQuadTree(Bbox(0, 0, w, h))
@@ -279,6 +278,27 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
         else:
             self.update_quadtrees()
 
+    def load_image(self):
+        """
+        Loads the current frame, decoded at the lowest resolution showing at least one pixel per screen pixel. The
+        drawings are scaled by decode_scale, the other coordinates (detections, mouse) stay in full resolution.
+        """
+        size = self.state.get_image_size()  # from the image header
+        self.reduction = 1 if size is None else get_reduction(self.zoom * self.width() / size[1])
+        self.state.frame_provider.set_reduction(self.reduction)
+
+        # Decoded ahead by the frame provider, read-only
+        self.original_img = self.state.get_image()
+
+        h, w = size if size is not None else self.original_img.shape[:2]
+        self.image_size = (h, w)
+        self.img_scale = float(self.width()) / float(w)
+        self.decode_scale = self.original_img.shape[1] / float(w)
+        self.reduction = int(round(1 / self.decode_scale))  # a cached frame of higher resolution may be returned
+
+    def scale(self, detection):
+        return detection if self.decode_scale == 1 else utils.scale_detection(detection, self.decode_scale)
+
     def on_frame_mode_change(self):
         if self.state.frame_mode == FrameMode.MANUAL:
             self.update_quadtrees()
@@ -298,28 +318,36 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
         for detection in self.state.track_info.detections:
             label = None if detection.class_id not in self.state.track_info.class_names else \
                 "{}, {}".format(self.state.track_info.class_names[detection.class_id], detection.track_id)
-            draw_detection(img, detection, kps_show_bbox=self.state.keypoints_show_bbox,
+            draw_detection(img, self.scale(detection), kps_show_bbox=self.state.keypoints_show_bbox,
                            kps_instance_color=self.state.keypoints_instance_color, bbox_class_color=self.state.bbox_class_color,
                            label=label)
 
+    def draw_overlay(self, img):
+        self.draw_bboxes(img)
+        self.draw_stored_area(img)
+
     def draw_current_detection(self):
-        if self.current_detection:
-            self.img = self.img_temp.copy()
-            draw_detection(self.img, self.current_detection, draw_anchors=False,
-                           kps_show_bbox=self.state.keypoints_show_bbox, kps_instance_color=self.state.keypoints_instance_color,
-                           bbox_class_color=self.state.bbox_class_color)
-            self.img = cv2.addWeighted(self.original_img, self.transparency, self.img, 1 - self.transparency, 0)
+        """
+        Draws the detection being edited on the dynamic layer, only the area around its previous and new positions is
+        recomposited
+        """
+        # Drawn on the visible region by render_pyramid
+        if self.current_detection and self.pyramid is None:
+            detection = self.scale(self.current_detection)
+            self.compositor.draw_dynamic(
+                lambda img, offset: draw_detection(img, utils.scale_detection(detection, 1, offset), draw_anchors=False,
+                                                   kps_show_bbox=self.state.keypoints_show_bbox,
+                                                   kps_instance_color=self.state.keypoints_instance_color,
+                                                   bbox_class_color=self.state.bbox_class_color),
+                get_extent(detection))
 
     def on_video_change(self):
         self.on_current_frame_change()
 
-    def draw_image(self, img):
-        self.img_temp = img
-        self.img = img
+    def draw_stored_area(self, img, scale=None, offset=(0, 0)):
+        if scale is None:
+            scale = self.decode_scale
 
-        self.update_zoom_offset()
-
-    def draw_stored_area(self, img):
         if self.state.use_cropping_area:
             x_crop, y_crop, w_crop, h_crop = self.state.stored_area
             bbox = Bbox(*self.state.stored_area)
@@ -335,13 +363,53 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
                 for j in range(-n_left, 1 + n_right):
                     pos_offset = bbox.pos.copy()
                     pos_offset += [j * w_crop, i * h_crop]
-                    top_left, bottom_right = tuple(pos_offset.astype(int)), tuple((pos_offset + bbox.size).astype(int))
-                    cv2.rectangle(img, top_left, bottom_right, color=(255, 0, 0), thickness=5)
+                    top_left = tuple((pos_offset * scale - offset).astype(int))
+                    bottom_right = tuple(((pos_offset + bbox.size) * scale - offset).astype(int))
+                    cv2.rectangle(img, top_left, bottom_right, color=(0, 0, 255), thickness=5)
+
+    def render_pyramid(self):
+        """
+        Renders the visible area from the tiles of the pyramid at the level matching the zoom, with the detections
+        drawn on it
+        """
+        scale = self.zoom * self.img_scale
+        level = self.pyramid.get_level(scale)
+        level_scale = self.pyramid.get_level_scale(level)
+
+        x, y, w, h = self.get_visible_area()
+        region, (rx, ry) = self.state.pyramids.get_region(self.pyramid, level, x * level_scale, y * level_scale,
+                                                          w * level_scale, h * level_scale)
+        if region is None:
+            return self.viewport.render(np.empty((0, 0, 3), dtype=np.uint8), scale, (0, 0),
+                                        (self.width(), self.height()), Theme.get_image_bg(self.state.theme))
+
+        detections = list(self.state.track_info.detections)
+        if self.current_detection:
+            detections.append(self.current_detection)
+        for detection in detections:
+            label = None if detection.class_id not in self.state.track_info.class_names else \
+                "{}, {}".format(self.state.track_info.class_names[detection.class_id], detection.track_id)
+            draw_detection(region, utils.scale_detection(detection, level_scale, (rx, ry)),
+                           draw_anchors=detection is not self.current_detection,
+                           kps_show_bbox=self.state.keypoints_show_bbox,
+                           kps_instance_color=self.state.keypoints_instance_color,
+                           bbox_class_color=self.state.bbox_class_color, label=label)
+        self.draw_stored_area(region, level_scale, (rx, ry))
+
+        # Region pixel (u, v) is at (rx + u, ry + v) / level_scale in full resolution
+        offset = (self.offset.x() + rx * scale / level_scale, self.offset.y() + ry * scale / level_scale)
+        return self.viewport.render(region, scale / level_scale, offset, (self.width(), self.height()),
+                                    Theme.get_image_bg(self.state.theme))
 
     def update_zoom_offset(self):
-        M = np.float32([[self.zoom * self.img_scale, 0, self.offset.x()],
-                        [0, self.zoom * self.img_scale, self.offset.y()]])
-        self.canvas = cv2.warpAffine(self.img, M, (1500, 1200), borderValue=Theme.get_image_bg(self.state.theme), flags=cv2.INTER_NEAREST)
+        self.pyramid = self.state.get_pyramid()
+        if self.pyramid is not None:
+            self.canvas = self.render_pyramid()
+        else:
+            # Only the visible part of the image is scaled, into a canvas of the size of the widget
+            self.canvas = self.viewport.render(self.compositor.get_image(), self.zoom * self.img_scale / self.decode_scale,
+                                               (self.offset.x(), self.offset.y()), (self.width(), self.height()),
+                                               Theme.get_image_bg(self.state.theme))
 
         self.state.visible_area = self.get_visible_area()
 
@@ -353,7 +421,8 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
         if self.canvas is not None:
             height, width, bpc = self.canvas.shape
             bpl = bpc * width
-            img = QImage(self.canvas.data, width, height, bpl, QImage.Format_RGB888)
+            img = QImage(self.canvas.data, width, height, bpl,
+                         QImage.Format_RGB888 if BGR_FORMAT is None else BGR_FORMAT)  # no copy
             qp.drawImage(QPoint(0, 0), img)
         qp.end()
 
@@ -381,7 +450,11 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
         new_p = old_p * self.zoom + self.offset
         self.offset += pos - new_p
 
-        self.update_zoom_offset()
+        # Decode the frame at a higher resolution, unless it is rendered from the tiles of its pyramid
+        if self.pyramid is None and get_reduction(self.zoom * self.img_scale) < self.reduction:
+            self.on_current_frame_change()
+        else:
+            self.update_zoom_offset()
 
     def resizeEvent(self, event):
         self.state.increase_current_frame(frame_mode=FrameMode.MANUAL, speed=+1)
@@ -400,6 +473,7 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
                 self.current_event = Event.RESIZING
                 self.current_anchor_key = anchor.anchor_key
                 self.current_detection = self.state.track_info.detections[anchor.detection_index].copy()
+                self.state.begin_edit()  # until the release
                 self.state.remove_detection(detection_index=anchor.detection_index)
 
                 if anchor.anchor_key[0] == "M":
@@ -415,6 +489,7 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
                 self.current_event = Event.DRAGGING
                 QApplication.setOverrideCursor(Qt.ClosedHandCursor)
                 self.current_detection = detection
+                self.state.begin_edit()  # until the release
                 self.state.remove_detection(detection=detection)
                 self.cursor_offset = np.array([pos.x(), pos.y()], dtype=float) - self.current_detection.bbox.pos
 
@@ -423,6 +498,7 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
                 QApplication.setOverrideCursor(Qt.ClosedHandCursor)
                 self.current_anchor_key = keypoint.anchor_key
                 self.current_detection = self.state.track_info.detections[keypoint.detection_index].copy()
+                self.state.begin_edit()  # until the release
                 self.state.remove_detection(detection_index=keypoint.detection_index)
 
                 i = self.current_anchor_key
@@ -522,6 +598,9 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
                 self.current_detection.bbox.correct_negative_size()
                 self.state.set_current_detection(self.current_detection)
 
+            if self.current_event in [Event.RESIZING, Event.DRAGGING, Event.KEYPOINT_DRAGGING]:
+                self.state.end_edit()
+
             if self.current_event == Event.DRAWING:
                 self.keyboard_notifier.auto_track()
 
@@ -533,13 +612,10 @@ class ImageWidget(QWidget, StateListener, KeyboardListener):
 
     # jump to the previous / next frame with different bounding boxes
     def on_key_jump(self, modifiers):
-        if modifiers is modifiers == Qt.ShiftModifier:
-            frame = self.state.current_frame
-            while frame > 0 and self.state.check_frames_equal(frame - 1, frame):
-                frame -= 1 
-            self.state.set_current_frame(frame - 1)
+        if modifiers == Qt.ShiftModifier:
+            frame = self.state.get_previous_change()
         else:
-            frame = self.state.current_frame
-            while frame < self.state.nb_frames and self.state.check_frames_equal(frame, frame + 1):
-                frame += 1 
-            self.state.set_current_frame(frame + 1)
+            frame = self.state.get_next_change()
+
+        if frame is not None:
+            self.state.set_current_frame(frame)
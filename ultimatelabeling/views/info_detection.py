@@ -99,7 +99,7 @@ class InfoDetection(QGroupBox, StateListener, KeyboardListener):
 
     def instance_id_changed(self, i):
         if self.state.current_detection and i >= 0:
-            self.state.current_detection.track_id = i
+            self.state.modify_track_id(self.state.current_detection, i)
 
             self.block_listener = True
             self.state.notify_listeners("on_detection_change")
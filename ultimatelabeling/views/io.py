@@ -1,9 +1,12 @@
-import glob
 import os
-import pandas as pd
-from PyQt5.QtWidgets import QWidget, QMessageBox, QFileDialog
+from PyQt5.QtWidgets import QMessageBox, QFileDialog, QProgressDialog, QInputDialog
+from PyQt5.QtCore import QThread, pyqtSignal
 from ultimatelabeling.models import State
-from ultimatelabeling import utils
+from ultimatelabeling.models.stores import store_exists
+from ultimatelabeling.models.yolo_export import export_videos
+from ultimatelabeling.models import exporters
+from ultimatelabeling.models.yolo_import import import_yolo_labels
+from ultimatelabeling.config import OUTPUT_DIR
 
 
 class IO:
@@ -11,10 +14,32 @@ class IO:
         self.parent = parent
         self.state = state
 
+        self.yolo_progress = None
+        self.yolo_thread = YoloExportThread()
+        self.yolo_thread.progress_signal.connect(self.on_yolo_export_progress)
+        self.yolo_thread.err_signal.connect(self.display_err_message)
+        self.yolo_thread.finished.connect(self.on_yolo_export_finished)
+
+        self.import_progress = None
+        self.import_thread = ImportThread()
+        self.import_thread.progress_signal.connect(self.on_import_progress)
+        self.import_thread.err_signal.connect(self.display_err_message)
+        self.import_thread.finished.connect(self.on_import_finished)
+
+        self.export_progress = None
+        self.export_thread = ExportThread()
+        self.export_thread.progress_signal.connect(self.on_export_progress)
+        self.export_thread.err_signal.connect(self.display_err_message)
+        self.export_thread.finished.connect(self.on_export_finished)
+
     def undo_ctrl(self):
         self.parent.img_widget.holding_ctrl = False
 
     def on_import_click(self):
+        if self.import_thread.isRunning():
+            self.undo_ctrl()
+            return
+
         qm = QMessageBox
         res = qm.question(self.parent, "", "Are you sure you want to import? This will overwrite the current labels",
                           qm.Yes | qm.No)
@@ -27,54 +52,124 @@ class IO:
             self.undo_ctrl()
             return
 
-        imported_files = glob.glob(os.path.join(folder_path, "*.csv"))
-        imported_files.extend(glob.glob(os.path.join(folder_path, "*.txt")))
+        # Apply the pending edits of the workers before overwriting the labels
+        self.state.commit_queue.barrier()
 
-        imported_base_names = [os.path.splitext(os.path.basename(file_path))[0] for file_path in imported_files]
+        self.import_progress = QProgressDialog("Importing labels...", None, 0, 0, self.parent)
+        self.import_progress.show()
 
-        h, w = self.state.image_size
+        self.import_thread.track_info = self.state.track_info
+        self.import_thread.folder_path = folder_path
+        self.import_thread.file_names = self.state.get_file_names()
+        self.import_thread.img_size = self.state.image_size
+        self.import_thread.start()
+        self.undo_ctrl()
 
-        counter = 0
-        for file_name in self.state.get_file_names():
-            if file_name in imported_base_names:
-                idx = imported_base_names.index(file_name)
-                df = pd.read_csv(imported_files[idx], names=["class_id", "xc", "yc", "w", "h"], sep=" ", header=None, index_col=False)
+    def on_import_progress(self, nb_done, nb_files):
+        self.import_progress.setMaximum(nb_files)
+        self.import_progress.setValue(nb_done)
+        self.import_progress.setLabelText("Imported {}/{} label files".format(nb_done, nb_files))
 
-                # Convert coordinates from percentage to absolute
-                df.xc, df.w = df.xc * w, df.w * w
-                df.yc, df.h = df.yc * h, df.h * h
+    def on_import_finished(self):
+        self.import_progress.close()
+        self.state.notify_listeners("on_current_frame_change")
+        QMessageBox.information(self.parent, "", "Done! {} frames imported.".format(self.import_thread.nb_frames))
 
-                df["x"] = df.xc - df.w / 2
-                df["y"] = df.yc - df.h / 2
-                df["polygon"] = ""
-                df["kp"] = ""
+    def on_export_click(self):
+        if self.export_thread.isRunning():
+            self.undo_ctrl()
+            return
 
-                n = len(df)
-                df["track_id"] = range(counter, counter + n)
-                counter += n
+        file_path, fmt = self.save_file_dialog()
+        if file_path is None or file_path == "":
+            self.undo_ctrl()
+            return
 
-                df = df[["track_id", "class_id", "x", "y", "w", "h", "polygon", "kp"]]
+        # Annotations are exported from the store on disk, make sure it is consistent with the current labels
+        self.state.save_to_disk()
 
-                self.state.track_info.write_from_df(df, file_name)
+        nb_frames = self.state.nb_frames
+        self.export_progress = QProgressDialog("Exporting labels...", None, 0, nb_frames, self.parent)
+        self.export_progress.show()
 
-        self.state.notify_listeners("on_current_frame_change")
+        self.export_thread.video_names = [self.state.current_video]
+        self.export_thread.fmt = fmt
+        self.export_thread.path = file_path
+        self.export_thread.start()
         self.undo_ctrl()
-        QMessageBox.information(self.parent, "", "Done!")
 
-    def on_export_click(self):
-        file_path = self.save_file_dialog()
-        if file_path is None or file_path == "":
+    def on_export_project_click(self):
+        if self.export_thread.isRunning():
+            self.undo_ctrl()
+            return
+
+        names = [exporter.NAME for exporter in exporters.EXPORTERS.values()]
+        name, ok = QInputDialog.getItem(self.parent, "Export project", "Format:", names, 0, False)
+        if not ok:
+            self.undo_ctrl()
+            return
+
+        export_dir = QFileDialog.getExistingDirectory(self.parent, "Export project")
+        if export_dir is None or export_dir == "":
             self.undo_ctrl()
             return
 
-        df = self.state.track_info.to_df(self.state.get_file_names())
+        self.state.save_to_disk()
+
+        video_names = [video for video in self.state.video_list
+                       if store_exists(os.path.join(OUTPUT_DIR, video))]
+
+        self.export_progress = QProgressDialog("Exporting labels...", None, 0, len(video_names), self.parent)
+        self.export_progress.show()
+
+        self.export_thread.video_names = video_names
+        self.export_thread.fmt = list(exporters.EXPORTERS)[names.index(name)]
+        self.export_thread.path = export_dir
+        self.export_thread.start()
+        self.undo_ctrl()
+
+    def on_export_progress(self, nb_done, nb_total, video_name):
+        self.export_progress.setMaximum(nb_total)
+        self.export_progress.setValue(nb_done)
+        self.export_progress.setLabelText("Exporting {} ({}/{})".format(video_name, nb_done, nb_total))
+
+    def on_export_finished(self):
+        self.export_progress.close()
+        QMessageBox.information(self.parent, "", "Done! Exported to {}".format(self.export_thread.path))
+
+    def on_export_yolo_click(self):
+        if self.yolo_thread.isRunning():
+            return
+
+        # Labels are exported from the annotation stores on disk
+        self.state.save_to_disk()
 
-        df[["xc", "yc", "w", "h"]] = df[["xc", "yc", "w", "h"]].astype(int)
+        video_names = [video for video in self.state.video_list
+                       if store_exists(os.path.join(OUTPUT_DIR, video))]
 
-        df.to_csv(file_path, sep=" ", header=False, index=False)
+        self.yolo_progress = QProgressDialog("Exporting YOLO labels...", None, 0, len(video_names), self.parent)
+        self.yolo_progress.show()
 
+        self.yolo_thread.video_names = video_names
+        self.yolo_thread.list_path = os.path.join(OUTPUT_DIR, "train.txt")
+        self.yolo_thread.start()
         self.undo_ctrl()
-        QMessageBox.information(self.parent, "", "Done!")
+
+    def on_yolo_export_progress(self, nb_done, nb_videos, video_name):
+        self.yolo_progress.setValue(nb_done)
+        self.yolo_progress.setLabelText("Exported {} ({}/{})".format(video_name, nb_done, nb_videos))
+
+    def on_yolo_export_finished(self):
+        self.yolo_progress.close()
+
+        written = sum(stats["written"] for stats in self.yolo_thread.stats.values())
+        unchanged = sum(stats["unchanged"] for stats in self.yolo_thread.stats.values())
+        QMessageBox.information(self.parent, "", "Done! {} label files written, {} unchanged.\n"
+                                                 "Training list: {}".format(written, unchanged,
+                                                                            self.yolo_thread.list_path))
+
+    def display_err_message(self, err_msg):
+        QMessageBox.warning(self.parent, "", "Error: {}".format(err_msg))
 
     def open_folder_name_dialog(self):
         options = QFileDialog.Options()
@@ -82,9 +177,82 @@ class IO:
         return folder_path
 
     def save_file_dialog(self):
+        """
+        Returns the chosen path and export format (key of exporters.EXPORTERS, from the selected filter)
+        """
         file_name = "{}_tracked_all.csv".format(self.state.current_video)
 
+        filters = ["{} (*{})".format(exporter.NAME, exporter.EXTENSION) for exporter in exporters.EXPORTERS.values()]
+
         options = QFileDialog.Options()
-        file_path, _ = QFileDialog.getSaveFileName(self.parent, "Export labels", file_name,
-                                                   "All Files (*);;CSV (*.csv)", options=options)
-        return file_path
+        file_path, selected_filter = QFileDialog.getSaveFileName(self.parent, "Export labels", file_name,
+                                                                 ";;".join(filters), options=options)
+
+        fmt = list(exporters.EXPORTERS)[filters.index(selected_filter)] if selected_filter in filters else "csv"
+        return file_path, fmt
+
+
+class YoloExportThread(QThread):
+    progress_signal = pyqtSignal(int, int, str)
+    err_signal = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.video_names = []
+        self.list_path = None
+        self.stats = {}
+
+    def run(self):
+        self.stats = {}
+        try:
+            self.stats = export_videos(self.video_names, list_path=self.list_path,
+                                       on_progress=self.progress_signal.emit)
+        except Exception as e:
+            self.err_signal.emit(str(e))
+
+
+class ImportThread(QThread):
+    progress_signal = pyqtSignal(int, int)
+    err_signal = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.track_info = None
+        self.folder_path = None
+        self.file_names = []
+        self.img_size = None
+        self.nb_frames = 0
+
+    def run(self):
+        self.nb_frames = 0
+        try:
+            self.nb_frames = import_yolo_labels(self.track_info, self.folder_path, self.file_names, self.img_size,
+                                                on_progress=self.progress_signal.emit)
+        except Exception as e:
+            self.err_signal.emit(str(e))
+
+
+class ExportThread(QThread):
+    """
+    Exports one video to a file (frame progress), or several videos to a folder in a process pool (video progress)
+    """
+    progress_signal = pyqtSignal(int, int, str)
+    err_signal = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.video_names = []
+        self.fmt = "csv"
+        self.path = None
+
+    def run(self):
+        try:
+            if len(self.video_names) == 1 and not os.path.isdir(self.path):
+                video_name = self.video_names[0]
+                exporters.export_video(video_name, self.fmt, self.path,
+                                       on_progress=lambda nb_done, nb_frames: self.progress_signal.emit(
+                                           nb_done, nb_frames, video_name))
+            else:
+                exporters.export_videos(self.video_names, self.fmt, self.path, on_progress=self.progress_signal.emit)
+        except Exception as e:
+            self.err_signal.emit(str(e))
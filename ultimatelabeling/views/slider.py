@@ -73,7 +73,11 @@ class VideoSlider(QWidget, StateListener, KeyboardListener):
 
     def update_label(self):
         self.label.setText("Frame {}/{}".format(self.state.current_frame, self.state.nb_frames - 1))
-        self.file_name_label.setText(self.state.file_names[self.state.current_frame])
+        file_name = self.state.file_names[self.state.current_frame]
+        image_size = self.state.get_image_size()
+        if image_size is not None:
+            file_name = "{} ({}x{})".format(file_name, image_size[1], image_size[0])
+        self.file_name_label.setText(file_name)
 
     def on_video_change(self):
         self.on_current_frame_change()
@@ -88,7 +92,7 @@ class VideoSlider(QWidget, StateListener, KeyboardListener):
         self.state.increase_current_frame(frame_mode=FrameMode.MANUAL, speed=-1*switch.get(modifier, 1))
 
         if current_detection and self.state.copy_annotations_option:
-            track_ids = [d.track_id for d in self.state.track_info.detections]
+            track_ids = self.state.track_info.detections.track_ids
             if current_detection.track_id not in track_ids:
                 self.state.set_current_detection(current_detection)
 
@@ -100,7 +104,7 @@ class VideoSlider(QWidget, StateListener, KeyboardListener):
         self.state.increase_current_frame(frame_mode=FrameMode.MANUAL, speed=+1*switch.get(modifier, 1))
 
         if current_detection and self.state.copy_annotations_option:
-            track_ids = [d.track_id for d in self.state.track_info.detections]
+            track_ids = self.state.track_info.detections.track_ids
             if current_detection.track_id not in track_ids:
                 self.state.set_current_detection(current_detection)
 
@@ -0,0 +1,68 @@
+from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QLabel
+from ultimatelabeling.models import StateListener
+from ultimatelabeling.models.buffer_stats import buffer_stats
+
+
+class StatisticsPanel(QGroupBox, StateListener):
+    """
+    Statistics of the labels of the current video, read from the incremental aggregates of the state
+    """
+
+    def __init__(self, state):
+        super().__init__("Statistics")
+
+        self.state = state
+        self.state.add_listener(self)
+
+        self.summary_label = QLabel()
+        self.classes_label = QLabel()
+        self.classes_label.setWordWrap(True)
+        self.track_label = QLabel()
+        self.frames_label = QLabel()
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.classes_label)
+        layout.addWidget(self.track_label)
+        layout.addWidget(self.frames_label)
+        self.setLayout(layout)
+
+        self.update_statistics()
+
+    def update_statistics(self):
+        if not self.state.current_video or self.state.nb_frames == 0:
+            return
+
+        stats = self.state.get_statistics()
+        self.summary_label.setText("{} detections, {} tracks, {}/{} frames without labels\n"
+                                   "Detections per frame: {:.1f} (max {})".format(
+                                       stats["nb_detections"], stats["nb_tracks"], stats["nb_empty_frames"],
+                                       stats["nb_frames"], stats["mean_density"], stats["max_density"]))
+
+        class_names = self.state.track_info.class_names
+        self.classes_label.setText(", ".join("{}: {}".format(class_names.get(class_id, class_id), n)
+                                             for class_id, n in sorted(stats["class_counts"].items())))
+
+        detection = self.state.current_detection
+        if detection is None:
+            self.track_label.setText("")
+        else:
+            self.track_label.setText("Track {}: {} frames".format(
+                detection.track_id, self.state.get_track_length(detection.track_id)))
+
+        frames = self.state.frame_provider.get_statistics()
+        buffers = buffer_stats.get_statistics()
+        self.frames_label.setText("Decoded frames: {:.0%} prefetched, {:.1f} ms per frame (max {:.0f} ms)\n"
+                                  "Image buffers per frame: {:.1f} allocated ({:.1f} MB), {:.1f} MB copied".format(
+                                      frames["hit_rate"], 1000 * frames["mean_latency"], 1000 * frames["max_latency"],
+                                      buffers["allocations_per_frame"], buffers["allocated_per_frame"] / 1e6,
+                                      buffers["copied_per_frame"] / 1e6))
+
+    def on_current_frame_change(self):
+        self.update_statistics()
+
+    def on_video_change(self):
+        self.update_statistics()
+
+    def on_detection_change(self):
+        self.update_statistics()
@@ -1,24 +1,69 @@
-from PyQt5.QtWidgets import QListWidget
+from PyQt5.QtWidgets import QListWidget, QListWidgetItem
+from PyQt5.QtCore import Qt, pyqtSignal
 from ultimatelabeling.models import StateListener, FrameMode
 
 
 class VideoListWidget(QListWidget, StateListener):
+    # Progress of the frame extractions (video_name, nb_done, nb_total), emitted from the extraction workers
+    extraction_signal = pyqtSignal(str, int, int)
+
     def __init__(self, state):
         super().__init__()
 
         self.state = state
         self.state.add_listener(self)
 
+        self.items = {}
         for video_name in self.state.video_list:
-            self.addItem(video_name)
+            self.add_video(video_name)
 
         self.itemDoubleClicked.connect(self.on_list_clicked)
+        self.extraction_signal.connect(self.on_extraction_progress)
+        self.state.extraction.on_progress = self.extraction_signal.emit
+
+        # Jobs which progressed before the signal was connected
+        for video_name in self.state.video_list:
+            job = self.state.extraction.get_job(video_name)
+            if job is not None:
+                self.update_item(video_name, job.nb_done, job.nb_total)
+
+    def add_video(self, video_name):
+        item = QListWidgetItem(video_name)
+        item.setData(Qt.UserRole, video_name)
+        self.addItem(item)
+        self.items[video_name] = item
+
+    def update_item(self, video_name, nb_done, nb_total):
+        item = self.items[video_name]
+        job = self.state.extraction.get_job(video_name)
+
+        if job is not None and job.status == job.FAILED:
+            item.setText("{} (failed)".format(video_name))
+            item.setToolTip(job.error)
+        elif not self.state.is_extracting(video_name):
+            item.setText(video_name)
+        elif nb_total > 0:
+            item.setText("{} ({}%)".format(video_name, min(100 * nb_done // nb_total, 99)))
+        else:
+            item.setText("{} ({})".format(video_name, nb_done))
+
+        # A video can be opened once its first frames are extracted
+        if nb_done > 0 or not self.state.is_extracting(video_name):
+            item.setFlags(item.flags() | Qt.ItemIsEnabled)
+        else:
+            item.setFlags(item.flags() & ~Qt.ItemIsEnabled)
+
+    def on_extraction_progress(self, video_name, nb_done, nb_total):
+        self.state.update_extraction(video_name)
+
+        if video_name not in self.items:
+            self.add_video(video_name)
+        self.update_item(video_name, nb_done, nb_total)
 
     def on_list_clicked(self, item):
         self.state.frame_mode = FrameMode.MANUAL
-        self.state.set_current_video(item.text())
+        self.state.set_current_video(item.data(Qt.UserRole))
 
     def on_video_change(self):
         index = self.state.video_list.index(self.state.current_video)
         # self.item(index).setSelected(True)
-